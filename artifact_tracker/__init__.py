@@ -1,59 +1,138 @@
 # -*- coding: utf-8 -*-
 """
 Initiating the artifact_tracker.
+
+Importing the package has no side effects. The Flask app, which reads or
+creates the secrets file and configures the logging, and the Celery app
+are created by `create_app` the first time `tracker_app`, `app` or
+`celery` is read from the package, e.g. by uwsgi, by the celery worker
+or by the import of a model or a task. The database is not touched: the
+schema is only created and upgraded by the `init-db` command.
 """
 
-from artifact_tracker.application import Application
-from flask import url_for
+import click
 import os
+import sys
+import threading
+import types
+
+# the attributes of the package created by `create_app`
+APPS = ("tracker_app", "app", "celery")
+
+_lock = threading.RLock()
+
+
+def create_app():
+    """
+    Creates the artifact_tracker application: the Flask app, with its
+    blueprints and commands, and the Celery app. Only run once, the
+    first time one of the apps is used.
+
+    :return: the Application.
+    """
+    global tracker_app, app, celery
+    from artifact_tracker.application import Application
+
+    with _lock:
+        if "celery" in globals():
+            return tracker_app
+
+        # load the config filename set by env variable.
+        # used for testing again.
+        config_filename = os.getenv("ARTIFACT_TRACKER_CONFIG")
+
+        # the artifact_tracker application initialized
+        application = Application(config_filename=config_filename)
+
+        # create a test app for unit testing
+        # else create a regular app
+        if os.getenv("ARTIFACT_TRACKER_TYPE") == "test":
+            flask_app = application.create_test_app()
+        else:
+            flask_app = application.create_app()
 
+        application.log.debug(
+            "SQL_URI: %s" % flask_app.config.get("SQLALCHEMY_DATABASE_URI"))
 
-# load the config filename set by env variable.
-# used for testing again.
-config_filename = os.getenv("ARTIFACT_TRACKER_CONFIG")
+        application.log.debug("Logger Started with level: %s"
+                              % flask_app.config.get("LOG_LEVEL", "").upper())
 
-# the artifact_tracker application initialized
-tracker_app = Application(config_filename=config_filename)
+        # the views and the models import the app while they are loaded
+        tracker_app = application
+        app = flask_app
 
-# create a test app for unit testing
-# else create a regular app
-if os.getenv("ARTIFACT_TRACKER_TYPE") == "test":
-    app = tracker_app.create_test_app()
-else:
-    app = tracker_app.create_app()
+        # registers all the views for flask to recognize and serve
+        application.register_blueprints(flask_app)
+        flask_app.teardown_appcontext(shutdown_db_session)
+        flask_app.after_request(append_header)
+        flask_app.cli.command("init-db")(init_db_command)
+        flask_app.cli.command("profile-report")(profile_report_command)
+        flask_app.cli.command("worker-queues")(worker_queues_command)
+        application.log.debug("Artifact Tracker initiated.")
 
-tracker_app.log.debug(
-    "SQL_URI: %s" % app.config.get("SQLALCHEMY_DATABASE_URI"))
+        # initiating celery and configuring celery tasks
+        celery_app = application.create_celery_app(app=flask_app)
+        application.log.debug(f"tasks import: "
+                              f"{flask_app.config.get('CELERY_TASKS_IMPORT')}")
 
-tracker_app.log.debug("Logger Started with level: %s"
-                      % app.config.get("LOG_LEVEL", "").upper())
+        celery_app.conf.timezone = "UTC"
+        celery = celery_app
+        return application
 
-# registers all the views for flask to recognize and serve
-tracker_app.register_blueprints(app)
-tracker_app.log.debug("Artifact Tracker initiated.")
 
-# initiating celery and configuring celery tasks
-celery = tracker_app.create_celery_app(app=app)
-tracker_app.log.debug(f"tasks import: "
-                      f"{app.config.get('CELERY_TASKS_IMPORT')}")
+class _Package(types.ModuleType):
+    """
+    The module of the package, which creates the apps the first time
+    they are read.
+    """
+
+    def __getattr__(self, name):
+        if name in APPS:
+            create_app()
+            return self.__dict__[name]
+        raise AttributeError(
+            f"module {self.__name__!r} has no attribute {name!r}")
 
-celery.conf.timezone = "UTC"
+
+sys.modules[__name__].__class__ = _Package
 
 
 def create_db():
     """
-    Creates all the database tables. Also initializes supported authentication
-    types in the db and initializes portal settings from the config file in
-    the db.
+    Creates all the database tables and adds the columns missing from
+    existing tables. Not run on import, see the `init-db` command.
+
+    :return: (list) the names of the columns added.
+    """
+    from artifact_tracker.store.migrate import upgrade
+    return upgrade(create_app().db)
 
-    :return: None
+
+def init_db_command():
+    """
+    Creates and upgrades the database schema. Must be run before the app
+    and the workers are started for the first time and after upgrades.
+    """
+    added = create_db()
+    for column in added:
+        tracker_app.log.info("Added column: %s" % column)
+    tracker_app.log.info("Database initialized.")
+
+
+@click.option("--portal", default=None,
+              help="Only aggregate the profiles of this portal.")
+@click.option("--sort", default="cumulative",
+              help="The pstats sort key, e.g. cumulative or tottime.")
+@click.option("--limit", default=30, help="The number of functions shown.")
+@click.option("--path", default=None, help="The profiles directory.")
+def profile_report_command(portal, sort, limit, path):
     """
-    from artifact_tracker.store.tracker_task import TrackerTask # noqa: ignore=F401
-    tracker_app.db.create_all()
-    tracker_app.db.session.commit()
+    Prints the top functions of the profiles of the tracker tasks.
+    """
+    from artifact_tracker.utils.profiling import report
+    report(portal_name=portal, sort=sort, limit=limit, path=path)
 
 
-@tracker_app.app.teardown_appcontext
 def shutdown_db_session(exception=None):
     """
     Invoked when the app is about to shutdown.
@@ -64,7 +143,6 @@ def shutdown_db_session(exception=None):
     tracker_app.db.session.remove()
 
 
-@tracker_app.app.after_request
 def append_header(response):
     """
     Invoked after a response is prepared.
@@ -72,6 +150,8 @@ def append_header(response):
     :param response: the WSGI response object from flask.
     :return: the WSGI response object after modification.
     """
+    from artifact_tracker.utils import metrics
+    from flask import url_for
     ldn_inbox_link = '<%s>; rel="%s"' % \
                      (url_for("ldn_inbox.get_inbox", _external=True),
                       "https://www.w3.org/ns/ldp#inbox")
@@ -81,8 +161,19 @@ def append_header(response):
         link += response.headers["Link"]
 
     response.headers["Link"] = link
+    metrics.flush()
     return response
 
 
-with app.app_context():
-    create_db()
+@click.option("--portal", "portals", multiple=True,
+              help="The portals of the worker pool, defaults to all.")
+@click.option("--lane", "lanes", multiple=True,
+              help="The lanes of the worker pool, defaults to all.")
+def worker_queues_command(portals, lanes):
+    """
+    Prints the queues of the tracker tasks of the given portals and
+    lanes, for the -Q option of a celery worker.
+    """
+    from artifact_tracker.tracker.registry import queues
+    click.echo(",".join(queues(list(portals), list(lanes))) or
+               celery.conf.task_default_queue)
@@ -6,9 +6,12 @@ The Artifact Tracker WSGI application.
 import logging
 import os
 from celery import Celery
+from celery.signals import task_postrun
 from flask import Flask
 from artifact_tracker.store import db
 from flask_sqlalchemy import SQLAlchemy
+from artifact_tracker.utils import admission, fair, memory, metrics, \
+    profiling
 from .config import Config
 
 
@@ -128,9 +131,27 @@ class Application(object):
             abstract = True
 
             def __call__(self, *args, **kwargs):
-                with app.app_context():
+                with app.app_context(), \
+                        profiling.profile_task(kwargs), \
+                        memory.track_task(kwargs):
                     return TaskBase.__call__(self, *args, **kwargs)
         celery.Task = ContextTask
+
+        @task_postrun.connect(weak=False)
+        def flush_metrics(**kwargs):
+            metrics.flush(force=True)
+
+        @task_postrun.connect(weak=False)
+        def release_fair_slot(task_id=None, **kwargs):
+            if fair.enabled():
+                fair.task_done(task_id)
+
+        @task_postrun.connect(weak=False)
+        def drain_deferred_messages(**kwargs):
+            if admission.enabled() and \
+                    admission.config().get("mode") == admission.DEFER:
+                admission.drain()
+
         return celery
 
     @property
@@ -194,8 +215,10 @@ class Application(object):
         :return: None
         """
         from artifact_tracker.ldn.inbox import ldn_inbox
+        from artifact_tracker.metrics.endpoint import metrics
 
         app.register_blueprint(ldn_inbox)
+        app.register_blueprint(metrics)
 
     def get_logger(self):
         """
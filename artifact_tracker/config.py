@@ -42,7 +42,7 @@ class Config(dict):
         """
         config = {}
         with open(filename, "rb") as f:
-            config = yaml.load(f)
+            config = yaml.safe_load(f)
         self.from_object(config)
 
     def from_object(self, config):
@@ -71,6 +71,24 @@ class Config(dict):
         self["CELERY_BACKEND_URL"] = self["SQLALCHEMY_DATABASE_URI"]
         self["CELERY_TASKS_IMPORT"] = config.get("tracker", {})\
             .get("celery", {}).get("import", [])
+        self["ROUTING"] = config.get("tracker", {})\
+            .get("celery", {}).get("routing") or {}
+        self["REDIS_URL"] = (config.get("tracker", {}).get("redis_url") or
+                             self["CELERY_BROKER_URL"]).strip()
+        self["METRICS"] = config.get("tracker", {}).get("metrics") or {}
+        self["TRACING"] = config.get("tracker", {}).get("tracing") or {}
+        self["HTTP"] = config.get("tracker", {}).get("http") or {}
+        self["PROFILING"] = config.get("tracker", {}).get("profiling") or {}
+        self["MEMORY"] = config.get("tracker", {}).get("memory") or {}
+        self["BACKFILL"] = config.get("tracker", {}).get("backfill") or {}
+        self["FAIR"] = config.get("tracker", {}).get("fair") or {}
+        self["ADMISSION"] = config.get("tracker", {}).get("admission") or {}
+        self["DELIVERY"] = config.get("tracker", {}).get("delivery") or {}
+        self["BREAKER"] = config.get("tracker", {}).get("breaker") or {}
+        self["CONCURRENCY"] = config.get("tracker", {})\
+            .get("concurrency") or {}
+        self["CLAIM_CHECK"] = config.get("tracker", {})\
+            .get("claim_check") or {}
 
     def validate(self) -> (bool, [str]):
         error_tmpl = "{} Please set parameter {} in section {}"
@@ -4,7 +4,7 @@ from flask import request, \
     Blueprint, make_response, Response
 from artifact_tracker import tracker_app
 from artifact_tracker.utils.as2_to_user import queue_tasks
-from rdflib import Graph, URIRef, RDF, Namespace
+from artifact_tracker.utils import admission, metrics
 
 ldn_inbox = Blueprint("ldn_inbox", __name__,
                       template_folder="templates")
@@ -21,16 +21,32 @@ ACCEPTED_TYPES = ['application/ld+json',
                   'profile="http://www.w3.org/ns/activitystreams',
                   'json-ld']
 
-# Graph of the local inbox
-ldp_url = URIRef("http://www.w3.org/ns/ldp#")
-ldp = Namespace(ldp_url)
+# Graph of the local inbox, built on first use so that processes
+# not serving the inbox, like the celery workers, don't load rdflib
+_inbox_graph = None
 
-inbox_graph = Graph()
-inbox_graph.add((URIRef(INBOX_URL), RDF.type, ldp['Resource']))
-inbox_graph.add((URIRef(INBOX_URL), RDF.type, ldp['RDFSource']))
-inbox_graph.add((URIRef(INBOX_URL), RDF.type, ldp['Container']))
-inbox_graph.add((URIRef(INBOX_URL), RDF.type, ldp['BasicContainer']))
-inbox_graph.bind('ldp', ldp)
+
+def get_inbox_graph():
+    """
+    Returns the RDF graph describing the local inbox.
+    :return: the rdflib graph.
+    """
+    global _inbox_graph
+    if _inbox_graph is None:
+        from rdflib import Graph, URIRef, RDF, Namespace
+
+        ldp_url = URIRef("http://www.w3.org/ns/ldp#")
+        ldp = Namespace(ldp_url)
+
+        inbox_graph = Graph()
+        inbox_graph.add((URIRef(INBOX_URL), RDF.type, ldp['Resource']))
+        inbox_graph.add((URIRef(INBOX_URL), RDF.type, ldp['RDFSource']))
+        inbox_graph.add((URIRef(INBOX_URL), RDF.type, ldp['Container']))
+        inbox_graph.add((URIRef(INBOX_URL), RDF.type,
+                         ldp['BasicContainer']))
+        inbox_graph.bind('ldp', ldp)
+        _inbox_graph = inbox_graph
+    return _inbox_graph
 
 
 @ldn_inbox.route("/tracker/inbox/", methods=["HEAD", "OPTIONS"])
@@ -65,11 +81,11 @@ def get_inbox(notification_id=None):
             accept_hdr == '*/*' or \
             'text/html' in accept_hdr:
         resp = make_response(
-            inbox_graph.serialize(format='application/ld+json'))
+            get_inbox_graph().serialize(format='application/ld+json'))
         resp.headers['Content-Type'] = 'application/ld+json'
     elif request.headers['Accept'] in ACCEPTED_TYPES:
         resp = make_response(
-            inbox_graph.serialize(format=request.headers['Accept']))
+            get_inbox_graph().serialize(format=request.headers['Accept']))
         resp.headers['Content-Type'] = request.headers['Accept']
     else:
         return 'Requested format unavailable', 415
@@ -86,6 +102,7 @@ def get_inbox(notification_id=None):
 
 
 @ldn_inbox.route("/tracker/inbox/", methods=["POST"])
+@metrics.timed("inbox_post_seconds")
 def post_inbox():
     """
     The POST endpoint for the LDN inbox. Can only process
@@ -120,6 +137,17 @@ def post_inbox():
 
     # TODO: Store message for received message or process audit
 
+    if admission.enabled():
+        admitted, reason = admission.check()
+        if not admitted:
+            LOG.info(f"Message not admitted: {reason}")
+            if admission.config().get("mode") == admission.DEFER and \
+                    admission.defer(payload):
+                resp.headers['Location'] = INBOX_URL
+                return resp, 202
+            return "Tracker workers overloaded: " + reason, 503, \
+                {"Retry-After": str(admission.retry_after())}
+
     # Queue tasks in the background using celery
     proccessed_no_errors = queue_tasks(payload)
     if not proccessed_no_errors:
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+from flask import Blueprint, make_response
+from artifact_tracker.utils import metrics as tracker_metrics
+
+metrics = Blueprint("metrics", __name__)
+
+
+@metrics.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Exposes the metrics of the trackers, the inbox and the delivery
+    aggregated across all the processes, in the prometheus text format.
+    :return: Flask response object.
+    """
+    if not tracker_metrics.enabled():
+        return "Metrics are not enabled", 404
+
+    resp = make_response(tracker_metrics.render())
+    resp.headers["Content-Type"] = "text/plain; version=0.0.4"
+    return resp
@@ -0,0 +1,81 @@
+from artifact_tracker import tracker_app
+from datetime import datetime, timedelta
+import hashlib
+
+db = tracker_app.db
+
+
+class IdCache(db.Model):
+    """
+    Used to cache portal ids that have to be resolved with an extra API
+    request (e.g. the blogger blog id of a blog url) across tracker runs.
+    """
+
+    portal_name = db.Column(db.String(255), primary_key=True)
+    # the sha1 of the lookup key, as urls are too long for an index key
+    key_hash = db.Column(db.String(40), primary_key=True)
+    lookup_key = db.Column(db.String(2000))
+
+    value = db.Column(db.String(255))
+    cached_at = db.Column(db.DateTime())
+
+    @staticmethod
+    def hash_key(lookup_key: str) -> str:
+        """
+        :param lookup_key: (str) the key an id is resolved from.
+        :return: (str) the hex sha1 of the key.
+        """
+        return hashlib.sha1(lookup_key.encode()).hexdigest()
+
+    @staticmethod
+    def get_value(portal_name: str, lookup_key: str, ttl: int=None):
+        """
+        Returns the cached id for the lookup key, if it was cached less
+        than `ttl` seconds ago.
+
+        :param portal_name: (str) the name of the portal.
+        :param lookup_key: (str) the key the id was resolved from.
+        :param ttl: (int) the time to live of the cached id in seconds.
+        :return: (str) the cached id or None.
+        """
+        with tracker_app.app.app_context():
+            entry: IdCache = IdCache.query.filter_by(
+                portal_name=portal_name,
+                key_hash=IdCache.hash_key(lookup_key)).first()
+            if not entry:
+                return None
+            if ttl and entry.cached_at < \
+                    datetime.now() - timedelta(seconds=ttl):
+                return None
+            return entry.value
+
+    @staticmethod
+    def set_value(portal_name: str, lookup_key: str, value: str=None):
+        """
+        Caches the id resolved for the lookup key. Removes the cached id
+        when `value` is empty.
+
+        :param portal_name: (str) the name of the portal.
+        :param lookup_key: (str) the key the id was resolved from.
+        :param value: (str) the resolved id.
+        :return: None
+        """
+        with tracker_app.app.app_context():
+            entry = IdCache.query.filter_by(
+                portal_name=portal_name,
+                key_hash=IdCache.hash_key(lookup_key)).first()
+            if not value:
+                if entry:
+                    tracker_app.db.session.delete(entry)
+                    tracker_app.db.session.commit()
+                return
+            if not entry:
+                entry = IdCache()
+                entry.portal_name = portal_name
+                entry.key_hash = IdCache.hash_key(lookup_key)
+                entry.lookup_key = lookup_key
+            entry.value = value
+            entry.cached_at = datetime.now()
+
+            tracker_app.db.session.add(entry)
+            tracker_app.db.session.commit()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Creation and migration of the tracker's database schema.
+
+The schema is no longer created when the app is imported. It is created,
+and upgraded, explicitly with the `flask init-db` command before the web
+app and the workers are started.
+"""
+
+from sqlalchemy import inspect, text
+
+
+def import_models():
+    """
+    Imports all the models, so that their tables are known to the
+    metadata of the db.
+
+    :return: None
+    """
+    from artifact_tracker.store.tracker_task import TrackerTask # noqa: ignore=F401
+    from artifact_tracker.store.id_cache import IdCache # noqa: ignore=F401
+    from artifact_tracker.store.tracker_checkpoint import TrackerCheckpoint # noqa: ignore=F401
+
+
+def upgrade(db):
+    """
+    Creates the missing tables and adds the columns that are missing from
+    the existing tables. Columns can only be added, so new columns of
+    existing models must be nullable or have a server default.
+
+    :param db: the SQL-Alchemy database object.
+    :return: (list) the names of the columns added, as `table.column`.
+    """
+    import_models()
+    db.create_all()
+
+    engine = db.engine
+    preparer = engine.dialect.identifier_preparer
+    inspector = inspect(engine)
+    added = []
+    for table in db.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if column.primary_key:
+                raise ValueError(
+                    f"Cannot add primary key column {column.name} "
+                    f"to the existing table {table.name}.")
+            db.session.execute(text("ALTER TABLE {} ADD COLUMN {} {}".format(
+                preparer.quote(table.name),
+                preparer.quote(column.name),
+                column.type.compile(dialect=engine.dialect))))
+            added.append(f"{table.name}.{column.name}")
+    db.session.commit()
+    return added
@@ -0,0 +1,102 @@
+from artifact_tracker import tracker_app
+from datetime import datetime, timedelta
+
+db = tracker_app.db
+
+# seconds after which a checkpoint is considered stale, as the cursors of
+# most portals expire (e.g. OAI-PMH resumption tokens)
+CHECKPOINT_TTL = 86400
+
+
+class TrackerCheckpoint(db.Model):
+    """
+    Used to resume the multi-page runs of a tracker for an actor after a
+    crash or a deploy. The cursor of the next page and the count of the
+    events delivered are saved after each page, and the checkpoint is
+    removed when the run completes.
+    """
+
+    actor_id = db.Column(db.String(255), primary_key=True)
+    portal_name = db.Column(db.String(255), primary_key=True)
+
+    # the cursor of the next page: url, page token, max_id, ...
+    cursor = db.Column(db.String(2000))
+    # portal specific state of the run, e.g. the etag of the first page
+    state = db.Column(db.JSON())
+    delivered = db.Column(db.Integer(), default=0)
+    pages = db.Column(db.Integer(), default=0)
+    updated_at = db.Column(db.DateTime())
+
+    @staticmethod
+    def load(actor_id: str, portal_name: str, ttl: int=None) -> dict:
+        """
+        Returns the checkpoint of the last interrupted run, if it was
+        saved less than `ttl` seconds ago.
+
+        :param actor_id: (str) the actor.
+        :param portal_name: (str) the name of the portal.
+        :param ttl: (int) the time to live of the checkpoint in seconds.
+        :return: (dict) the cursor, state, delivered and pages of the
+        checkpoint or None.
+        """
+        ttl = ttl or CHECKPOINT_TTL
+        with tracker_app.app.app_context():
+            entry: TrackerCheckpoint = TrackerCheckpoint.query.filter_by(
+                actor_id=actor_id,
+                portal_name=portal_name).first()
+            if not entry or not entry.cursor:
+                return None
+            if entry.updated_at < datetime.now() - timedelta(seconds=ttl):
+                return None
+            return {
+                "cursor": entry.cursor,
+                "state": entry.state or {},
+                "delivered": entry.delivered or 0,
+                "pages": entry.pages or 0
+            }
+
+    @staticmethod
+    def save(actor_id: str, portal_name: str, cursor: str,
+             delivered: int=0, state: dict=None):
+        """
+        Saves the checkpoint of a run after a page was processed.
+
+        :param actor_id: (str) the actor.
+        :param portal_name: (str) the name of the portal.
+        :param cursor: (str) the cursor of the next page.
+        :param delivered: (int) the events delivered by the run so far.
+        :param state: (dict) the portal specific state of the run.
+        :return: None
+        """
+        with tracker_app.app.app_context():
+            entry = TrackerCheckpoint.query.filter_by(
+                actor_id=actor_id,
+                portal_name=portal_name).first()
+            if not entry:
+                entry = TrackerCheckpoint()
+                entry.actor_id = actor_id
+                entry.portal_name = portal_name
+                entry.pages = 0
+            entry.cursor = str(cursor)
+            entry.state = state
+            entry.delivered = delivered
+            entry.pages = (entry.pages or 0) + 1
+            entry.updated_at = datetime.now()
+
+            tracker_app.db.session.add(entry)
+            tracker_app.db.session.commit()
+
+    @staticmethod
+    def clear(actor_id: str, portal_name: str):
+        """
+        Removes the checkpoint once the run completed.
+
+        :param actor_id: (str) the actor.
+        :param portal_name: (str) the name of the portal.
+        :return: None
+        """
+        with tracker_app.app.app_context():
+            TrackerCheckpoint.query.filter_by(
+                actor_id=actor_id,
+                portal_name=portal_name).delete()
+            tracker_app.db.session.commit()
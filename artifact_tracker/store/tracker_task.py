@@ -20,6 +20,15 @@ class TrackerTask(db.Model):
     # Status of task
     completed = db.Column(db.Boolean(), default=False)
 
+    # Per stage summary of the last traced run
+    last_run_summary = db.Column(db.JSON())
+
+    # High-water marks of the completed runs, used when the orchestrator
+    # sends no lastTracked or lastToken: the newest published time of
+    # the delivered events, and the portal's token (ETag, since_id, ...)
+    high_water_published = db.Column(db.String(32))
+    high_water_token = db.Column(db.String(255))
+
     # Third primary key, but can't be null. We treat portals with portal_urls
     # as batch portals - synchronous per portal_url
     # portal_url = db.Column(db.String(2000))
@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
+from artifact_tracker.store.id_cache import IdCache
 from datetime import datetime
-import requests
 
 PORTAL_NAME = "blogger"
 LOG = tracker_app.log
@@ -31,11 +31,14 @@ class BloggerTracker(Tracker):
             LOG.debug("no users. exiting.")
             return False
 
-        for user in self.users:
+        for n, user in enumerate(self.users):
+            if n and self.split_over_memory_budget(self.users[n:]):
+                LOG.debug("remaining users queued in a new task.")
+                break
+
             actor_id = user.get("id")
             portal_user_id = user.get("userId")
             portal_url = user.get("portalUrl")
-            api_key = user.get("apiKey")
             last_tracked = user.get("lastTracked")
 
             if not portal_url:
@@ -46,96 +49,127 @@ class BloggerTracker(Tracker):
                 LOG.debug("user id not configured. skipping.")
                 continue
 
-            blog_domain_url = self.portal.get("event_urls", {}).\
-                get("blog_domain_url").format(portal_url, api_key)
-            resp = requests.get(blog_domain_url)
-            LOG.debug("getting blogger user blogs: %s" % blog_domain_url)
-            if resp.status_code != 200:
+            # the requests of a user take a credential of the pool
+            credential = self.credential(user)
+            status_code, blog_id = self.get_blog_id(portal_url, credential)
+            if not blog_id:
                 LOG.debug("non-200 response code received. "
                           "Updating tracker status and exiting.")
                 self.update_tracker_status(
                     actor_id=actor_id,
-                    status_code=resp.status_code,
-                    completed=True)
-                continue
-
-            data = resp.json()
-            # skip portal if no posts
-            if data.get("posts", {}).get("totalItems") == 0:
-                LOG.debug("No blogs posts found. skipping.")
-                self.update_tracker_status(
-                    actor_id=actor_id,
-                    status_code=None,
+                    status_code=status_code,
                     completed=True)
                 continue
 
-            last_updated = datetime.strptime(
-                "".join(data.get("updated").rsplit(":", 1)),
-                "%Y-%m-%dT%H:%M:%S%z")
-            last_updated = last_updated.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-            if last_tracked:
-                # Dedup by comparing blog last updated time to
-                # last_tracked
-                LOG.debug("last tracked date value found.")
-                if last_tracked == last_updated:
-                    LOG.debug(
-                        "duplicate blog entries found. skipping as2 payload")
-                    self.update_tracker_status(
-                        actor_id=actor_id,
-                        status_code=None,
-                        completed=True)
-                    continue
-
-            blog_id = data.get("id")
             blog_posts_url = self.portal.get("event_urls", {}).\
-                get("blog_posts_url").format(blog_id, api_key)
-
-            posts_resp = requests.get(blog_posts_url)
-            posts_data = posts_resp.json()
-            if posts_resp.status_code != 200:
-                LOG.debug("non-200 response code received. "
-                          "Updating tracker status and exiting.")
-                continue
-
+                get("blog_posts_url").format(blog_id, credential.get("apiKey"))
             prov_url = self.portal.get("event_urls", {})\
                 .get("blog_posts_url").format(blog_id, "")
-            acts = self.make_as2_payload(
-                    events=posts_data,
-                    actor_id=actor_id,
-                    portal_url=portal_url,
-                    portal_user_id=portal_user_id,
-                    prov_api_url=prov_url)
-            while posts_data.get("nextPageToken"):
-                nextPage = posts_data.get("nextPageToken")
-                posts_resp = requests.get(
-                    blog_posts_url + "&pageToken={}".format(nextPage))
-                posts_data = posts_resp.json()
+            if last_tracked:
+                # only the posts published since the last run are requested
+                LOG.debug("last tracked date value found.")
+                blog_posts_url += "&startDate={}".format(last_tracked)
+                prov_url += "&startDate={}".format(last_tracked)
+
+            page_url = blog_posts_url
+            page_prov_url = prov_url
+            stats = {"delivered": 0}
+            # a first run walks back all the posts of the blog, in chained
+            # tasks of a bounded number of pages
+            budget = self.backfill_budget(user)
+            continued = False
+            # resume an interrupted run from its next page token, unless
+            # the token was issued for another start date
+            checkpoint = self.load_checkpoint(actor_id)
+            if checkpoint and checkpoint["state"].get(
+                    "lastTracked") == last_tracked:
+                stats["delivered"] = checkpoint["delivered"]
+                page_url = blog_posts_url + \
+                    "&pageToken={}".format(checkpoint["cursor"])
+                page_prov_url = prov_url + \
+                    "&pageToken={}".format(checkpoint["cursor"])
+            while page_url:
+                posts_resp = self.get(page_url, credential=credential)
                 if posts_resp.status_code != 200:
                     LOG.debug("non-200 response code received. "
                               "Updating tracker status and exiting.")
-                    self.update_tracker_status(
-                        actor_id=actor_id,
-                        status_code=posts_resp.status_code,
-                        completed=True)
+                    if posts_resp.status_code == 404:
+                        # the blog id is stale, resolve it on the next run
+                        IdCache.set_value(PORTAL_NAME, portal_url)
                     break
+                posts_data = self.parse_json(posts_resp, actor_id)
 
                 acts = self.make_as2_payload(
                     events=posts_data,
                     actor_id=actor_id,
                     portal_url=portal_url,
                     portal_user_id=portal_user_id,
-                    prov_api_url=prov_url + "&pageToken={}".format(nextPage))
-
+                    prov_api_url=page_prov_url)
                 post_to_ldn_inbox(acts,
                                   from_datetime=last_tracked,
-                                  inbox_url=self.ldn_inbox_url)
+                                  inbox_url=self.ldn_inbox_url,
+                                  portal_name=self.portal_name,
+                                  stats=stats)
+                if budget:
+                    budget.page()
+
+                next_page = posts_data.get("nextPageToken")
+                page_url = None
+                if next_page:
+                    self.save_checkpoint(
+                        actor_id, next_page,
+                        delivered=stats["delivered"],
+                        state={"lastTracked": last_tracked})
+                    page_url = blog_posts_url + \
+                        "&pageToken={}".format(next_page)
+                    page_prov_url = prov_url + \
+                        "&pageToken={}".format(next_page)
+                    if budget and budget.spent():
+                        # the chained task resumes from the checkpoint
+                        continued = True
+                        break
+            else:
+                self.clear_checkpoint(actor_id)
+
+            if continued:
+                self.continue_backfill(user, budget)
+                continue
+
             self.update_tracker_status(
                 actor_id=actor_id,
                 status_code=posts_resp.status_code,
                 completed=True)
         return True
 
+    def get_blog_id(self, portal_url: str, credential: dict) -> (int, str):
+        """
+        Resolves the blogger blog id of a blog url. The id of a blog
+        almost never changes, so resolved ids are cached across runs
+        for `blog_id_ttl` seconds.
+
+        :param portal_url: (str) the url of the blog.
+        :param credential: (dict) the credential with the blogger api key.
+        :return: (tuple) the status code of the blogs/byurl response, or
+        None when the cached id was used, and the blog id.
+        """
+        ttl = self.portal.get("blog_id_ttl")
+        blog_id = IdCache.get_value(PORTAL_NAME, portal_url, ttl=ttl)
+        if blog_id:
+            LOG.debug("blog id found in cache: %s" % blog_id)
+            return None, blog_id
+
+        blog_domain_url = self.portal.get("event_urls", {}).\
+            get("blog_domain_url").format(portal_url,
+                                          credential.get("apiKey"))
+        resp = self.get(blog_domain_url, credential=credential)
+        LOG.debug("getting blogger user blogs: %s" % blog_domain_url)
+        if resp.status_code != 200:
+            return resp.status_code, None
+
+        blog_id = self.parse_json(resp).get("id")
+        IdCache.set_value(PORTAL_NAME, portal_url, blog_id)
+        return resp.status_code, blog_id
+
     def make_as2_payload(self,
                          events: dict,
                          actor_id: str,
@@ -143,7 +177,7 @@ class BloggerTracker(Tracker):
                          portal_url: str,
                          prov_api_url: str):
 
-        for event in events.get("items"):
+        for event in events.get("items", []):
 
             # skip entries that don't match the given user_id
             if event.get("author", {}).get("id") != portal_user_id:
@@ -187,9 +221,3 @@ class BloggerTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = BloggerTracker(**kwargs)
-    tracker.get_events()
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
 from sickle import Sickle, oaiexceptions
@@ -10,6 +10,30 @@ PORTAL_NAME = "figshare"
 LOG = tracker_app.log
 
 
+def _token(records) -> str:
+    """
+    :return: (str) the resumption token of the next page of a harvest.
+    """
+    token = getattr(records, "resumption_token", None)
+    return token.token if token else None
+
+
+class TrackerSickle(Sickle):
+    """
+    Sickle client sending its OAI-PMH requests through the tracker's
+    `get` method, like the requests of the other trackers.
+    """
+
+    def __init__(self, endpoint: str, tracker: Tracker, **kwargs):
+        super(TrackerSickle, self).__init__(endpoint, **kwargs)
+        self.tracker = tracker
+
+    def _request(self, kwargs):
+        return self.tracker.get(self.endpoint,
+                                params=kwargs,
+                                **self.request_args)
+
+
 class FigshareTracker(Tracker):
 
     def get_events(self, **kwargs):
@@ -42,12 +66,25 @@ class FigshareTracker(Tracker):
                     "%Y-%m-%dT%H:%M:%SZ")
 
         LOG.debug("searching oai-pmh interface: %s" % records_url)
+        # the harvest is shared by all the users, and is checkpointed
+        # under its start date
+        run_id = "oai-pmh:{}".format(from_datetime_str)
+        checkpoint = self.load_checkpoint(run_id)
         try:
-            sickle = Sickle(records_url)
-            records = sickle.ListRecords(**{
-                'metadataPrefix': 'oai_dc',
-                'from': from_datetime_str
-            })
+            sickle = TrackerSickle(records_url, self)
+            records = None
+            if checkpoint:
+                try:
+                    records = sickle.ListRecords(
+                        resumptionToken=checkpoint["cursor"])
+                except oaiexceptions.BadResumptionToken:
+                    LOG.debug("resumption token expired. starting over.")
+                    checkpoint = None
+            if not records:
+                records = sickle.ListRecords(**{
+                    'metadataPrefix': 'oai_dc',
+                    'from': from_datetime_str
+                })
             if records.oai_response.http_response.status_code != 200:
                 LOG.debug(
                     "non-200 response code received. "
@@ -64,7 +101,9 @@ class FigshareTracker(Tracker):
         self.parse_records(
             records,
             from_datetime,
-            last_run)
+            last_run,
+            run_id=run_id,
+            checkpoint=checkpoint)
 
     def start_tracker(self):
         """
@@ -95,6 +134,8 @@ class FigshareTracker(Tracker):
         most_recent_date = None
         for user in users:
             last_tracked = user.get("lastTracked")
+            if not last_tracked:
+                continue
             from_datetime = datetime.strptime(
                 last_tracked, "%Y-%m-%dT%H:%M:%SZ")
             if not most_recent_date:
@@ -120,13 +161,25 @@ class FigshareTracker(Tracker):
     def parse_records(self,
                       records,
                       from_datetime,
-                      last_run):
+                      last_run,
+                      run_id: str=None,
+                      checkpoint: dict=None):
         """
         Iterates through OAI-PMH XML response and check if any of the figshare
         portal users are included in the response. Then create the activity
         streams for this user.
+
+        The resumption token of every page is checkpointed under `run_id`
+        once the records of the previous pages were processed.
         """
+        stats = {"delivered": (checkpoint or {}).get("delivered", 0)}
+        token = _token(records)
         for count, record in enumerate(records):
+            if run_id and _token(records) != token:
+                # the records of the page fetched with `token` start here
+                self.save_checkpoint(run_id, token,
+                                     delivered=stats["delivered"])
+                token = _token(records)
             date = ""
             try:
                 date = datetime.strptime(
@@ -154,12 +207,17 @@ class FigshareTracker(Tracker):
                 act = self.make_as2_payload(record.metadata, users_found)
                 post_to_ldn_inbox(
                     events=act,
-                    from_datetime=from_datetime,
-                    inbox_url=self.ldn_inbox_url)
+                    from_datetime=from_datetime.strftime(
+                        "%Y-%m-%dT%H:%M:%SZ"),
+                    inbox_url=self.ldn_inbox_url,
+                    portal_name=self.portal_name,
+                    stats=stats)
 
         self.complete_tracker(
             records.oai_response.http_response.status_code,
             last_tracked=last_run)
+        if run_id:
+            self.clear_checkpoint(run_id)
 
     def make_as2_payload(self,
                          event,
@@ -220,9 +278,3 @@ class FigshareTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = FigshareTracker(**kwargs)
-    tracker.get_events()
@@ -3,61 +3,278 @@
 The Github Event Tracker.
 """
 
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
-import requests
+from artifact_tracker.utils import high_water
+from artifact_tracker.utils.breaker import CircuitOpenError
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import re
 
 PORTAL_NAME = "github"
 LOG = tracker_app.log
 
-# a map of various object type names that github
-# uses for each of the different event types that
-# their API supports
-EVENT_TYPES = {
-    "CommitCommentEvent": "comment",
-    "CreateEvent": "",
-    "DeleteEvent": "delete",
-    "DeploymentEvent": "deployment",
-    "DeploymentStatusEvent": "deployment_status",
-    "DownloadEvent": "download",
-    "FollowEvent": "follow",
-    "ForkEvent": "fork",
-    "ForkApplyEvent": "fork_apply",
-    "GistEvent": "gist",
-    "GollumEvent": "gollum",
-    "IssueCommentEvent": "comment",
-    "IssuesEvent": "issue",
-    "LabelEvent": "label",
-    "MemberEvent": "member",
-    "MembershipEvent": "membership",
-    "MilestoneEvent": "milestone",
-    "OrganizationEvent": "organization",
-    "PageBuildEvent": "page_build",
-    "PullRequestEvent": "pull_request",
-    "PushEvent": "commits",
-    "ReleaseEvent": "release",
-    "RepositoryEvent": "repository",
-    "StatusEvent": "status",
-    "WatchEvent": "watch"
-}
+# matches the parts of a github API url that are not in the HTML url
+API_URL_PARTS = re.compile(r"api\.|repos/|users/")
+# the query params of the credentials, not saved in the checkpoints
+CREDENTIAL_PARAMS = ("client_id", "client_secret")
+
+
+def _make_html_url(url):
+    """
+    Converts the API url in the GitHub response to HTML URL
+    for use in the views.
+    :param url: the API url.
+    :return: the HTML url.
+    """
+    if not url:
+        return
+    return API_URL_PARTS.sub("", url)
+
+
+def _strip_credentials(url: str) -> str:
+    """
+    Removes the credentials from the query of a page url.
+    """
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in CREDENTIAL_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _add_query(url: str, query: str) -> str:
+    """
+    Appends the `query` string to the query of the url.
+    """
+    return url + ("&" if "?" in url else "?") + query
 
-# a map of event type name and the corresponding
-# method to invoke dynamically.
-# TODO: ReleaseEvent, ForkEvent, DeleteEvent
+
+def _authorize(url: str, headers: dict, credential: dict) -> (str, dict):
+    """
+    Adds a credential to a request: a personal access `token` in the
+    Authorization header, or the `client_id` and `client_secret` query
+    params of an OAuth app.
+
+    :return: (tuple) the url and the headers of the request.
+    """
+    if credential.get("token"):
+        return url, dict(headers,
+                         Authorization="token " + credential["token"])
+    return _add_query(url, "client_id={}&client_secret={}".format(
+        credential.get("apiKey"), credential.get("apiSecret"))), headers
+
+
+def _path(*keys):
+    """
+    Returns a getter for the value at the path of `keys` in an event.
+    Missing keys on the path result in None.
+    """
+    head, tail = keys[:-1], keys[-1]
+
+    def get(event, portal_username):
+        for key in head:
+            event = event.get(key) or {}
+        return event.get(tail)
+    return get
+
+
+def _html(getter):
+    """
+    Converts the API url returned by `getter` into its HTML url.
+    """
+    def get(event, portal_username):
+        return _make_html_url(getter(event, portal_username))
+    return get
+
+
+def _push_commit_url(event, portal_username):
+    commits = event.get("payload", {}).get("commits")
+    if isinstance(commits, list) and len(commits) > 0:
+        return _make_html_url(commits[0].get("url"))
+
+
+def _create_url(event, portal_username):
+    repo_url = _make_html_url(event.get("repo", {}).get("url"))
+    if event.get("payload", {}).get("ref_type", "") == "tag":
+        return "{}/releases/tag/{}".format(
+            repo_url, event.get("payload", {}).get("ref"))
+    return repo_url
+
+
+def _pull_request_actor(event, portal_username):
+    """
+    Three possible AS2 activities by the actor. Accept, TentativeReject,
+    or Offer.
+    """
+    pull_request = event.get("payload", {}).get("pull_request") or {}
+    if pull_request.get("user", {}).get("login") == portal_username:
+        # User offered pull request
+        return pull_request.get("user"), ["Offer",
+                                          "tracker:ArtifactInteraction"]
+    elif pull_request.get("merged_by"):
+        # Actor merged a pull request into the repository
+        return pull_request.get("merged_by"), ["Accept",
+                                               "tracker:ArtifactInteraction"]
+    # Actor closed the issue, Tentatively Rejecting it
+    # (could reopen later and be used)
+    return event.get("actor"), ["TentativeReject",
+                                "tracker:ArtifactInteraction"]
+
+
+SOURCE_CODE = ["Link", "Document", "schema:SoftwareSourceCode"]
+COMMENT = ["Link", "Note", "schema:Comment"]
+
+# a map of the supported github event types and how each of them is
+# converted to an AS2 message:
+#   actor: getter for the actor metadata of the event.
+#   type: the AS2 event types, or with a callable `actor`, None, as
+#       the actor getter returns the metadata and the types.
+#   target: getter for the API url of the target collection.
+#   item_type: the AS2 type of the object item.
+#   href: getter for the href of the object item.
+#   optional_href: when set, the object has no items if there is no href.
+# https://developer.github.com/v3/activity/events/types/
 EVENT_MAP = {
-    "CreateEvent": "on_create_event",
-    # "ReleaseEvent": "on_create_event",
-    # "ForkEvent": "on_create_event",
-    "WatchEvent": "on_watch_event",
-    "PushEvent": "on_push_event",
-    "IssuesEvent": "on_issues_event",
-    "IssueCommentEvent": "on_issue_comment_event",
-    "PullRequestEvent": "on_pull_request_event",
-    "CommitCommentEvent": "on_commit_comment_event"
+    "CreateEvent": {
+        "actor": _path("actor"),
+        "type": ["Create", "tracker:ArtifactCreation"],
+        "target": _path("actor", "url"),
+        "item_type": SOURCE_CODE,
+        "href": _create_url
+    },
+    "ReleaseEvent": {
+        "actor": _path("actor"),
+        "type": ["Create", "tracker:ArtifactCreation"],
+        "target": _path("repo", "url"),
+        "item_type": SOURCE_CODE,
+        "href": _path("payload", "release", "html_url")
+    },
+    "ForkEvent": {
+        "actor": _path("actor"),
+        "type": ["Create", "tracker:ArtifactCreation"],
+        "target": _path("repo", "url"),
+        "item_type": SOURCE_CODE,
+        "href": _path("payload", "forkee", "html_url")
+    },
+    "DeleteEvent": {
+        "actor": _path("actor"),
+        "type": ["Delete", "tracker:ArtifactInteraction"],
+        "target": _path("repo", "url"),
+        "item_type": SOURCE_CODE,
+        "href": _html(_path("repo", "url"))
+    },
+    "WatchEvent": {
+        # equivalent to starring a repository
+        "actor": _path("actor"),
+        "type": ["Like", "tracker:ArtifactInteraction"],
+        "target": _path("repo", "url"),
+        "item_type": SOURCE_CODE,
+        "href": _html(_path("repo", "url"))
+    },
+    "PushEvent": {
+        "actor": _path("actor"),
+        "type": ["Add", "tracker:ArtifactInteraction"],
+        "target": _path("repo", "url"),
+        "item_type": SOURCE_CODE,
+        "href": _push_commit_url,
+        "optional_href": True
+    },
+    "IssuesEvent": {
+        "actor": _path("actor"),
+        "type": ["Add", "tracker:ArtifactInteraction"],
+        "target": _path("payload", "issue", "repository_url"),
+        "item_type": ["Link", "Article", "schema:Question"],
+        "href": _path("payload", "issue", "html_url")
+    },
+    "IssueCommentEvent": {
+        "actor": _path("payload", "comment", "user"),
+        "type": ["Add", "tracker:ArtifactInteraction"],
+        "target": _path("payload", "issue", "repository_url"),
+        "item_type": COMMENT,
+        "href": _path("payload", "comment", "html_url")
+    },
+    "PullRequestEvent": {
+        "actor": _pull_request_actor,
+        "type": None,
+        "target": _path("payload", "pull_request", "base", "repo",
+                        "html_url"),
+        "item_type": SOURCE_CODE,
+        "href": _path("payload", "pull_request", "html_url")
+    },
+    "CommitCommentEvent": {
+        "actor": _path("payload", "comment", "user"),
+        "type": ["Add", "tracker:ArtifactInteraction"],
+        "target": _path("repo", "url"),
+        "item_type": COMMENT,
+        "href": _path("payload", "comment", "html_url")
+    }
 }
 
 
+def _compile_converter(spec: dict):
+    """
+    Compiles the mapping of an event type in EVENT_MAP into a function
+    that converts an event of that type into an AS2 message.
+
+    :param spec: (dict) the mapping of the event type.
+    :return: the converter function.
+    """
+    get_actor = spec["actor"]
+    get_target = spec["target"]
+    get_href = spec["href"]
+    optional_href = spec.get("optional_href", False)
+    item_type = tuple(spec["item_type"])
+    if spec["type"] is None:
+        get_actor_and_type = get_actor
+    else:
+        event_type = list(spec["type"])
+
+        def get_actor_and_type(event, portal_username):
+            return get_actor(event, portal_username), event_type[:]
+
+    def convert(tracker, event, actor_id, portal_username, etag):
+        as2_payload = template_as2(
+            tracker.event_base_url,
+            PORTAL_NAME,
+            last_token=etag)
+        as2_payload["activity"]["prov:used"].append(
+            {"@id": tracker.portal.get("portal_url")})
+
+        as2_event = as2_payload["event"]
+        actor_md, as2_type = get_actor_and_type(event, portal_username)
+        as2_event["actor"] = tracker.get_actor_md(
+            actor_md or {},
+            actor_id,
+            portal_username)
+        as2_event["target"] = {
+            "id": _make_html_url(get_target(event, portal_username)),
+            "type": ["Collection"]
+        }
+        as2_event["published"] = event.get("created_at")
+        as2_type.append("tracker:Tracker")
+        as2_event["type"] = as2_type
+
+        obj = {}
+        href = get_href(event, portal_username)
+        if href or not optional_href:
+            items = [{
+                "type": list(item_type),
+                "href": href
+            }]
+            obj["totalItems"] = len(items)
+            obj["items"] = items
+        obj["type"] = "Collection"
+        as2_event["object"] = obj
+
+        return as2_payload
+    return convert
+
+
+# the converters of the supported event types, compiled once at import
+CONVERTERS = {event_type: _compile_converter(spec)
+              for event_type, spec in EVENT_MAP.items()}
+
+
 class GithubTracker(Tracker):
     """
     The Github event tracker.
@@ -85,8 +302,6 @@ class GithubTracker(Tracker):
         for user in self.users:
             actor_id = user.get("id")
             portal_username = user.get("username")
-            api_key = user.get("apiKey")
-            api_secret = user.get("apiSecret")
             last_tracked = user.get("lastTracked")
             last_token = user.get("lastToken")
 
@@ -101,62 +316,122 @@ class GithubTracker(Tracker):
             user_timeline_url = self.portal.get("event_urls", {}).\
                 get("user_events_url").format(portal_username)
 
-            user_timeline_url = user_timeline_url + \
-                "?client_id={}&client_secret={}".format(api_key, api_secret)
-
-            LOG.debug("getting user events: %s" % user_timeline_url)
-            resp = kwargs.get("test_response")
-            if not resp:
-                try:
-                    resp = requests.get(user_timeline_url,
-                                        headers=headers)
-                except Exception:
-                    LOG.debug("Error retrieving response from API.")
+            # resume an interrupted run from the next page it had to fetch
+            checkpoint = self.load_checkpoint(actor_id)
+            # a first run walks back the whole history of the user, in
+            # chained tasks of a bounded number of pages
+            budget = self.backfill_budget(user)
+            stats = {"delivered": 0}
+            if checkpoint:
+                etag = checkpoint["state"].get("etag", "")
+                # the first page of the run was received
+                status_code = 200
+                stats["delivered"] = checkpoint["delivered"]
+                next_page = {"url": checkpoint["cursor"]}
+            else:
+                LOG.debug("getting user events: %s" % user_timeline_url)
+                resp = kwargs.get("test_response")
+                if not resp:
+                    # every request takes a credential of the pool
+                    credential = self.credential(user)
+                    url, auth_headers = _authorize(
+                        user_timeline_url, headers, credential)
+                    try:
+                        resp = self.get(url, credential=credential,
+                                        headers=auth_headers)
+                    except CircuitOpenError:
+                        raise
+                    except Exception:
+                        LOG.debug("Error retrieving response from API.")
+                        continue
+
+                if resp.status_code != 200:
+                    LOG.debug(
+                        "non-200 response code received. updating tracker "
+                        "status and exiting.")
+                    self.update_tracker_status(
+                        actor_id=actor_id,
+                        status_code=resp.status_code,
+                        completed=True)
                     continue
 
-            if resp.status_code != 200:
-                LOG.debug(
-                    "non-200 response code received. updating tracker "
-                    "status and exiting.")
-                self.update_tracker_status(
-                    actor_id=actor_id,
-                    status_code=resp.status_code,
-                    completed=True)
-                continue
+                status_code = resp.status_code
+                etag = resp.headers.get("ETag", "").strip()
+                next_page = resp.links.get("next")
+                self._post_page(resp, actor_id, portal_username, etag,
+                                last_tracked, stats)
+                if budget:
+                    budget.page()
+            # the etag of the first page, kept in the checkpoints, is the
+            # token of the next run
+            high_water.observe(actor_id, token=etag)
 
-            received_events: list = resp.json()
-            # LOG.debug(received_events)
-            LOG.debug("received %s events." % len(received_events))
             # getting next pages of events from link header
             # only events from the past 90 days are returned by the API!
-            next_page = resp.links.get("next")
+            # every page is posted as soon as it is received, and the
+            # next page is checkpointed so that the run can resume there
             while next_page:
+                self.save_checkpoint(
+                    actor_id,
+                    _strip_credentials(next_page.get("url")),
+                    delivered=stats["delivered"],
+                    state={"etag": etag})
+                if budget and budget.spent():
+                    # the chained task resumes from the checkpoint
+                    break
                 LOG.debug("fetching next url found in lh: %s" % next_page)
-                rec_events_resp = requests.get(next_page.get("url"),
-                                               headers=headers)
+                credential = self.credential(user)
+                url, auth_headers = _authorize(
+                    _strip_credentials(next_page.get("url")), headers,
+                    credential)
+                rec_events_resp = self.get(url, credential=credential,
+                                           headers=auth_headers)
+                if rec_events_resp.status_code != 200:
+                    # the next run resumes from this page
+                    LOG.debug("non-200 response code received for page.")
+                    next_page = None
+                    break
                 next_page = rec_events_resp.links.get("next")
-                received_events.extend(rec_events_resp.json())
-                LOG.debug("received %s events." % len(received_events))
-            LOG.debug("Total events: %s" % len(received_events))
-
-            etag = resp.headers.get("ETag", "").strip()
-            acts = self.make_as2_payload(
-                events=received_events,
-                actor_id=actor_id,
-                portal_username=portal_username,
-                etag=etag
-                )
+                self._post_page(rec_events_resp, actor_id, portal_username,
+                                etag, last_tracked, stats)
+                if budget:
+                    budget.page()
+            else:
+                self.clear_checkpoint(actor_id)
+            LOG.debug("Total events: %s" % stats["delivered"])
+
+            if next_page and budget and budget.spent():
+                self.continue_backfill(user, budget)
+                continue
 
             self.update_tracker_status(
                 actor_id=actor_id,
-                status_code=resp.status_code,
+                status_code=status_code,
                 completed=True)
-            post_to_ldn_inbox(
-                events=acts,
-                from_datetime=last_tracked,
-                inbox_url=self.ldn_inbox_url)
         return True
 
+    def _post_page(self, resp, actor_id: str, portal_username: str,
+                   etag: str, last_tracked: str, stats: dict):
+        """
+        Posts the events of a page of the user's timeline to the inbox.
+
+        :param resp: (requests.Response) the page.
+        :param stats: (dict) the `delivered` count of the run.
+        :return: None
+        """
+        received_events: list = self.parse_json(resp, actor_id)
+        LOG.debug("received %s events." % len(received_events))
+        post_to_ldn_inbox(
+            events=self.make_as2_payload(
+                events=received_events,
+                actor_id=actor_id,
+                portal_username=portal_username,
+                etag=etag),
+            from_datetime=last_tracked,
+            inbox_url=self.ldn_inbox_url,
+            portal_name=self.portal_name,
+            stats=stats)
+
     def make_as2_payload(self,
                          events: iter,
                          actor_id: str,
@@ -165,8 +440,7 @@ class GithubTracker(Tracker):
         """
         Converts the GitHub API response into ActivityStream message.
 
-        Invokes the appropriate method corresponding to the event type.
-        Uses the EVENT_MAP dictionary.
+        Invokes the converter compiled from EVENT_MAP for the event type.
         :param events: the list of events from the github api response.
         :return: a generator list of ActivityStream messages.
         """
@@ -177,17 +451,16 @@ class GithubTracker(Tracker):
 
             LOG.debug("gh_event_type: %s" % gh_event_type)
 
-            if not EVENT_MAP.get(gh_event_type):
+            convert = CONVERTERS.get(gh_event_type)
+            if not convert:
                 LOG.debug(f"Unsupported event for tracker: "
                           f"{gh_event_type}")
                 continue
-            yield getattr(self,
-                          EVENT_MAP.get(gh_event_type))(event,
-                                                        gh_event_type,
-                                                        actor_id,
-                                                        portal_username,
-                                                        etag
-                                                        )
+            yield convert(self,
+                          event,
+                          actor_id,
+                          portal_username,
+                          etag)
 
     @staticmethod
     def _make_html_url(url):
@@ -197,12 +470,7 @@ class GithubTracker(Tracker):
         :param url: the API url.
         :return: the HTML url.
         """
-        if not url:
-            return
-        url = url.replace("api.", "")
-        url = url.replace("repos/", "")
-        url = url.replace("users/", "")
-        return url
+        return _make_html_url(url)
 
     def get_actor_md(self,
                      md,
@@ -220,7 +488,7 @@ class GithubTracker(Tracker):
         if not md.get("url") and not md.get("html_url"):
             return actor
         actor["url"] = md.get("html_url") or \
-            GithubTracker._make_html_url(md.get("url"))
+            _make_html_url(md.get("url"))
         actor["name"] = portal_username
         actor["type"] = "Person"
         actor["id"] = actor_id
@@ -230,437 +498,3 @@ class GithubTracker(Tracker):
             image["href"] = md.get("avatar_url")
             actor["image"] = image
         return actor
-
-    def on_issues_event(self,
-                        event,
-                        event_type,
-                        actor_id,
-                        portal_username,
-                        etag):
-        """
-        Converts the IssuesEvent Github API response to
-        an AS2 message.
-        :param event: (dict) The event from Github API
-        :param event_type: (str) The type of event: IsssuesEvent
-        :return: (dict) the converted AS2 message
-        """
-        as2_payload = {}
-        if not event or not event_type:
-            return as2_payload
-        as2_payload = template_as2(
-            self.event_base_url,
-            PORTAL_NAME,
-            last_token=etag)
-
-        portal_url = self.portal.get("portal_url")
-        as2_payload["activity"]["prov:used"].append({"@id": portal_url})
-
-        payload = event.get("payload")
-        event_type_prop = EVENT_TYPES.get(event_type)
-        event_md = payload.get(event_type_prop)
-
-        as2_payload["event"]["actor"] = self.get_actor_md(
-            event.get("actor"),
-            actor_id,
-            portal_username)
-
-        target = {}
-        target["id"] = GithubTracker._make_html_url(
-            event_md["repository_url"])
-        target["type"] = ["Collection"]
-        as2_payload["event"]["target"] = target
-
-        as2_payload["event"]["published"] = event.get("created_at")
-        as2_payload["event"]["type"] = ["Add",
-                                        "tracker:ArtifactInteraction",
-                                        "tracker:Tracker"]
-
-        obj = {}
-        items = [{
-            "type": ["Link", "Article", "schema:Question"],
-            "href": event_md.get("html_url")
-        }]
-        obj["totalItems"] = len(items)
-        obj["items"] = items
-        obj["type"] = "Collection"
-        as2_payload["event"]["object"] = obj
-
-        return as2_payload
-
-    def on_watch_event(self,
-                       event,
-                       event_type,
-                       actor_id,
-                       portal_username,
-                       etag):
-        """
-        Converts the WatchEvent GitHub API event to an AS2 message.
-        Equivalent to starring a repository:
-        https://developer.github.com/v3/activity/events/types/#watchevent
-
-        :param event: (dict) The event from Github API
-        :param event_type: (str) the type of event: WatchEvent
-        :return: (dict) the converted AS2 message.
-        """
-        as2_payload = {}
-        if not event or not event_type:
-            return as2_payload
-
-        as2_payload = template_as2(
-            self.event_base_url,
-            PORTAL_NAME,
-            last_token=etag)
-
-        payload = event.get("payload")
-        event_type_prop = EVENT_TYPES.get(event_type)
-        event_md = payload.get(event_type_prop)
-        # if payload doesn't include author use different key
-        if not event_md:
-            event_md = event.get("actor")
-
-        portal_url = self.portal.get("portal_url")
-        as2_payload["activity"]["prov:used"].append({"@id": portal_url})
-
-        target = {}
-        target["id"] = GithubTracker._make_html_url(
-            event.get("repo", {}).get("url"))
-        target["type"] = ["Collection"]
-        as2_payload["event"]["target"] = target
-
-        as2_payload["event"]["actor"] = self.get_actor_md(
-            event_md,
-            actor_id,
-            portal_username)
-        as2_payload["event"]["published"] = event.get("created_at")
-        as2_payload["event"]["type"] = ["Like",
-                                        "tracker:ArtifactInteraction",
-                                        "tracker:Tracker"]
-
-        obj = {}
-        items = [{
-            "type": ["Link", "Document", "schema:SoftwareSourceCode"],
-            "href": GithubTracker._make_html_url(
-                event.get("repo", {}).get("url"))
-        }]
-        obj["totalItems"] = len(items)
-        obj["items"] = items
-        obj["type"] = "Collection"
-        as2_payload["event"]["object"] = obj
-
-        return as2_payload
-
-    def on_push_event(self,
-                      event,
-                      event_type,
-                      actor_id,
-                      portal_username,
-                      etag):
-        """
-        Converts the PushEvent GitHub API event to an AS2 message.
-
-        :param event: (dict) The event from Github API
-        :param event_type: (str) the type of event: PushEvent
-        :return: (dict) the converted AS2 message.
-        """
-        as2_payload = {}
-        if not event or not event_type:
-            return as2_payload
-
-        as2_payload = template_as2(
-            self.event_base_url,
-            PORTAL_NAME,
-            last_token=etag)
-
-        payload = event.get("payload")
-        event_type_prop = EVENT_TYPES.get(event_type)
-        event_md = payload.get(event_type_prop)
-
-        portal_url = self.portal.get("portal_url")
-        as2_payload["activity"]["prov:used"].append({"@id": portal_url})
-
-        as2_payload["event"]["actor"] = self.get_actor_md(
-            event.get("actor"),
-            actor_id,
-            portal_username)
-
-        target = {}
-        target["id"] = GithubTracker._make_html_url(
-            event.get("repo").get("url"))
-        target["type"] = ["Collection"]
-        as2_payload["event"]["target"] = target
-
-        as2_payload["event"]["published"] = event.get("created_at")
-        as2_payload["event"]["type"] = ["Add",
-                                        "tracker:ArtifactInteraction",
-                                        "tracker:Tracker"]
-
-        obj = {}
-        if isinstance(event_md, list) and len(event_md) > 0:
-            items = [{
-                "type": ["Link", "Document", "schema:SoftwareSourceCode"],
-                "href": GithubTracker._make_html_url(event_md[0].get("url"))
-            }]
-            obj["totalItems"] = len(items)
-            obj["items"] = items
-        obj["type"] = "Collection"
-        as2_payload["event"]["object"] = obj
-
-        return as2_payload
-
-    def on_issue_comment_event(self,
-                               event,
-                               event_type,
-                               actor_id,
-                               portal_username,
-                               etag):
-        """
-        Converts the IssueCommentEvent GitHub API event to an AS2 message.
-
-        :param event: (dict) The event from Github API
-        :param event_type: (str) the type of event: IssueCommentEvent
-        :return: (dict) the converted AS2 message.
-        """
-        as2_payload = {}
-        if not event or not event_type:
-            return as2_payload
-
-        as2_payload = template_as2(
-            self.event_base_url,
-            PORTAL_NAME,
-            last_token=etag)
-
-        payload = event.get("payload")
-        event_type_prop = EVENT_TYPES.get(event_type)
-        event_md = payload.get(event_type_prop)
-
-        as2_payload["event"]["actor"] = self.get_actor_md(
-            event_md.get("user"),
-            actor_id,
-            portal_username)
-
-        portal_url = self.portal.get("portal_url")
-        as2_payload["activity"]["prov:used"].append({"@id": portal_url})
-
-        target = {}
-        target["id"] = GithubTracker._make_html_url(
-            payload.get("issue", {}).get("repository_url"))
-        target["type"] = ["Collection"]
-        as2_payload["event"]["target"] = target
-
-        as2_payload["event"]["published"] = event.get("created_at")
-        as2_payload["event"]["type"] = ["Add",
-                                        "tracker:ArtifactInteraction",
-                                        "tracker:Tracker"]
-
-        obj = {}
-        items = [{
-            "type": ["Link", "Note", "schema:Comment"],
-            "href": event_md.get("html_url")
-        }]
-        obj["totalItems"] = len(items)
-        obj["items"] = items
-        obj["type"] = "Collection"
-        as2_payload["event"]["object"] = obj
-
-        return as2_payload
-
-    def on_pull_request_event(self,
-                              event,
-                              event_type,
-                              actor_id,
-                              portal_username,
-                              etag):
-        """
-        Converts the PullRequestEvent GitHub API event to an AS2 message.
-
-        Three possible AS2 activities by the actor. Accept, TentativeReject,
-        or Offer.
-
-        :param event: (dict) The event from Github API
-        :param event_type: (str) the type of event: PullRequestEvent
-        :return: (dict) the converted AS2 message.
-        """
-        as2_payload = {}
-        if not event or not event_type:
-            return as2_payload
-
-        as2_payload = template_as2(
-            self.event_base_url,
-            PORTAL_NAME,
-            last_token=etag)
-        portal_url = self.portal.get("portal_url")
-        as2_payload["activity"]["prov:used"].append({"@id": portal_url})
-
-        payload = event.get("payload")
-        event_type_prop = EVENT_TYPES.get(event_type)
-        event_md = payload.get(event_type_prop)
-        if event_md.get("user", {}).get("login") == portal_username:
-            # User offered pull request
-            as2_payload["event"]["actor"] = self.get_actor_md(
-                event_md.get("user"),
-                actor_id,
-                portal_username)
-            as2_payload["event"]["type"] = ["Offer",
-                                            "tracker:ArtifactInteraction"]
-        elif event_md.get("merged_by"):
-            # Actor merged a pull request into the repository
-            as2_payload["event"]["actor"] = self.get_actor_md(
-                event_md.get("merged_by"),
-                actor_id,
-                portal_username)
-            as2_payload["event"]["type"] = ["Accept",
-                                            "tracker:ArtifactInteraction"]
-        else:
-            # Actor closed the issue, Tentatively Rejecting it
-            # (could reopen later and be used)
-            as2_payload["event"]["actor"] = self.get_actor_md(
-                event.get("actor"),
-                actor_id,
-                portal_username)
-            as2_payload["event"]["type"] = ["TentativeReject",
-                                            "tracker:ArtifactInteraction"]
-        as2_payload["event"]["type"].append("tracker:Tracker")
-
-        target = {}
-        target["id"] = GithubTracker._make_html_url(
-            event_md.get("base", {})
-            .get("repo", {}).get("html_url"))
-        target["type"] = ["Collection"]
-        as2_payload["event"]["target"] = target
-
-        as2_payload["event"]["published"] = event.get("created_at")
-
-        obj = {}
-        items = [{
-            "type": ["Link", "Document", "schema:SoftwareSourceCode"],
-            "href": event_md.get("html_url")
-        }]
-        obj["totalItems"] = len(items)
-        obj["items"] = items
-        obj["type"] = "Collection"
-        as2_payload["event"]["object"] = obj
-
-        return as2_payload
-
-    def on_commit_comment_event(self,
-                                event,
-                                event_type,
-                                actor_id,
-                                portal_username,
-                                etag):
-        """
-        Converts the CommitCommentEvent GitHub API event to an AS2 message.
-
-        :param event: (dict) The event from Github API
-        :param event_type: (str) the type of event: CommitCommentEvent
-        :return: (dict) the converted AS2 message.
-        """
-        as2_payload = {}
-        if not event or not event_type:
-            return as2_payload
-
-        as2_payload = template_as2(
-            self.event_base_url,
-            PORTAL_NAME,
-            last_token=etag)
-        portal_url = self.portal.get("portal_url")
-        as2_payload["activity"]["prov:used"].append({"@id": portal_url})
-
-        payload = event.get("payload")
-        event_type_prop = EVENT_TYPES.get(event_type)
-        event_md = payload.get(event_type_prop)
-
-        as2_payload["event"]["actor"] = self.get_actor_md(
-            event_md.get("user"),
-            actor_id,
-            portal_username)
-
-        target = {}
-        target["id"] = GithubTracker._make_html_url(
-            event.get("repo", {}).get("url"))
-        target["type"] = ["Collection"]
-        as2_payload["event"]["target"] = target
-
-        as2_payload["event"]["published"] = event.get("created_at")
-        as2_payload["event"]["type"] = ["Add",
-                                        "tracker:ArtifactInteraction",
-                                        "tracker:Tracker"]
-
-        obj = {}
-        items = [{
-            "type": ["Link", "Note", "schema:Comment"],
-            "href": event_md.get("html_url")
-        }]
-        obj["totalItems"] = len(items)
-        obj["items"] = items
-        obj["type"] = "Collection"
-        as2_payload["event"]["object"] = obj
-
-        return as2_payload
-
-    def on_create_event(self,
-                        event,
-                        event_type,
-                        actor_id,
-                        portal_username,
-                        etag):
-        """
-        Converts the CreateEvent GitHub API event to an AS2 message.
-
-        :param event: (dict) The event from Github API
-        :param event_type: (str) the type of event: CreateEvent
-        :return: (dict) the converted AS2 message.
-        """
-        as2_payload = {}
-        if not event or not event_type:
-            return as2_payload
-
-        as2_payload = template_as2(
-            self.event_base_url,
-            PORTAL_NAME,
-            last_token=etag)
-        portal_url = self.portal.get("portal_url")
-        as2_payload["activity"]["prov:used"].append({"@id": portal_url})
-
-        as2_payload["event"]["actor"] = self.get_actor_md(
-            event.get("actor"),
-            actor_id,
-            portal_username)
-
-        target = {}
-        target["id"] = GithubTracker._make_html_url(
-            event.get("actor", {}).get("url"))
-        target["type"] = ["Collection"]
-        as2_payload["event"]["target"] = target
-
-        as2_payload["event"]["published"] = event.get("created_at")
-        as2_payload["event"]["type"] = ["Create",
-                                        "tracker:ArtifactCreation",
-                                        "tracker:Tracker"]
-
-        ref_type = event.get("payload", {}).get("ref_type", "")
-        if ref_type == "tag":
-            tag = ref_type = event.get("payload", {}).get("ref")
-            href = "{}/releases/tag/{}".format(GithubTracker._make_html_url(
-                event.get("repo", {}).get("url")), tag)
-        else:
-            href = GithubTracker._make_html_url(
-                event.get("repo", {}).get("url"))
-
-        obj = {}
-        items = [{
-            "type": ["Link", "Document", "schema:SoftwareSourceCode"],
-            "href": href
-        }]
-        obj["totalItems"] = len(items)
-        obj["items"] = items
-        obj["type"] = "Collection"
-        as2_payload["event"]["object"] = obj
-
-        return as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = GithubTracker(**kwargs)
-    tracker.get_events()
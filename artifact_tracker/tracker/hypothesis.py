@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
 from datetime import datetime
-import requests
 
 
 PORTAL_NAME = "hypothesis"
@@ -44,7 +43,7 @@ class HypothesisTracker(Tracker):
             user_annotations_url = self.portal.get("event_urls", {}).\
                 get("user_search_url").format(portal_username)
 
-            resp = requests.get(user_annotations_url)
+            resp = self.get(user_annotations_url)
             LOG.debug("getting user events: %s" % user_annotations_url)
 
             if resp.status_code != 200:
@@ -56,7 +55,7 @@ class HypothesisTracker(Tracker):
                     completed=True)
                 return False
 
-            data = resp.json()
+            data = self.parse_json(resp, actor_id)
 
             acts = self.make_as2_payload(
                 annotations=data,
@@ -71,7 +70,8 @@ class HypothesisTracker(Tracker):
             post_to_ldn_inbox(
                 events=acts,
                 from_datetime=last_tracked,
-                inbox_url=self.ldn_inbox_url)
+                inbox_url=self.ldn_inbox_url,
+                portal_name=self.portal_name)
         return True
 
     def make_as2_payload(self,
@@ -131,9 +131,3 @@ class HypothesisTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = HypothesisTracker(**kwargs)
-    tracker.get_events()
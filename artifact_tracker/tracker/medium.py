@@ -1,11 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
+from artifact_tracker.utils.feed import FeedCache, group_by_feed
 from datetime import datetime
-import feedparser
-import requests
 
 
 PORTAL_NAME = "medium"
@@ -33,7 +32,11 @@ class MediumTracker(Tracker):
             LOG.debug("no users. exiting.")
             return False
 
-        for user in self.users:
+        # the feed of a user is released once the user's duplicates in the
+        # batch are processed
+        feed_cache = FeedCache(fetch=self.get)
+        previous_url = None
+        for user in group_by_feed(self.users, lambda u: u.get("username")):
             actor_id = user.get("id")
             portal_username = user.get("username")
             last_tracked = user.get("lastTracked")
@@ -45,21 +48,22 @@ class MediumTracker(Tracker):
             user_posts_url = self.portal.get("event_urls", {}).\
                 get("posts_feed_url").format(portal_username)
 
-            resp = requests.get(user_posts_url)
+            if previous_url and previous_url != user_posts_url:
+                feed_cache.release(previous_url)
+            previous_url = user_posts_url
 
             LOG.debug("getting user events: %s" % user_posts_url)
+            status_code, feed = feed_cache.get(user_posts_url)
 
-            if resp.status_code != 200:
+            if status_code != 200:
                 LOG.debug("non-200 response code received. "
                           "Updating tracker status and continuing.")
                 self.update_tracker_status(
                     actor_id=actor_id,
-                    status_code=resp.status_code,
+                    status_code=status_code,
                     completed=True)
                 continue
 
-            feed = feedparser.parse(resp.content)
-
             last_updated = datetime.strptime(
                 feed.get("feed", {}).get("updated"),
                 "%a, %d %b %Y %H:%M:%S GMT")
@@ -79,13 +83,14 @@ class MediumTracker(Tracker):
 
             self.update_tracker_status(
                 actor_id=actor_id,
-                status_code=resp.status_code,
+                status_code=status_code,
                 completed=True)
 
             post_to_ldn_inbox(
                 events=acts,
                 from_datetime=last_tracked,
-                inbox_url=self.ldn_inbox_url)
+                inbox_url=self.ldn_inbox_url,
+                portal_name=self.portal_name)
         return True
 
     def make_as2_payload(self,
@@ -143,9 +148,3 @@ class MediumTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = MediumTracker(**kwargs)
-    tracker.get_events()
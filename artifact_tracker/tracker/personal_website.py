@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
 
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
-import requests
 
 PORTAL_NAME = "personal_website"
 LOG = tracker_app.log
@@ -40,7 +39,7 @@ class PersonalWebsiteTracker(Tracker):
                 continue
 
             LOG.debug("getting portal website user feed: %s" % portal_url)
-            resp = requests.get(portal_url)
+            resp = self.get(portal_url)
 
             if resp.status_code != 200:
                 LOG.debug("non-200 response code received. "
@@ -62,7 +61,8 @@ class PersonalWebsiteTracker(Tracker):
 
             post_to_ldn_inbox(acts,
                               from_datetime=last_tracked,
-                              inbox_url=self.ldn_inbox_url)
+                              inbox_url=self.ldn_inbox_url,
+                              portal_name=self.portal_name)
 
         return True
 
@@ -102,9 +102,3 @@ class PersonalWebsiteTracker(Tracker):
         as2_payload["event"]["object"] = obj
 
         yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = PersonalWebsiteTracker(**kwargs)
-    tracker.get_events()
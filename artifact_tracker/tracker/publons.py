@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
 from datetime import datetime
-import requests
 
 PORTAL_NAME = "publons"
 LOG = tracker_app.log
@@ -50,35 +49,59 @@ class PublonsTracker(Tracker):
                 "Authorization": f"Token {api_key}"
             }
 
-            resp = requests.get(user_posts_url, headers=headers)
+            # resume an interrupted run from the next page it had to fetch
+            checkpoint = self.load_checkpoint(actor_id)
+            # a first run walks back all the reviews of the user, in
+            # chained tasks of a bounded number of pages
+            budget = self.backfill_budget(user)
+            stats = {"delivered": 0}
+            continued = False
+            if checkpoint:
+                next_url = checkpoint["cursor"]
+                stats["delivered"] = checkpoint["delivered"]
+            else:
+                resp = self.get(user_posts_url, headers=headers)
+
+                LOG.debug("getting user events: {}".format(user_posts_url))
 
-            LOG.debug("getting user events: {}".format(user_posts_url))
+                if resp.status_code != 200:
+                    LOG.debug("non-200 response code received. "
+                              "Updating tracker status and continuing.")
+                    self.update_tracker_status(
+                        actor_id=actor_id,
+                        status_code=resp.status_code,
+                        completed=True)
+                    continue
 
-            if resp.status_code != 200:
-                LOG.debug("non-200 response code received. "
-                          "Updating tracker status and continuing.")
-                self.update_tracker_status(
+                data = self.parse_json(resp, actor_id)
+                acts = self.make_as2_payload(
+                    events=data,
                     actor_id=actor_id,
-                    status_code=resp.status_code,
-                    completed=True)
-                continue
+                    portal_user_id=portal_user_id,
+                    portal_username=portal_username,
+                    prov_api_url=user_posts_url)
 
-            data = resp.json()
-            acts = self.make_as2_payload(
-                events=data,
-                actor_id=actor_id,
-                portal_user_id=portal_user_id,
-                portal_username=portal_username,
-                prov_api_url=user_posts_url)
-
-            success = post_to_ldn_inbox(
-                events=acts,
-                from_datetime=last_tracked,
-                inbox_url=self.ldn_inbox_url)
-
-            while data["next"]:
-                resp = requests.get(data["next"], headers=headers)
-                data = resp.json()
+                post_to_ldn_inbox(
+                    events=acts,
+                    from_datetime=last_tracked,
+                    inbox_url=self.ldn_inbox_url,
+                    portal_name=self.portal_name,
+                    stats=stats)
+                if budget:
+                    budget.page()
+                next_url = data["next"]
+
+            # every page is posted as soon as it is received, and the next
+            # page is checkpointed so that the run can resume there
+            while next_url:
+                self.save_checkpoint(actor_id, next_url,
+                                     delivered=stats["delivered"])
+                if budget and budget.spent():
+                    # the chained task resumes from the checkpoint
+                    continued = True
+                    break
+                resp = self.get(next_url, headers=headers)
+                data = self.parse_json(resp, actor_id)
                 acts = self.make_as2_payload(
                     events=data,
                     actor_id=actor_id,
@@ -89,9 +112,20 @@ class PublonsTracker(Tracker):
                 success = post_to_ldn_inbox(
                         events=acts,
                         from_datetime=last_tracked,
-                        inbox_url=self.ldn_inbox_url)
+                        inbox_url=self.ldn_inbox_url,
+                        portal_name=self.portal_name,
+                        stats=stats)
+                if budget:
+                    budget.page()
                 if not success:
                     break
+                next_url = data["next"]
+            else:
+                self.clear_checkpoint(actor_id)
+
+            if continued:
+                self.continue_backfill(user, budget)
+                continue
 
             self.update_tracker_status(
                 actor_id=actor_id,
@@ -156,9 +190,3 @@ class PublonsTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = PublonsTracker(**kwargs)
-    tracker.get_events()
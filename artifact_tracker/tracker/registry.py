@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+The registry of the portal trackers.
+
+The registry is the only tracker module celery has to import. The
+module of a portal, and with it the parser libraries it depends on
+(feedparser, lxml, sickle, requests_oauthlib, ...), is only imported
+the first time a task for the portal is run in a process.
+"""
+
+from artifact_tracker import tracker_app, celery
+from importlib import import_module
+import time
+
+LOG = tracker_app.log
+
+# a map of the portal names and the module and class name of
+# their trackers
+TRACKERS = {
+    "blogger": ("artifact_tracker.tracker.blogger", "BloggerTracker"),
+    "figshare": ("artifact_tracker.tracker.figshare", "FigshareTracker"),
+    "github": ("artifact_tracker.tracker.github", "GithubTracker"),
+    "hypothesis": ("artifact_tracker.tracker.hypothesis",
+                   "HypothesisTracker"),
+    "medium": ("artifact_tracker.tracker.medium", "MediumTracker"),
+    "personal_website": ("artifact_tracker.tracker.personal_website",
+                         "PersonalWebsiteTracker"),
+    "publons": ("artifact_tracker.tracker.publons", "PublonsTracker"),
+    "slideshare": ("artifact_tracker.tracker.slideshare",
+                   "SlideshareTracker"),
+    "stackoverflow": ("artifact_tracker.tracker.stackoverflow",
+                      "StackOverflowTracker"),
+    "twitter": ("artifact_tracker.tracker.twitter", "TwitterTracker"),
+    "wikipedia": ("artifact_tracker.tracker.wikipedia",
+                  "WikipediaTracker"),
+    "wordpress": ("artifact_tracker.tracker.wordpress", "WordpressTracker")
+}
+
+# the lanes of the tracker tasks: incremental runs of tracked users,
+# and back-fills of users tracked for the first time
+INCREMENTAL = "incremental"
+BACKFILL = "backfill"
+LANES = (INCREMENTAL, BACKFILL)
+
+_tracker_classes = {}
+
+
+def is_registered(portal_name: str) -> bool:
+    """
+    Checks if a tracker exists for the portal.
+
+    :param portal_name: (str) the name of the portal.
+    :return: (bool) True if the portal has a tracker.
+    """
+    return portal_name in TRACKERS
+
+
+def get_tracker_class(portal_name: str):
+    """
+    Returns the tracker class of a portal, importing the tracker's
+    module on first use.
+
+    :param portal_name: (str) the name of the portal.
+    :return: the Tracker subclass of the portal.
+    """
+    tracker_class = _tracker_classes.get(portal_name)
+    if tracker_class:
+        return tracker_class
+
+    if not is_registered(portal_name):
+        raise ValueError(
+            'Tracker for "{}" does not exist.'.format(portal_name)
+        )
+    module_name, class_name = TRACKERS[portal_name]
+    LOG.debug(f"loading tracker module: {module_name}")
+    tracker_class = getattr(import_module(module_name), class_name)
+    _tracker_classes[portal_name] = tracker_class
+    return tracker_class
+
+
+@celery.task
+def run(portal_name: str=None, inbox_retries: int=0, **kwargs):
+    from artifact_tracker.utils import claim_check
+    from artifact_tracker.utils.breaker import CircuitOpenError
+    from artifact_tracker.utils.message import InboxOverloadedError
+    tracker_class = get_tracker_class(portal_name)
+    tracker = tracker_class(portal_name=portal_name, **kwargs)
+    # the users of a rescheduled task are sent inline, and only the users
+    # not tracked yet are rescheduled, with the events already delivered
+    # for them, so that these are not posted again
+    args = {k: v for k, v in kwargs.items() if k != "users_ref"}
+    try:
+        tracker.track()
+    except CircuitOpenError as e:
+        # the users not tracked yet are rescheduled once the breaker of
+        # the portal is half-open, without writing their status
+        users = tracker.pending_users()
+        LOG.info(f"{e}: {len(users)} users rescheduled.")
+        if users:
+            dispatch(portal_name=portal_name,
+                     countdown=e.retry_after,
+                     inbox_retries=inbox_retries,
+                     **dict(args, users=users,
+                            delivered=tracker.delivered_events(users)))
+    except InboxOverloadedError as e:
+        # the users not tracked yet are rescheduled once the inbox
+        # recovers. the paginated trackers resume from their checkpoints,
+        # and the events already delivered are skipped
+        config = tracker_app.app.config.get("DELIVERY") or {}
+        users = tracker.pending_users()
+        if inbox_retries >= config.get("task_retries", 5):
+            LOG.error(f"{portal_name} task dropped after {inbox_retries} "
+                      f"retries, {len(users)} users not tracked: {e}")
+        elif users:
+            LOG.info(f"{e}: {len(users)} users rescheduled.")
+            dispatch(portal_name=portal_name,
+                     countdown=max(e.retry_after, 1),
+                     inbox_retries=inbox_retries + 1,
+                     **dict(args, users=users,
+                            delivered=tracker.delivered_events(users)))
+    finally:
+        if kwargs.get("users_ref"):
+            claim_check.delete(kwargs["users_ref"])
+
+
+@celery.task
+def pump_fair_queues():
+    """
+    Runs the dispatcher of the fair queues once the slot of the oldest
+    task in flight expired.
+    """
+    from artifact_tracker.utils import fair
+    fair.wakeup()
+
+
+def lane_of(users: list) -> str:
+    """
+    Returns the lane of a task: back-fill if none of its users were
+    tracked before, i.e. the orchestrator sent no `lastToken` or
+    `lastTracked` for them.
+
+    :param users: (list) the portal users of the task.
+    :return: (str) the lane.
+    """
+    for user in users or []:
+        if user.get("lastToken") or user.get("lastTracked"):
+            return INCREMENTAL
+    return BACKFILL if users else INCREMENTAL
+
+
+def route(portal_name: str, lane: str=INCREMENTAL) -> dict:
+    """
+    Returns the queue and the priority of the tasks of a portal and lane
+    from the routing config. The queue of a portal defaults to the
+    `queue` template of the routing config, and can be set with the
+    `queue` of the portal; both are formatted with the portal name and
+    the lane.
+
+    :param portal_name: (str) the name of the portal.
+    :param lane: (str) the lane of the task.
+    :return: (dict) the `queue` and `priority` options of the task, or
+    an empty dict if routing is disabled.
+    """
+    routing = tracker_app.app.config.get("ROUTING") or {}
+    if not routing.get("enabled"):
+        return {}
+    portal = tracker_app.app.config.get("PORTALS", {}).get(portal_name, {})
+    template = portal.get("queue") or routing.get("queue") or \
+        "tracker.{portal}.{lane}"
+    options = {"queue": template.format(portal=portal_name, lane=lane)}
+    priority = (routing.get("lanes") or {}).get(lane, {}).get("priority")
+    if priority is not None:
+        options["priority"] = priority
+    return options
+
+
+def queues(portal_names: list=None, lanes: list=None) -> list:
+    """
+    Returns the queues of the given portals and lanes, to be consumed by
+    a worker pool.
+
+    :param portal_names: (list) the portals, defaults to all of them.
+    :param lanes: (list) the lanes, defaults to all of them.
+    :return: (list) the names of the queues.
+    """
+    names = []
+    for portal_name in portal_names or sorted(TRACKERS):
+        for lane in lanes or LANES:
+            queue = route(portal_name, lane).get("queue")
+            if queue and queue not in names:
+                names.append(queue)
+    return names
+
+
+def dispatch(portal_name: str, users: list, lane: str=None,
+             task_id: str=None, countdown: float=None, **kwargs):
+    """
+    Queues a tracker task for the users, on the queue of its portal and
+    lane when routing is enabled. The users of large tasks are sent as a
+    claim check when it is enabled.
+
+    :param portal_name: (str) the name of the portal.
+    :param users: (list) the portal users of the task.
+    :param lane: (str) the lane of the task, by default inferred from
+    the users.
+    :param task_id: (str) the id of the task, generated by celery if not
+    set.
+    :param countdown: (float) the seconds to wait before running the
+    task.
+    :param kwargs: the other keyword arguments of the task.
+    :return: the AsyncResult of the task.
+    """
+    from artifact_tracker.utils import claim_check
+    options = route(portal_name, lane or lane_of(users))
+    kwargs = dict(kwargs, portal_name=portal_name, users=users)
+    if claim_check.applies(users):
+        try:
+            kwargs["users_ref"] = claim_check.store(users)
+            del kwargs["users"]
+        except Exception as e:
+            LOG.error(f"Error storing the users of a task: {e}")
+    return run.apply_async(
+        kwargs=kwargs,
+        task_id=task_id,
+        countdown=countdown,
+        # the lag of the workers is measured from the oldest queued task
+        headers={"queued_at": time.time()},
+        **options)
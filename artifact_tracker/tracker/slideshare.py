@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.utils.secrets import get_ts_hash
 from artifact_tracker.tracker.tracker import Tracker
-import requests
 from lxml import etree
 from io import BytesIO
 from datetime import datetime
@@ -21,6 +20,7 @@ class SlideshareTracker(Tracker):
             LOG.debug("no users. exiting.")
             return False
 
+        success = True
         for user in self.users:
             actor_id = user.get("id")
             portal_username = user.get("username")
@@ -69,14 +69,33 @@ class SlideshareTracker(Tracker):
                 )
 
             prov_api_url = user_slides_url + "?" + "&".join(url_params)
+            slides = []
+
+            def consume(resp):
+                # the response is streamed into the parser, so that only
+                # one slideshow element is held in memory at a time. the
+                # whole body is parsed before any event is delivered
+                if resp.status_code != 200:
+                    return
+                resp.raw.decode_content = True
+                slides.extend(self.parse_slideshows(resp.raw))
+
             resp = kwargs.get("test_response")
-            if not resp:
-                resp = requests.get(prov_api_url)
-            m_data = BytesIO(resp.content)
-            xml_data = etree.parse(m_data)
-            events = xml_data.xpath("//User/Slideshow")
+            try:
+                if resp:
+                    slides = self.parse_slideshows(BytesIO(resp.content))
+                else:
+                    resp = self.get(prov_api_url, stream=True,
+                                    consume=consume)
+            except etree.XMLSyntaxError as e:
+                # the user is tracked again by the next run
+                LOG.error(f"Error parsing the {PORTAL_NAME} response of "
+                          f"{actor_id}: {e}")
+                success = False
+                continue
+
             events = self.make_as2_payload(
-                events=events,
+                events=slides,
                 actor_id=actor_id,
                 portal_username=portal_username,
                 prov_api_url=(
@@ -91,9 +110,57 @@ class SlideshareTracker(Tracker):
             post_to_ldn_inbox(
                 events,
                 from_datetime=last_tracked,
-                inbox_url=self.ldn_inbox_url)
+                inbox_url=self.ldn_inbox_url,
+                portal_name=self.portal_name)
+            resp.close()
 
-        return True
+        return success
+
+    @staticmethod
+    def iter_slideshows(xml_data):
+        """
+        Incrementally parses the Slideshare API response and yields the
+        `Slideshow` elements of the `User` element one at a time. Each
+        element is cleared, along with its already parsed siblings, as
+        soon as the consumer is done with it, so the memory used is
+        bounded by a single slideshow instead of the whole document.
+
+        :param xml_data: a file like object with the XML response.
+        :yield: the `Slideshow` elements.
+        :raises XMLSyntaxError: if the response is malformed or truncated.
+        """
+        for _, slide in etree.iterparse(xml_data,
+                                        events=("end",),
+                                        tag="Slideshow"):
+            parent = slide.getparent()
+            if parent is None or parent.tag != "User":
+                continue
+            yield slide
+            slide.clear()
+            while slide.getprevious() is not None:
+                del parent[0]
+
+    @staticmethod
+    def slideshow_fields(slide) -> dict:
+        """
+        :param slide: a `Slideshow` element.
+        :return: (dict) the fields of the slideshow used in the events.
+        """
+        return {"thumbnail": slide.findtext("ThumbnailSmallURL"),
+                "created": slide.findtext("Created"),
+                "url": slide.findtext("URL")}
+
+    def parse_slideshows(self, xml_data) -> list:
+        """
+        Parses the whole Slideshare API response, keeping only the fields
+        of the slideshows used in the events.
+
+        :param xml_data: a file like object with the XML response.
+        :return: (list) the fields of the slideshows.
+        :raises XMLSyntaxError: if the response is malformed or truncated.
+        """
+        return [self.slideshow_fields(slide)
+                for slide in self.iter_slideshows(xml_data)]
 
     def make_as2_payload(self,
                          events: iter,
@@ -105,10 +172,11 @@ class SlideshareTracker(Tracker):
         """
         Converts the Slideshare API response into ActivityStream message.
 
-        :param events: the list of slides from the slideshare api response.
+        :param events: the fields of the slides from the slideshare api
+        response, returned by `slideshow_fields`.
         :yield: a generator list of ActivityStream messages.
         """
-        if not bool(events):
+        if events is None:
             return []
 
         for slide in events:
@@ -127,7 +195,7 @@ class SlideshareTracker(Tracker):
 
             image = {}
             image["type"] = "Link"
-            image["href"] = slide.find("ThumbnailSmallURL").text
+            image["href"] = slide.get("thumbnail")
             actor["image"] = image
             as2_payload["event"]["actor"] = actor
 
@@ -136,7 +204,7 @@ class SlideshareTracker(Tracker):
             target["type"] = ["Collection"]
             as2_payload["event"]["target"] = target
 
-            created_at = slide.find("Created").text
+            created_at = slide.get("created")
             c_date = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S %Z")
             as2_payload["event"]["published"] = c_date.strftime(
                 "%Y-%m-%dT%H:%M:%SZ")
@@ -148,7 +216,7 @@ class SlideshareTracker(Tracker):
             items = [{
                 "type":
                     ["Link", "Article", "schema:PresentationDigitalDocument"],
-                "href": slide.find("URL").text
+                "href": slide.get("url")
             }]
             obj["totalItems"] = len(items)
             obj["items"] = items
@@ -156,9 +224,3 @@ class SlideshareTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = SlideshareTracker(**kwargs)
-    tracker.get_events()
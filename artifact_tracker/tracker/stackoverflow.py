@@ -1,13 +1,68 @@
 # -*- coding: utf-8 -*-
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
-from datetime import datetime
-import requests
+from artifact_tracker.utils import credentials
+from datetime import datetime, timedelta
+import calendar
+import time
 
 PORTAL_NAME = "stackoverflow"
 LOG = tracker_app.log
 
+# the maximum number of ids accepted by the stack exchange api
+# in a vectorized request
+# https://api.stackexchange.com/docs/vectors
+MAX_IDS = 100
+
+# the redis key that expires when the api can be requested again, after
+# the last `backoff` value it sent
+BACKOFF_KEY = "stackoverflow:backoff"
+
+
+def _wait_for_backoff():
+    """
+    Waits for the backoff the api sent to any of the workers.
+
+    :return: None
+    """
+    from artifact_tracker.utils.redis_client import get_redis
+    try:
+        wait = get_redis().pttl(BACKOFF_KEY) / 1000
+    except Exception as e:
+        LOG.error(f"Error reading the {PORTAL_NAME} backoff: {e}")
+        return
+    if wait > 0:
+        LOG.debug("backoff. waiting %.1f seconds." % wait)
+        time.sleep(wait)
+
+
+def _set_backoff(seconds: int):
+    """
+    Shares the backoff sent by the api with all the workers, unless a
+    longer one is set.
+
+    :param seconds: (int) the seconds to wait before the next request.
+    :return: None
+    """
+    from artifact_tracker.utils.redis_client import get_redis
+    try:
+        client = get_redis()
+        if client.pttl(BACKOFF_KEY) < seconds * 1000:
+            client.set(BACKOFF_KEY, 1, px=int(seconds * 1000))
+    except Exception as e:
+        LOG.error(f"Error storing the {PORTAL_NAME} backoff: {e}")
+
+
+def _until_quota_reset() -> float:
+    """
+    :return: (float) the seconds until the daily request quotas of the
+    stack exchange api are reset, at midnight UTC.
+    """
+    now = datetime.utcnow()
+    midnight = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    return (midnight - now).total_seconds()
+
 
 class StackOverflowTracker(Tracker):
 
@@ -19,6 +74,13 @@ class StackOverflowTracker(Tracker):
         events from the API, parses them appropriately, serializes them
         into ActivityStream messages and posts them to the LDN Inbox.
 
+        The Stack Exchange API accepts up to 100 semicolon separated user
+        ids per request, so the users are grouped into batches and the
+        posts of every batch are retrieved with one paginated request
+        that is split per user afterwards. When the request quota is
+        exhausted, the users not tracked yet are rescheduled for when
+        the quota is reset.
+
         :param kwargs: only used for unit testing. When the `test_response`
         key is set, this method will not perform the API requests and
         use the mock response.
@@ -31,48 +93,158 @@ class StackOverflowTracker(Tracker):
             LOG.debug("no users. exiting.")
             return False
 
-        for user in self.users:
-            actor_id = user.get("id")
-            portal_user_id = user.get("userId")
-            last_tracked = user.get("lastTracked")
+        batch_size = min(self.portal.get("batch_size") or MAX_IDS, MAX_IDS)
+        for n, batch in enumerate(self.batched_users(batch_size)):
+            if n and self.split_over_memory_budget(
+                    self.users[n * batch_size:]):
+                LOG.debug("remaining users queued in a new task.")
+                return True
+
+            batch_users = {}
+            for user in batch:
+                portal_user_id = user.get("userId")
+                if not portal_user_id:
+                    LOG.debug("no portal user id. skipping.")
+                    continue
+                batch_users.setdefault(str(portal_user_id), []).append(user)
 
-            if not portal_user_id:
-                LOG.debug("no portal user id. skipping.")
+            if not batch_users:
                 continue
 
-            headers = {
-                "Accept-Encoding": "GZIP"
-            }
+            if not self.get_batch_events(batch_users, **kwargs):
+                remaining = self.users[(n + 1) * batch_size:]
+                LOG.debug(f"request quota exhausted. {len(remaining)} "
+                          f"remaining users rescheduled.")
+                if remaining:
+                    self.reschedule(remaining,
+                                    countdown=_until_quota_reset())
+                return False
+        return True
+
+    def get_batch_events(self, batch_users: dict, **kwargs) -> bool:
+        """
+        Retrieves the posts of a batch of users with a vectorized id
+        request, following the `has_more` pages and honouring the
+        `backoff` value sent by the API, and posts the events of every
+        user to the LDN inbox.
+
+        The users of a batch whose pages could not all be retrieved are
+        not marked as tracked: they are rescheduled when the request
+        quota ran out, and left for the next run of the orchestrator on
+        an error page.
 
-            user_posts_url = self.portal.get("event_urls", {}).\
-                get("user_posts_url").format(portal_user_id)
+        :param batch_users: (dict) the users of the batch keyed by their
+        stack overflow user id.
+        :return: (bool): False if the request quota of the API is
+        exhausted, True otherwise.
+        """
+        headers = {
+            "Accept-Encoding": "GZIP"
+        }
+
+        user_posts_url = self.portal.get("event_urls", {}).\
+            get("user_posts_url").format(";".join(batch_users))
 
-            resp = requests.get(user_posts_url, headers=headers)
-            LOG.debug("getting user events: %s" % user_posts_url)
+        last_tracked = [u.get("lastTracked") for users in
+                        batch_users.values() for u in users]
+        if all(last_tracked):
+            # fromdate limits the posts to the ones created after the
+            # oldest last tracked date of the batch
+            from_date = datetime.strptime(
+                min(last_tracked), "%Y-%m-%dT%H:%M:%SZ")
+            user_posts_url += "&fromdate={}".format(
+                calendar.timegm(from_date.utctimetuple()))
+
+        posts = {}
+        status_code = None
+        quota_exhausted = False
+        truncated = False
+        page = 1
+        max_pages = self.portal.get("max_pages")
+        has_more = True
+        while has_more:
+            page_url = user_posts_url + "&page={}".format(page)
+            LOG.debug("getting user events: %s" % page_url)
+            resp = kwargs.get("test_response")
+            credential = {}
+            if not resp:
+                # every page takes a credential of the pool, if any
+                credential = self.credential()
+                key = "&key={}".format(credential["apiKey"]) \
+                    if credential.get("apiKey") else ""
+                # the api requires clients to wait for the backoff it
+                # sent, whichever task the next request belongs to
+                _wait_for_backoff()
+                resp = self.get(page_url + key, headers=headers)
+            status_code = resp.status_code
 
             if resp.status_code != 200:
+                credentials.record(self.portal_name, credential, resp)
                 LOG.debug("non-200 response code received. "
-                          "Updating tracker status and exiting.")
+                          "Updating tracker status and continuing.")
+                # the posts of the first pages are not enough to track
+                # the users of the batch
+                truncated = page > 1
+                break
+
+            data = self.parse_json(resp)
+            # the quota of a key is sent in the body of the responses
+            credentials.record(self.portal_name, credential, resp,
+                               remaining=data.get("quota_remaining"))
+            for post in data.get("items", []):
+                owner_id = str(post.get("owner", {}).get("user_id"))
+                posts.setdefault(owner_id, []).append(post)
+
+            has_more = data.get("has_more", False) and \
+                not kwargs.get("test_response")
+            if max_pages and page >= max_pages:
+                LOG.debug("maximum number of pages reached.")
+                has_more = False
+
+            backoff = data.get("backoff")
+            if backoff:
+                LOG.debug("backoff of %s seconds received." % backoff)
+                _set_backoff(int(backoff))
+
+            if data.get("quota_remaining") == 0 and \
+                    credentials.exhausted(self.portal_name):
+                LOG.debug("no request quota remaining.")
+                quota_exhausted = True
+                truncated = has_more
+                break
+            page += 1
+
+        if truncated:
+            if quota_exhausted:
+                LOG.debug("batch truncated. users rescheduled.")
+                self.reschedule(
+                    [u for group in batch_users.values() for u in group],
+                    countdown=_until_quota_reset())
+            else:
+                LOG.debug("batch truncated. users left pending.")
+            return not quota_exhausted
+
+        for portal_user_id, users in batch_users.items():
+            for user in users:
+                actor_id = user.get("id")
                 self.update_tracker_status(
                     actor_id=actor_id,
-                    status_code=resp.status_code,
+                    status_code=status_code,
                     completed=True)
-                continue
+                if status_code != 200:
+                    continue
 
-            data = resp.json()
-            acts = self.make_as2_payload(
-                posts=data,
-                actor_id=actor_id,
-                prov_api_url=user_posts_url)
-
-            self.update_tracker_status(
-                actor_id=actor_id,
-                status_code=resp.status_code,
-                completed=True)
-            post_to_ldn_inbox(
-                events=acts,
-                from_datetime=last_tracked,
-                inbox_url=self.ldn_inbox_url)
+                acts = self.make_as2_payload(
+                    posts={"items": posts.get(portal_user_id, [])},
+                    actor_id=actor_id,
+                    prov_api_url=user_posts_url)
+                post_to_ldn_inbox(
+                    events=acts,
+                    from_datetime=user.get("lastTracked"),
+                    inbox_url=self.ldn_inbox_url,
+                    portal_name=self.portal_name)
+
+        return not quota_exhausted
 
     def make_as2_payload(self,
                          posts: iter,
@@ -133,9 +305,3 @@ class StackOverflowTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = StackOverflowTracker(**kwargs)
-    tracker.get_events()
@@ -2,25 +2,70 @@
 
 from abc import ABCMeta
 from artifact_tracker import tracker_app
+from artifact_tracker.store.tracker_checkpoint import TrackerCheckpoint
 from artifact_tracker.store.tracker_task import TrackerTask
+from artifact_tracker.utils import breaker, claim_check, concurrency, \
+    credentials, high_water, memory, message, metrics, tracing, transport
 from datetime import datetime
+import requests
+import time
 
 LOG = tracker_app.log
 
 
+class BackfillBudget(object):
+    """
+    Bounds the pages fetched and the time spent by a first-run back-fill
+    in a single task. The tracker counts every page it fetched, and hands
+    the rest of the back-fill to a chained task once the budget is spent.
+    """
+
+    def __init__(self, max_pages: int=None, max_seconds: float=None):
+        self.max_pages = max_pages
+        self.max_seconds = max_seconds
+        self.pages = 0
+        self._start = time.perf_counter()
+
+    def page(self):
+        """
+        Counts a page fetched by the back-fill.
+        """
+        self.pages += 1
+
+    def spent(self) -> bool:
+        """
+        :return: (bool) True if the back-fill must continue in a new task.
+        """
+        if self.max_pages and self.pages >= self.max_pages:
+            return True
+        elapsed = time.perf_counter() - self._start
+        return bool(self.max_seconds) and elapsed >= self.max_seconds
+
+
 class Tracker(metaclass=ABCMeta):
 
     def __init__(self,
                  portal_name: str=None,
                  users: list=None,
                  ldn_inbox_url: str=None,
-                 event_base_url: str=None
+                 event_base_url: str=None,
+                 users_ref: str=None,
+                 delivered: dict=None
                  ):
         self._users = users
+        self._users_ref = users_ref
         self._portal_name = portal_name
         self._portal = None
         self._ldn_inbox_url = ldn_inbox_url
         self._event_base_url = event_base_url
+        # the actors whose run completed in this task
+        self._completed = set()
+        # the actors whose run left a checkpoint to resume from
+        self._checkpointed = set()
+        # the keys of the events delivered to the inbox, by actor,
+        # including the ones of the previous tasks of the users
+        self._delivered = delivered
+        self._ledger = {}
 
         self._set_portal()
 
@@ -38,6 +83,9 @@ class Tracker(metaclass=ABCMeta):
 
     @property
     def users(self) -> list:
+        if self._users is None and self._users_ref:
+            # the users of a claim check are read chunk by chunk
+            self._users = claim_check.ClaimedUsers(self._users_ref)
         return self._users
 
     @property
@@ -62,6 +110,338 @@ class Tracker(metaclass=ABCMeta):
         """
         raise NotImplementedError
 
+    def track(self, **kwargs):
+        """
+        Runs the tracker. The stages of the run are traced, when tracing
+        is enabled, and the summary of the run is stored with the
+        TrackerTask rows of the run's users, as are the high-water marks
+        of the users whose run completed. The events delivered to the
+        inbox are kept in the ledger of the run.
+
+        :param kwargs: the keyword arguments of `get_events`.
+        :return: the result of `get_events`.
+        """
+        with tracing.trace(self.portal_name) as run_trace, \
+                high_water.collect() as marks, \
+                message.ledger(self._delivered) as self._ledger:
+            try:
+                result = self.get_events(**kwargs)
+            finally:
+                self.store_high_water_marks(marks)
+        if run_trace is not None:
+            self.store_run_summary(run_trace.summary())
+        return result
+
+    def store_run_summary(self, summary: dict):
+        """
+        Stores the summary of a tracker run with the TrackerTask rows of
+        the run's users.
+
+        :param summary: (dict) the summary of the run.
+        :return: None
+        """
+        actor_ids = [u.get("id") for u in self.users or [] if u.get("id")]
+        if not actor_ids:
+            return
+        with tracker_app.app.app_context():
+            TrackerTask.query.filter(
+                TrackerTask.portal_name == self.portal_name,
+                TrackerTask.actor_id.in_(actor_ids)
+            ).update({TrackerTask.last_run_summary: summary},
+                     synchronize_session=False)
+            tracker_app.db.session.commit()
+
+    def store_high_water_marks(self, marks: dict):
+        """
+        Stores the high-water marks of the users whose run completed and
+        cleared its checkpoint. The marks of interrupted runs, e.g. a
+        back-fill stopped by an error page, are not stored, so that the
+        runs that resume from their checkpoints do not skip the events
+        left.
+
+        :param marks: (dict) the marks observed in the run, keyed by
+        actor id.
+        :return: None
+        """
+        marks = {actor_id: mark for actor_id, mark in marks.items()
+                 if actor_id in self._completed and
+                 actor_id not in self._checkpointed}
+        try:
+            high_water.store(self.portal_name, marks)
+        except Exception as e:
+            LOG.error(f"Error storing the high-water marks: {e}")
+
+    def get(self, url: str, session=None, credential: dict=None,
+            consume=None, **kwargs) -> requests.Response:
+        """
+        Performs a GET request to the portal. All the requests of the
+        trackers go through this method, which records the latency and the
+        status code of the responses per portal. The request is sent with
+        the transport set in the config, which can record the interactions
+        with the portal or replay them offline, within the adaptive
+        concurrency limit of the portal. It fails fast while the circuit
+        breaker of the portal is open.
+
+        :param url: (str) the url to request.
+        :param session: an optional requests session used for the request,
+        e.g. an OAuth session.
+        :param credential: (dict) the credential of the request, returned
+        by `credential`, whose quota is read from the response headers.
+        :param consume: a function that reads the body of the streamed
+        response. It is called before the request is recorded, so that
+        its read and parse errors count as failed requests.
+        :param kwargs: the keyword arguments of `requests.get`.
+        :return: the response.
+        :raises CircuitOpenError: if the breaker of the portal is open.
+        """
+        tracked = breaker.before_request(self.portal_name)
+        start = time.perf_counter()
+        try:
+            with tracing.span("fetch", url=url) as attrs, \
+                    concurrency.Slot(self.portal_name) as slot:
+                resp = transport.get(url, session=session,
+                                     portal_name=self.portal_name, **kwargs)
+                if consume:
+                    try:
+                        consume(resp)
+                    except Exception:
+                        resp.close()
+                        raise
+                slot.done(resp.status_code)
+                if not kwargs.get("stream"):
+                    attrs["bytes"] = len(resp.content)
+        except Exception:
+            metrics.inc("tracker_http_responses_total",
+                        portal=self.portal_name,
+                        status="error")
+            breaker.record(self.portal_name, False, tracked)
+            raise
+        finally:
+            metrics.observe("tracker_fetch_seconds",
+                            time.perf_counter() - start,
+                            portal=self.portal_name)
+        metrics.inc("tracker_http_responses_total",
+                    portal=self.portal_name,
+                    status=resp.status_code)
+        breaker.record(self.portal_name,
+                       not breaker.is_failure(resp.status_code), tracked)
+        credentials.record(self.portal_name, credential, resp)
+        return resp
+
+    def credential(self, user: dict=None) -> dict:
+        """
+        Chooses the credential of the next request to the portal, from the
+        credential pool of the portal if one is configured.
+
+        :param user: (dict) the user the request is sent for, whose
+        `apiKey` and `apiSecret` are used without a pool.
+        :return: (dict) the `apiKey` and `apiSecret`, or `token`, to use.
+        """
+        return credentials.acquire(self.portal_name, user)
+
+    def parse_json(self, resp: requests.Response, actor_id: str=None):
+        """
+        Parses the JSON body of a portal response.
+
+        :param resp: the response.
+        :param actor_id: (str) the actor the response belongs to, if any.
+        :return: the parsed JSON.
+        """
+        with tracing.span("parse", actor=actor_id):
+            return resp.json()
+
+    def batched_users(self, batch_size: int):
+        """
+        Splits the tracker's users into lists of at most `batch_size`
+        users. Used by the trackers of portals whose APIs accept
+        several user ids in a single request.
+
+        :param batch_size: (int) the maximum number of users per batch.
+        :yield: (list) the users in each batch.
+        """
+        users = self.users or []
+        batch_size = max(int(batch_size or 1), 1)
+        for start in range(0, len(users), batch_size):
+            yield users[start:start + batch_size]
+
+    def over_memory_budget(self, action: str) -> bool:
+        """
+        Checks if the task grew over the memory budget of the portal, the
+        `memory_budget_mb` of the portal or the `budget_mb` of the memory
+        config.
+
+        :param action: (str) what the tracker does when it is over budget,
+        e.g. `split`, recorded in the metrics.
+        :return: (bool) True if the task is over budget.
+        """
+        if not memory.over_budget(self.portal.get("memory_budget_mb")):
+            return False
+        LOG.info(f"{self.portal_name} task over its memory budget "
+                 f"({memory.growth() / memory.MB:.1f} MB): {action}")
+        metrics.inc("tracker_memory_budget_exceeded_total",
+                    portal=self.portal_name,
+                    action=action)
+        return True
+
+    def split_over_memory_budget(self, remaining_users: list) -> bool:
+        """
+        Queues the remaining users of the run as a new task, if the task
+        is over its memory budget, so that the users are tracked by a
+        fresh task instead of growing the worker further.
+
+        :param remaining_users: (list) the users not tracked yet.
+        :return: (bool) True if the users were queued, in which case the
+        tracker must stop.
+        """
+        if not remaining_users or not self.over_memory_budget("split"):
+            return False
+        self.reschedule(remaining_users)
+        return True
+
+    def reschedule(self, users: list, countdown: float=None):
+        """
+        Queues the users in a new task of the portal, without writing
+        their status.
+
+        :param users: (list) the users not tracked by this task.
+        :param countdown: (float) the seconds to wait before running the
+        new task.
+        :return: None
+        """
+        # imported here as the registry imports the trackers
+        from artifact_tracker.tracker import registry
+        registry.dispatch(self.portal_name, list(users),
+                          countdown=countdown,
+                          ldn_inbox_url=self.ldn_inbox_url,
+                          event_base_url=self.event_base_url)
+
+    def load_checkpoint(self, actor_id: str) -> dict:
+        """
+        Returns the checkpoint of an interrupted multi-page run of the
+        actor, if any, expiring after the `checkpoint_ttl` of the portal.
+
+        :param actor_id: (str) the actor, or the key of a run that is not
+        specific to an actor.
+        :return: (dict) the checkpoint or None.
+        """
+        checkpoint = TrackerCheckpoint.load(
+            actor_id, self.portal_name, ttl=self.portal.get("checkpoint_ttl"))
+        if checkpoint:
+            LOG.info(f"resuming {self.portal_name} run for {actor_id} after "
+                     f"{checkpoint['pages']} pages and "
+                     f"{checkpoint['delivered']} events.")
+            self._checkpointed.add(actor_id)
+        return checkpoint
+
+    def save_checkpoint(self, actor_id: str, cursor, delivered: int=0,
+                        state: dict=None):
+        """
+        Saves the cursor of the next page of a multi-page run, once the
+        events of the previous pages were posted to the inbox.
+
+        :param actor_id: (str) the actor, or the key of the run.
+        :param cursor: the cursor of the next page.
+        :param delivered: (int) the events delivered by the run so far.
+        :param state: (dict) the portal specific state of the run.
+        :return: None
+        """
+        try:
+            TrackerCheckpoint.save(actor_id, self.portal_name, cursor,
+                                   delivered=delivered, state=state)
+            self._checkpointed.add(actor_id)
+        except Exception as e:
+            # the run goes on, it will only start over if interrupted
+            LOG.error(f"Error saving the checkpoint of {actor_id}: {e}")
+
+    def clear_checkpoint(self, actor_id: str):
+        """
+        Removes the checkpoint of a run that completed.
+
+        :param actor_id: (str) the actor, or the key of the run.
+        :return: None
+        """
+        try:
+            TrackerCheckpoint.clear(actor_id, self.portal_name)
+            self._checkpointed.discard(actor_id)
+        except Exception as e:
+            LOG.error(f"Error clearing the checkpoint of {actor_id}: {e}")
+
+    def is_first_run(self, user: dict) -> bool:
+        """
+        Checks if the user was never tracked on the portal: the
+        orchestrator sent no `lastToken` or `lastTracked` and there is no
+        TrackerTask row for the user.
+
+        :param user: (dict) the portal user.
+        :return: (bool) True if it is the first run of the user.
+        """
+        if user.get("lastToken") or user.get("lastTracked"):
+            return False
+        with tracker_app.app.app_context():
+            task = TrackerTask.query.filter_by(
+                actor_id=user.get("id"),
+                portal_name=self.portal_name).first()
+            return task is None
+
+    def backfill_budget(self, user: dict) -> BackfillBudget:
+        """
+        Returns the budget of the run of the user if it is a first run,
+        which fetches the whole history of the user, and back-fills are
+        enabled in the config.
+
+        :param user: (dict) the portal user.
+        :return: (BackfillBudget) the budget, or None if the run is not
+        bounded.
+        """
+        config = tracker_app.app.config.get("BACKFILL") or {}
+        if not config.get("enabled") or not self.is_first_run(user):
+            return None
+        return BackfillBudget(
+            max_pages=self.portal.get("backfill_max_pages",
+                                      config.get("max_pages")),
+            max_seconds=self.portal.get("backfill_max_seconds",
+                                        config.get("max_seconds")))
+
+    def continue_backfill(self, user: dict, budget: BackfillBudget):
+        """
+        Queues a task to continue the back-fill of the user from its
+        checkpoint, once the budget of the current task is spent.
+
+        :param user: (dict) the portal user.
+        :param budget: (BackfillBudget) the spent budget.
+        :return: None
+        """
+        LOG.info(f"{self.portal_name} back-fill of {user.get('id')} "
+                 f"continued in a new task after {budget.pages} pages.")
+        metrics.inc("tracker_backfill_continuations_total",
+                    portal=self.portal_name)
+        # imported here as the registry imports the trackers
+        from artifact_tracker.tracker import registry
+        registry.dispatch(self.portal_name, [user],
+                          lane=registry.BACKFILL,
+                          ldn_inbox_url=self.ldn_inbox_url,
+                          event_base_url=self.event_base_url)
+
+    def pending_users(self) -> list:
+        """
+        :return: (list) the users whose run has not completed in this
+        task.
+        """
+        return [u for u in self.users or []
+                if u.get("id") not in self._completed]
+
+    def delivered_events(self, users: list) -> dict:
+        """
+        :param users: (list) the users of the run.
+        :return: (dict) the keys of the events delivered to the inbox for
+        the users, by actor id, to be skipped by the task that resumes
+        them.
+        """
+        actor_ids = {u.get("id") for u in users or []}
+        return {actor_id: sorted(keys)
+                for actor_id, keys in self._ledger.items()
+                if actor_id in actor_ids and keys}
+
     def valid_params(self) -> bool:
         """
         Validate parameters per tracker
@@ -96,7 +476,10 @@ class Tracker(metaclass=ABCMeta):
         """
         Method for updating queue status of tracker
         """
-        with tracker_app.app.app_context():
+        with metrics.timer("tracker_status_update_seconds",
+                           portal=self.portal_name), \
+                tracing.span("status-write", actor=actor_id), \
+                tracker_app.app.app_context():
             task = TrackerTask.query.filter_by(
                 actor_id=actor_id,
                 portal_name=self.portal_name).first()
@@ -118,3 +501,5 @@ class Tracker(metaclass=ABCMeta):
 
             tracker_app.db.session.add(task)
             tracker_app.db.session.commit()
+        if completed:
+            self._completed.add(actor_id)
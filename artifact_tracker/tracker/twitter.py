@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
 from requests_oauthlib import OAuth1Session
-from artifact_tracker import celery, tracker_app
+from artifact_tracker import tracker_app
 # from artifact_tracker.user.utils import decrypt
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
+from artifact_tracker.utils import high_water
 from datetime import datetime
 
 PORTAL_NAME = "twitter"
@@ -61,49 +62,104 @@ class TwitterTracker(Tracker):
                 resource_owner_key=oauth_token,
                 resource_owner_secret=oauth_secret)
 
-            # fetching most recent 200 tweets. 200 is the max returned per req
-            resp, timeline, since_id, max_id = self.get_twitter_response(
-                oauth, since_tl_url)
-            if not resp.status_code == 200 or len(timeline) == 0:
-                self.update_tracker_status(
-                    actor_id=actor_id,
-                    status_code=resp.status_code,
-                    completed=True)
-                return
-            activities = timeline[:]
-            # going back in time to fetch older tweets, 200 at a time
+            # resume an interrupted back-fill from the last max_id
+            checkpoint = self.load_checkpoint(actor_id) \
+                if first_track else None
+            # the back-fill is split in chained tasks of a bounded number
+            # of pages
+            budget = self.backfill_budget(user) if first_track else None
+            stats = {"delivered": 0}
+            if checkpoint:
+                status_code = 200
+                max_id = checkpoint["cursor"]
+                newest_id = checkpoint["state"].get("since_id")
+                stats["delivered"] = checkpoint["delivered"]
+            else:
+                # fetching most recent 200 tweets. 200 is the max returned
+                # per req
+                resp, timeline, since_id, max_id = self.get_twitter_response(
+                    oauth, since_tl_url)
+                if not resp.status_code == 200 or len(timeline) == 0:
+                    self.update_tracker_status(
+                        actor_id=actor_id,
+                        status_code=resp.status_code,
+                        completed=True)
+                    return
+                status_code = resp.status_code
+                newest_id = since_id
+                self._post_page(timeline, actor_id, portal_username,
+                                user_timeline_url, last_token, last_tracked,
+                                stats)
+                if budget:
+                    budget.page()
+            # the newest tweet, kept in the checkpoints of the back-fill,
+            # is the since_id of the next run
+            high_water.observe(actor_id, token=newest_id)
+            # going back in time to fetch older tweets, 200 at a time.
+            # every page is posted as soon as it is received, and its
+            # max_id is checkpointed so that the back-fill can resume there
             max_tl_url = user_timeline_url
             max_tl_url += "&max_id="
             if first_track:
-                while resp.status_code == 200 and bool(max_id):
+                continued = False
+                while status_code == 200 and bool(max_id):
+                    self.save_checkpoint(actor_id, max_id,
+                                         delivered=stats["delivered"],
+                                         state={"since_id": newest_id})
+                    if budget and budget.spent():
+                        # the chained task resumes from the checkpoint
+                        continued = True
+                        break
                     url = max_tl_url + max_id
                     LOG.debug("trying to get older tweets from url: %s" % url)
                     resp, timeline, since_id, max_id = \
                         self.get_twitter_response(oauth, url)
-                    activities.extend(timeline)
+                    status_code = resp.status_code
+                    self._post_page(timeline, actor_id, portal_username,
+                                    user_timeline_url, last_token,
+                                    last_tracked, stats)
+                    if budget:
+                        budget.page()
                     if since_id == max_id:
                         break
+                if continued:
+                    self.continue_backfill(user, budget)
+                    continue
+                if status_code == 200:
+                    self.clear_checkpoint(actor_id)
 
             self.update_tracker_status(
                 actor_id=actor_id,
-                status_code=resp.status_code,
+                status_code=status_code,
                 completed=True)
-            acts = self.make_as2_payload(
-                events=activities,
+
+    def _post_page(self, timeline: list, actor_id: str, portal_username: str,
+                   prov_api_url: str, last_token: str, last_tracked: str,
+                   stats: dict):
+        """
+        Posts the tweets of a page of the user's timeline to the inbox.
+
+        :param timeline: (list) the tweets of the page.
+        :param stats: (dict) the `delivered` count of the run.
+        :return: None
+        """
+        if not timeline:
+            return
+        post_to_ldn_inbox(
+            events=self.make_as2_payload(
+                events=timeline,
                 actor_id=actor_id,
                 portal_username=portal_username,
-                prov_api_url=user_timeline_url,
-                last_token=last_token)
-            post_to_ldn_inbox(
-                events=acts,
-                from_datetime=last_tracked,
-                inbox_url=self.ldn_inbox_url
-            )
-
-    @staticmethod
-    def get_twitter_response(oauth, url):
-        twitter_response = oauth.get(url)
-        timeline = twitter_response.json()
+                prov_api_url=prov_api_url,
+                last_token=last_token),
+            from_datetime=last_tracked,
+            inbox_url=self.ldn_inbox_url,
+            portal_name=self.portal_name,
+            stats=stats)
+
+    def get_twitter_response(self, oauth, url):
+        twitter_response = self.get(url, session=oauth)
+        timeline = self.parse_json(twitter_response)
 
         LOG.debug("API response: %s" % twitter_response.status_code)
         if not twitter_response.status_code == 200 or len(timeline) == 0:
@@ -176,9 +232,3 @@ class TwitterTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = TwitterTracker(**kwargs)
-    tracker.get_events()
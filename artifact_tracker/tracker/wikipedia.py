@@ -1,16 +1,39 @@
 # -*- coding: utf-8 -*-
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
-import requests
+from urllib.parse import quote, urlencode, urlparse
 
 PORTAL_NAME = "wikipedia"
 LOG = tracker_app.log
 
+# the maximum number of user names accepted by the mediawiki api
+# in a single usercontribs request
+# https://www.mediawiki.org/wiki/API:Usercontribs
+MAX_USERS = 50
+
+# the wiki of the users without a `portalUrl`
+DEFAULT_WIKI = "en.wikipedia.org"
+
 
 class WikipediaTracker(Tracker):
 
     def get_events(self, **kwargs) -> bool:
+        """
+        Retrieves the contributions of the users from Wikipedia.
+
+        The MediaWiki API accepts up to 50 user names per
+        `list=usercontribs` request, so the users are grouped into
+        batches. The continuation tokens of the responses are followed
+        until all the contributions are retrieved and the contributions
+        are then split per user and posted to the LDN inbox.
+
+        :param kwargs: only used for unit testing. When the `test_response`
+        key is set, this method will not perform the API requests and
+        use the mock response.
+        :return: (bool): True if the contributions of all the batches were
+        retrieved, False otherwise.
+        """
 
         LOG.debug(f"Executing {PORTAL_NAME} get events")
 
@@ -18,68 +41,194 @@ class WikipediaTracker(Tracker):
             LOG.debug("no users. exiting.")
             return False
 
-        for user in self.users:
-            actor_id = user.get("id")
-            portal_username = user.get("username")
-            last_tracked = user.get("lastTracked")
+        default_wiki = self.portal.get("default_wiki") or DEFAULT_WIKI
+        wikis = set(self.portal.get("wikis") or [default_wiki])
+        success = True
+        batch_size = min(self.portal.get("batch_size") or MAX_USERS,
+                         MAX_USERS)
+        for n, batch in enumerate(self.batched_users(batch_size)):
+            if n and self.split_over_memory_budget(
+                    self.users[n * batch_size:]):
+                LOG.debug("remaining users queued in a new task.")
+                break
+
+            # the users of every wiki are requested from its own api
+            wiki_users = {}
+            for user in batch:
+                portal_username = user.get("username")
+                if not portal_username:
+                    LOG.debug("username not configured. skipping.")
+                    continue
+                wiki = self.wiki_of(user) or default_wiki
+                if wiki not in wikis:
+                    LOG.debug(f"wiki {wiki} not configured. skipping.")
+                    continue
+                wiki_users.setdefault(wiki, {}).setdefault(
+                    self.normalize_username(portal_username), []
+                ).append(user)
+
+            for wiki, batch_users in wiki_users.items():
+                success = self.get_batch_events(
+                    batch_users, wiki=wiki, **kwargs) and success
+        return success
+
+    @staticmethod
+    def wiki_of(user: dict) -> str:
+        """
+        :param user: (dict) the portal user.
+        :return: (str) the host of the wiki of the user, from its
+        `portalUrl`, e.g. `de.wikipedia.org`, or None.
+        """
+        return urlparse(user.get("portalUrl") or "").netloc.lower() or None
 
-            if not portal_username:
-                LOG.debug("username not configured. skipping.")
-                continue
+    @staticmethod
+    def normalize_username(username: str) -> str:
+        """
+        Normalizes a user name the way MediaWiki does in the `user` field
+        of the contributions: underscores are replaced with spaces and
+        the first letter is capitalized.
+
+        :param username: (str) the user name.
+        :return: (str) the normalized user name.
+        """
+        username = username.replace("_", " ").strip()
+        return username[:1].upper() + username[1:]
 
-            user_contributions_url = self.portal.get("event_urls", {}).\
-                get("contributions_url").format(portal_username)
+    def get_batch_events(self, batch_users: dict, wiki: str=DEFAULT_WIKI,
+                         **kwargs) -> bool:
+        """
+        Retrieves the contributions of a batch of users with a multi-user
+        request, following the `continue` tokens, and posts the events of
+        every user to the LDN inbox.
+
+        The users of a batch whose pages could not all be retrieved are
+        not marked as tracked, and are left for the next run of the
+        orchestrator. When the api rejects the batch, e.g. for a user
+        name that does not exist, the users are requested one by one.
+
+        :param batch_users: (dict) the users of the batch keyed by their
+        normalized user name.
+        :param wiki: (str) the host of the wiki of the users.
+        :return: (bool): True if all the contributions were retrieved,
+        False otherwise.
+        """
+        user_contributions_url = self.portal.get("event_urls", {}).\
+            get("contributions_url").format(
+                quote("|".join(batch_users)), wiki=wiki)
 
-            if last_tracked:
-                # Dedup by apending query parameter to url
-                LOG.debug("start date value found in tracker state db entry.")
-                api_start = "&ucend={}"
-                user_contributions_url += api_start.format(last_tracked)
+        last_tracked = [u.get("lastTracked") for users in
+                        batch_users.values() for u in users]
+        if all(last_tracked):
+            # Dedup by apending query parameter to url. The oldest
+            # last tracked date of the batch is used, newer dates are
+            # filtered per user when posting to the inbox.
+            LOG.debug("start date value found in tracker state db entry.")
+            api_start = "&ucend={}"
+            user_contributions_url += api_start.format(min(last_tracked))
 
-            resp = requests.get(user_contributions_url)
-            LOG.debug("getting user events: %s" % user_contributions_url)
+        contributions = {}
+        status_code = None
+        continue_params = {}
+        truncated = False
+        while True:
+            page_url = user_contributions_url
+            if continue_params:
+                page_url += "&" + urlencode(continue_params)
+            LOG.debug("getting user events: %s" % page_url)
+            resp = kwargs.get("test_response")
+            if not resp:
+                resp = self.get(page_url)
+            status_code = resp.status_code
 
             if resp.status_code != 200:
                 LOG.debug("non-200 response code received. "
-                          "Updating tracker status and exiting.")
+                          "Updating tracker status and continuing.")
+                # the contributions of the first pages are not enough
+                # to track the users of the batch
+                truncated = bool(continue_params)
+                break
+
+            data = self.parse_json(resp)
+            error = data.get("error")
+            if error:
+                # the api answers an invalid user name with a 200
+                LOG.debug("error received: {}".format(error.get("info")))
+                if len(batch_users) > 1 and not continue_params:
+                    return self.get_user_events(batch_users, wiki,
+                                                **kwargs)
+                truncated = bool(continue_params)
+                break
+
+            for event in data.get("query", {}).get("usercontribs", []):
+                contributions.setdefault(event.get("user"), []).append(event)
+
+            continue_params = data.get("continue")
+            if not continue_params or kwargs.get("test_response"):
+                break
+
+        if truncated:
+            LOG.debug("batch truncated. users left pending.")
+            return False
+
+        for portal_username, users in batch_users.items():
+            for user in users:
+                actor_id = user.get("id")
                 self.update_tracker_status(
                     actor_id=actor_id,
-                    status_code=resp.status_code,
+                    status_code=status_code,
                     completed=True)
-                return False
-
-            data = resp.json()
-
-            acts = self.make_as2_payload(
-                events=data,
-                actor_id=actor_id,
-                portal_username=portal_username,
-                prov_api_url=user_contributions_url)
-            # last_tracked = data.get("query", {}).get("usercontribs")[0]\
-            # .get("timestamp")
-            if acts:
-                self.update_tracker_status(
+                if status_code != 200:
+                    continue
+
+                user_events = contributions.get(portal_username)
+                if not user_events:
+                    LOG.debug("{} portal has 0 events for {}.".format(
+                        PORTAL_NAME, actor_id))
+                    continue
+
+                acts = self.make_as2_payload(
+                    events={"query": {"usercontribs": user_events}},
                     actor_id=actor_id,
-                    status_code=resp.status_code,
-                    completed=True)
+                    portal_username=user.get("username"),
+                    prov_api_url=user_contributions_url,
+                    wiki=wiki)
                 post_to_ldn_inbox(
                     events=acts,
-                    from_datetime=last_tracked,
-                    inbox_url=self.ldn_inbox_url)
-            else:
-                LOG.debug("{} portal has 0 events for {}.".format(
-                    PORTAL_NAME, actor_id))
-        return True
+                    from_datetime=user.get("lastTracked"),
+                    inbox_url=self.ldn_inbox_url,
+                    portal_name=self.portal_name)
+
+        return status_code == 200
+
+    def get_user_events(self, batch_users: dict, wiki: str,
+                        **kwargs) -> bool:
+        """
+        Retrieves the contributions of the users of a rejected batch one
+        by one, so that an invalid user name only fails its own users.
+
+        :param batch_users: (dict) the users of the batch keyed by their
+        normalized user name.
+        :param wiki: (str) the host of the wiki of the users.
+        :return: (bool): True if all the contributions were retrieved,
+        False otherwise.
+        """
+        success = True
+        for portal_username, users in batch_users.items():
+            success = self.get_batch_events(
+                {portal_username: users}, wiki=wiki, **kwargs) and success
+        return success
 
     def make_as2_payload(self,
                          events: iter,
                          actor_id: str,
                          portal_username: str,
-                         prov_api_url: str):
+                         prov_api_url: str,
+                         wiki: str=DEFAULT_WIKI):
         """
         Converts the Slideshare API response into ActivityStream message.
 
         :param events: the list of slides from the slideshare api response.
+        :param wiki: (str) the host of the wiki of the contributions.
         :yield: a generator list of ActivityStream messages.
         """
         events_list = events.get("query", {}).get("usercontribs")
@@ -94,8 +243,8 @@ class WikipediaTracker(Tracker):
                 .append({"@id": prov_api_url})
 
             actor = {}
-            actor["url"] = "https://wikipedia.org/wiki/User:{}"\
-                .format(portal_username)
+            actor["url"] = "https://{}/wiki/User:{}"\
+                .format(wiki, portal_username)
             actor["type"] = "Person"
             actor["name"] = portal_username
             actor["id"] = actor_id
@@ -132,14 +281,14 @@ class WikipediaTracker(Tracker):
                 items.append(
                     {"type": ["Link", "Article", "schema:Article"],
                      "href":
-                        "https://wikipedia.org/wiki/{}{}".format(title,
-                                                                 p["params"]),
+                        "https://{}/wiki/{}{}".format(wiki, title,
+                                                      p["params"]),
                      "OriginalResource":
-                        "https://wikipedia.org/wiki/{}{}".format(title,
-                                                                 p["source"]),
+                        "https://{}/wiki/{}{}".format(wiki, title,
+                                                      p["source"]),
                      "Memento":
-                        "https://wikipedia.org/wiki/{}{}".format(title,
-                                                                 p["params"]),
+                        "https://{}/wiki/{}{}".format(wiki, title,
+                                                      p["params"]),
                      "mementoDatetime": created_at
                      })
 
@@ -150,9 +299,3 @@ class WikipediaTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = WikipediaTracker(**kwargs)
-    tracker.get_events()
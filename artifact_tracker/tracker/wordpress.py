@@ -1,11 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from artifact_tracker import tracker_app, celery
+from artifact_tracker import tracker_app
 from artifact_tracker.utils.message import post_to_ldn_inbox, template_as2
 from artifact_tracker.tracker.tracker import Tracker
+from artifact_tracker.utils.feed import FeedCache, group_by_feed
 from datetime import datetime
-import feedparser
-import requests
 
 PORTAL_NAME = "wordpress"
 LOG = tracker_app.log
@@ -32,7 +31,16 @@ class WordpressTracker(Tracker):
             LOG.debug("no users. exiting.")
             return False
 
-        for user in self.users:
+        # authors of the same blog share the feed, which is fetched and
+        # parsed only once per run, and released after its last author
+        feed_cache = FeedCache(fetch=self.get)
+        users = group_by_feed(self.users, lambda u: u.get("portalUrl"))
+        previous_url = None
+        for n, user in enumerate(users):
+            if n and self.split_over_memory_budget(users[n:]):
+                LOG.debug("remaining users queued in a new task.")
+                break
+
             actor_id = user.get("id")
             portal_username = user.get("username")
             portal_url = user.get("portalUrl")
@@ -43,21 +51,22 @@ class WordpressTracker(Tracker):
                 continue
 
             prov_url = portal_url + "feed/"
+            if previous_url and previous_url != prov_url:
+                feed_cache.release(previous_url)
+            previous_url = prov_url
 
-            resp = requests.get(prov_url)
             LOG.debug("getting wordpress user feed: %s" % prov_url)
+            status_code, feed = feed_cache.get(prov_url)
 
-            if resp.status_code != 200:
+            if status_code != 200:
                 LOG.debug("non-200 response code received. "
                           "Updating tracker status and exiting.")
                 self.update_tracker_status(
                     actor_id=actor_id,
-                    status_code=resp.status_code,
+                    status_code=status_code,
                     completed=True)
                 continue
 
-            feed = feedparser.parse(resp.content)
-
             last_updated = datetime.strptime(
                 feed.get("feed", {}).get("updated"),
                 "%a, %d %b %Y %H:%M:%S %z")
@@ -70,6 +79,8 @@ class WordpressTracker(Tracker):
 
             acts = self.make_as2_payload(
                 feed=feed,
+                entries=feed_cache.entries_by_author(prov_url).get(
+                    portal_username, []),
                 actor_id=actor_id,
                 portal_url=portal_url,
                 portal_username=portal_username,
@@ -78,18 +89,20 @@ class WordpressTracker(Tracker):
 
             self.update_tracker_status(
                 actor_id=actor_id,
-                status_code=resp.status_code,
+                status_code=status_code,
                 completed=True)
 
             post_to_ldn_inbox(
                 events=acts,
                 from_datetime=last_tracked,
-                inbox_url=self.ldn_inbox_url)
+                inbox_url=self.ldn_inbox_url,
+                portal_name=self.portal_name)
 
         return True
 
     def make_as2_payload(self,
                          feed: dict,
+                         entries: list,
                          actor_id: str,
                          portal_url: str,
                          portal_username: str,
@@ -106,12 +119,8 @@ class WordpressTracker(Tracker):
 
         target_name = feed.get("feed", {}).get("title")
 
-        for event in feed.get("entries"):
-
-            # skip entries that don't match the given username
-            if event.get("author") != portal_username:
-                continue
-
+        # entries are already filtered to the ones of the given username
+        for event in entries:
             as2_payload = template_as2(self.event_base_url,
                                        self.portal_name)
 
@@ -146,9 +155,3 @@ class WordpressTracker(Tracker):
             as2_payload["event"]["object"] = obj
 
             yield as2_payload
-
-
-@celery.task
-def run(**kwargs):
-    tracker: Tracker = WordpressTracker(**kwargs)
-    tracker.get_events()
@@ -0,0 +1,153 @@
+"""
+Admission control of the orchestrator messages posted to the inbox.
+
+When enabled in the config, the inbox checks the backlog of the workers
+before queueing the tasks of a message: the number of tracker tasks
+waiting in the broker queues and in the fair queues, and the lag of the
+workers, the time the oldest waiting task has been queued for.
+
+While a threshold is exceeded, the messages are either rejected with a
+`503` and a `Retry-After` header, so that the orchestrator sends them
+again later, or accepted with a `202` and deferred in redis, up to
+`max_deferred` messages, until the workers have caught up.
+"""
+import json
+import time
+
+DEFERRED = "admission:deferred"
+REJECT = "reject"
+DEFER = "defer"
+
+
+def config() -> dict:
+    from artifact_tracker import tracker_app
+    return tracker_app.app.config.get("ADMISSION") or {}
+
+
+def enabled() -> bool:
+    return bool(config().get("enabled"))
+
+
+def _broker_keys() -> list:
+    # the redis lists of the tracker queues, with their priority lists
+    from artifact_tracker import celery
+    from artifact_tracker.tracker import registry
+    from kombu.transport.redis import Channel, PRIORITY_STEPS
+    names = registry.queues() or [celery.conf.task_default_queue]
+    keys = []
+    for name in names:
+        keys.append(name)
+        for step in PRIORITY_STEPS:
+            if step:
+                keys.append("{}{}{}".format(name, Channel.sep, step))
+    return keys
+
+
+def _queued_at(message: bytes) -> float:
+    try:
+        headers = json.loads(message).get("headers") or {}
+        return float(headers.get("queued_at"))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def backlog() -> (int, float):
+    """
+    Measures the backlog of the workers.
+
+    :return: (tuple) the number of tasks waiting in the broker queues and
+    the fair queues, and the seconds the oldest task of the broker queues
+    has been waiting for.
+    """
+    from artifact_tracker.utils import fair
+    from artifact_tracker.utils.redis_client import get_redis
+    client = get_redis()
+    keys = _broker_keys()
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.llen(key)
+        # published with LPUSH, the oldest message is the last one
+        pipe.lindex(key, -1)
+    results = pipe.execute()
+
+    depth = sum(results[0::2])
+    oldest = [_queued_at(m) for m in results[1::2] if m]
+    oldest = [t for t in oldest if t]
+    lag = time.time() - min(oldest) if oldest else 0.0
+    if fair.enabled():
+        depth += fair.backlog(client)
+    return depth, lag
+
+
+def check() -> (bool, str):
+    """
+    Checks if the workers can take the tasks of a new message.
+
+    :return: (tuple) True if the message is admitted, and the reason it
+    was not.
+    """
+    settings = config()
+    depth, lag = backlog()
+    max_depth = settings.get("max_queue_depth")
+    if max_depth and depth >= int(max_depth):
+        return False, f"{depth} tasks queued"
+    max_lag = settings.get("max_lag_seconds")
+    if max_lag and lag >= float(max_lag):
+        return False, f"workers {lag:.0f}s behind"
+    return True, None
+
+
+def retry_after() -> int:
+    """
+    :return: (int) the seconds the orchestrator should wait before
+    sending a rejected message again.
+    """
+    return int(config().get("retry_after") or 60)
+
+
+def defer(message: dict) -> bool:
+    """
+    Defers a message until the workers have caught up.
+
+    :param message: (dict) the AS2 message.
+    :return: (bool) False if there are already `max_deferred` deferred
+    messages, in which case the message must be rejected.
+    """
+    from artifact_tracker.utils.redis_client import get_redis
+    client = get_redis()
+    max_deferred = int(config().get("max_deferred") or 0)
+    if max_deferred and client.llen(DEFERRED) >= max_deferred:
+        return False
+    client.rpush(DEFERRED, json.dumps(message))
+    return True
+
+
+def drain(limit: int=10) -> int:
+    """
+    Queues the tasks of the deferred messages, oldest first, while the
+    workers can take them.
+
+    :param limit: (int) the maximum number of messages queued.
+    :return: (int) the number of messages queued.
+    """
+    from artifact_tracker import tracker_app
+    from artifact_tracker.utils.as2_to_user import queue_tasks
+    from artifact_tracker.utils.redis_client import get_redis
+    client = get_redis()
+    drained = 0
+    while drained < limit and client.llen(DEFERRED):
+        admitted, reason = check()
+        if not admitted:
+            break
+        message = client.lpop(DEFERRED)
+        if message is None:
+            break
+        try:
+            queue_tasks(json.loads(message))
+        except Exception as e:
+            tracker_app.log.error(f"Error queueing a deferred message: {e}")
+            # the message is kept for the next drain
+            client.lpush(DEFERRED, message)
+            break
+        drained += 1
+    return drained
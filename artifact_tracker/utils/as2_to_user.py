@@ -1,5 +1,3 @@
-from importlib import import_module
-
 """
 
 Running 1 actor_id -> N portals
@@ -20,14 +18,23 @@ id1 | portal_name4
 Controller:
 """
 
+# portals whose users are tracked together in a single task
+BATCH_PORTALS = ["figshare", "blogger", "wordpress", "stackoverflow",
+                 "wikipedia"]
+
 
 def queue_tasks(message):
     """
     Task queueing logic for ingesting an AS2 message to then track users.
     Message received via LDN inbox.
     """
-    batch_apis = ["figshare", "blogger", "wordpress"]
+    # imported here as the inbox is loaded before the celery app exists
+    from artifact_tracker.tracker import registry
+    from artifact_tracker.utils import fair, high_water, metrics
+
+    batch_apis = BATCH_PORTALS
     batch_queue = {}
+    tasks = []
     users = message.get("event", {}).get("object", {}).get("describes", [])
     ldn_inbox_url = message.get("event", {}).get("to")
     event_base_url = message.get("event", {}).get("tracker:eventBaseUrl")
@@ -35,6 +42,7 @@ def queue_tasks(message):
         # TODO: error message
         return False
 
+    portal_users = []
     for u in users:
         user_id = u.get("id")
         portals = u.get("tracker:portals", {}).get("items", [])
@@ -46,35 +54,52 @@ def queue_tasks(message):
                     key.replace("tracker:", "")
                 ] = value
             portal_user["id"] = user_id
-            portal_name = portal_user.get("name")
-            if portal_name in batch_apis:
-                batch_queue.setdefault(portal_name, {})
-                batch_queue[portal_name].setdefault("users", [])
-                batch_queue[portal_name].setdefault("portal_name", portal_name)
-                batch_queue[portal_name].setdefault("ldn_inbox_url",
-                                                    ldn_inbox_url)
-                batch_queue[portal_name].setdefault("event_base_url",
-                                                    event_base_url)
-                batch_queue[portal_name]["users"].append(portal_user)
-            else:
-                tracker = import_module('artifact_tracker.tracker.{}'
-                                        .format(portal_name))
-                tracker.run.delay(portal_name=portal_name,
-                                  users=[portal_user],
-                                  ldn_inbox_url=ldn_inbox_url,
-                                  event_base_url=event_base_url)
-                # synchronous testing
-                # tracker.run(portal_name=portal_name,
-                #             users=[portal_user],
-                #             ldn_inbox_url=ldn_inbox_url,
-                #             event_base_url=event_base_url)
+            if not registry.is_registered(portal_user.get("name")):
+                # TODO: error message
+                continue
+            portal_users.append(portal_user)
+
+    # the users sent without their lastTracked or lastToken are tracked
+    # from the high-water marks of their last runs
+    high_water.apply(portal_users)
+
+    for portal_user in portal_users:
+        portal_name = portal_user.get("name")
+        # first runs are queued in the back-fill lane, so that they
+        # do not hold up the incremental runs
+        lane = registry.lane_of([portal_user])
+        if portal_name in batch_apis:
+            key = (portal_name, lane)
+            batch_queue.setdefault(key, {})
+            batch_queue[key].setdefault("users", [])
+            batch_queue[key].setdefault("portal_name", portal_name)
+            batch_queue[key].setdefault("lane", lane)
+            batch_queue[key].setdefault("ldn_inbox_url", ldn_inbox_url)
+            batch_queue[key].setdefault("event_base_url", event_base_url)
+            batch_queue[key]["users"].append(portal_user)
+        else:
+            tasks.append(dict(portal_name=portal_name,
+                              users=[portal_user],
+                              lane=lane,
+                              ldn_inbox_url=ldn_inbox_url,
+                              event_base_url=event_base_url))
+            # synchronous testing
+            # registry.run(portal_name=portal_name,
+            #              users=[portal_user],
+            #              ldn_inbox_url=ldn_inbox_url,
+            #              event_base_url=event_base_url)
     # batch users in api request
-    for portal_name in batch_queue:
-        config = batch_queue.get(portal_name, {})
-        tracker = import_module('artifact_tracker.tracker.{}'
-                                .format(portal_name))
-        tracker.run.delay(**config)
+    for key in batch_queue:
+        config = batch_queue.get(key, {})
+        tasks.append(config)
         # synchronous testing
-        # tracker.run(**config)
+        # registry.run(**config)
 
+    if fair.enabled():
+        # the tasks are interleaved with the tasks of the other messages
+        fair.submit(fair.group_of(message), tasks)
+    else:
+        for config in tasks:
+            registry.dispatch(**config)
+    metrics.observe("queue_tasks_fanout", len(tasks))
     return True
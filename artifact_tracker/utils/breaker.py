@@ -0,0 +1,139 @@
+"""
+Circuit breakers of the portal APIs, shared by the workers in redis.
+
+When enabled in the config, the breaker of a portal opens after
+`failure_threshold` consecutive failed requests: connection errors,
+timeouts, `429` and `5xx` responses. While it is open, the requests of
+the trackers to the portal fail fast with `CircuitOpenError` and the
+users of the task are rescheduled. After `open_seconds`, the breaker is
+half-open: a single probe request is let through, which closes the
+breaker if it succeeds and opens it again if it fails.
+"""
+from artifact_tracker.utils import metrics
+import time
+
+KEY_PREFIX = "breaker:"
+CLOSED = "closed"
+OPEN = "open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request to a portal whose breaker is
+    open.
+    """
+
+    def __init__(self, portal_name: str, retry_after: float):
+        super(CircuitOpenError, self).__init__(
+            f"Circuit open for {portal_name}, retry after "
+            f"{retry_after:.0f}s")
+        self.portal_name = portal_name
+        self.retry_after = retry_after
+
+
+def config(portal_name: str=None) -> dict:
+    """
+    :param portal_name: (str) the portal, whose `breaker_failure_threshold`
+    and `breaker_open_seconds` override the breaker config.
+    :return: (dict) the breaker config.
+    """
+    from artifact_tracker import tracker_app
+    settings = dict(tracker_app.app.config.get("BREAKER") or {})
+    portal = tracker_app.app.config.get("PORTALS", {}).get(portal_name, {})
+    for key in ("failure_threshold", "open_seconds"):
+        if portal.get("breaker_" + key) is not None:
+            settings[key] = portal.get("breaker_" + key)
+    return settings
+
+
+def is_failure(status_code: int) -> bool:
+    """
+    :return: (bool) True if the status code means that the portal is down
+    or rejecting requests.
+    """
+    return status_code == 429 or status_code >= 500
+
+
+def before_request(portal_name: str) -> bool:
+    """
+    Checks the breaker of the portal before a request.
+
+    :param portal_name: (str) the portal.
+    :return: (bool) True if the breaker must be updated after the
+    request, i.e. there were failures or the request is a probe.
+    :raises CircuitOpenError: if the breaker is open, or half-open and
+    another request is probing the portal.
+    """
+    from artifact_tracker import tracker_app
+    from artifact_tracker.utils.redis_client import get_redis
+    settings = config(portal_name)
+    if not settings.get("enabled"):
+        return False
+    key = KEY_PREFIX + portal_name
+    try:
+        client = get_redis()
+        state = client.hgetall(key)
+        if not state:
+            return False
+        if state.get(b"state", b"").decode() != OPEN:
+            return int(state.get(b"failures") or 0) > 0
+        open_seconds = float(settings.get("open_seconds") or 300)
+        remaining = float(state.get(b"opened_at") or 0) + open_seconds - \
+            time.time()
+        probing = remaining <= 0 and client.set(
+            key + ":probe", 1, nx=True, ex=max(int(open_seconds), 1))
+    except Exception as e:
+        # the portal is requested when the state of its breaker is unknown
+        tracker_app.log.error(f"Error reading the {portal_name} breaker: {e}")
+        return False
+    if not probing:
+        # while another request probes the portal, the users are
+        # rescheduled as if the breaker had just opened
+        raise CircuitOpenError(
+            portal_name, remaining if remaining > 0 else open_seconds)
+    tracker_app.log.info(f"{portal_name} breaker half-open, probing.")
+    return True
+
+
+def record(portal_name: str, success: bool, tracked: bool=False):
+    """
+    Records the outcome of a request in the breaker of the portal.
+
+    :param portal_name: (str) the portal.
+    :param success: (bool) False if the request failed.
+    :param tracked: (bool) the result of `before_request`. Successes only
+    update the breaker if it had failures, so that they cost no write.
+    :return: None
+    """
+    from artifact_tracker import tracker_app
+    from artifact_tracker.utils.redis_client import get_redis
+    settings = config(portal_name)
+    if not settings.get("enabled") or (success and not tracked):
+        return
+    key = KEY_PREFIX + portal_name
+    try:
+        client = get_redis()
+        if success:
+            if client.hget(key, "state") == OPEN.encode():
+                tracker_app.log.info(f"{portal_name} breaker closed.")
+            client.delete(key, key + ":probe")
+            return
+        failures = client.hincrby(key, "failures", 1)
+        threshold = int(settings.get("failure_threshold") or 5)
+        state = client.hget(key, "state")
+        if failures >= threshold or state == OPEN.encode():
+            # opened, or opened again after a failed probe
+            pipe = client.pipeline()
+            pipe.hset(key, "state", OPEN)
+            pipe.hset(key, "opened_at", time.time())
+            pipe.delete(key + ":probe")
+            pipe.execute()
+            if state != OPEN.encode():
+                metrics.inc("tracker_breaker_opened_total",
+                            portal=portal_name)
+                tracker_app.log.warning(
+                    f"{portal_name} breaker opened after {failures} "
+                    f"failures.")
+    except Exception as e:
+        tracker_app.log.error(
+            f"Error updating the {portal_name} breaker: {e}")
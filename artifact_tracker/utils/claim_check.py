@@ -0,0 +1,117 @@
+"""
+Claim checks of the users of the tracker tasks.
+
+When enabled in the config, the users of a task with at least
+`min_users` users are not sent to the broker in the task's message.
+They are stored once in redis, as zlib compressed JSON chunks of
+`chunk_size` users, and the task only carries the reference of the
+claim check, its `users_ref`. The worker reads the users chunk by chunk
+as the tracker iterates over them, so that neither the broker nor the
+workers handle the whole list at once.
+
+A claim check is deleted when its task is done, and expires after `ttl`
+seconds if the task is lost.
+"""
+from collections.abc import Sequence
+import json
+import uuid
+import zlib
+
+KEY_PREFIX = "claim:"
+
+
+def config() -> dict:
+    from artifact_tracker import tracker_app
+    return tracker_app.app.config.get("CLAIM_CHECK") or {}
+
+
+def applies(users: list) -> bool:
+    """
+    :param users: (list) the users of a task.
+    :return: (bool) True if the users must be sent as a claim check.
+    """
+    settings = config()
+    return bool(settings.get("enabled")) and \
+        len(users or []) >= int(settings.get("min_users") or 1)
+
+
+def store(users: list) -> str:
+    """
+    Stores the users of a task.
+
+    :param users: (list) the users.
+    :return: (str) the reference of the claim check.
+    """
+    from artifact_tracker.utils.redis_client import get_redis
+    settings = config()
+    chunk_size = max(int(settings.get("chunk_size") or 500), 1)
+    ref = str(uuid.uuid4())
+    key = KEY_PREFIX + ref
+    pipe = get_redis().pipeline()
+    pipe.hset(key, "count", len(users))
+    pipe.hset(key, "chunk_size", chunk_size)
+    for n, start in enumerate(range(0, len(users), chunk_size)):
+        chunk = json.dumps(users[start:start + chunk_size])
+        pipe.hset(key, n, zlib.compress(chunk.encode()))
+    pipe.expire(key, int(settings.get("ttl") or 604800))
+    pipe.execute()
+    return ref
+
+
+def delete(ref: str):
+    """
+    Deletes a claim check once its task is done.
+
+    :param ref: (str) the reference of the claim check.
+    :return: None
+    """
+    from artifact_tracker.utils.redis_client import get_redis
+    get_redis().delete(KEY_PREFIX + ref)
+
+
+class ClaimedUsers(Sequence):
+    """
+    The users of a claim check, read from redis one chunk at a time. Only
+    the chunk of the last user read is kept in memory.
+
+    :raises KeyError: if the claim check expired or was deleted.
+    """
+
+    def __init__(self, ref: str):
+        from artifact_tracker.utils.redis_client import get_redis
+        self.ref = ref
+        self._client = get_redis()
+        count, chunk_size = self._client.hmget(
+            KEY_PREFIX + ref, ["count", "chunk_size"])
+        if count is None:
+            raise KeyError(f"Claim check {ref} not found.")
+        self._count = int(count)
+        self._chunk_size = int(chunk_size)
+        self._chunk = None
+        self._chunk_index = None
+
+    def _load(self, n: int) -> list:
+        if n != self._chunk_index:
+            data = self._client.hget(KEY_PREFIX + self.ref, n)
+            if data is None:
+                raise KeyError(f"Claim check {self.ref} not found.")
+            self._chunk = json.loads(zlib.decompress(data).decode())
+            self._chunk_index = n
+        return self._chunk
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("user index out of range")
+        chunk = self._load(index // self._chunk_size)
+        return chunk[index % self._chunk_size]
+
+    def __iter__(self):
+        for n in range(0, self._count, self._chunk_size):
+            yield from self._load(n // self._chunk_size)
@@ -0,0 +1,188 @@
+"""
+Adaptive concurrency limits of the portal APIs and the LDN inbox, shared
+by the workers in redis.
+
+When enabled in the config, every request of the trackers to a portal,
+and every delivery to the LDN inbox, takes a slot of its target before
+it is sent. The number of slots is adjusted with AIMD (additive
+increase, multiplicative decrease), like the congestion window of TCP:
+
+- every healthy response raises the limit by `increase / limit`, i.e. by
+  `increase` once a limit's worth of requests succeeded, up to `max`,
+- a `429` or `503` response, an error, or a latency over
+  `latency_factor` times the average latency of the target multiplies
+  the limit by `decrease`, down to `min`, at most once per average
+  latency so that the requests in flight do not cut it repeatedly.
+
+A request that waits more than `max_wait` seconds for a slot is sent
+anyway, and the slots of the requests of lost workers are freed after
+`lease_seconds`.
+"""
+from artifact_tracker.utils import metrics
+import time
+import uuid
+
+KEY_PREFIX = "aimd:"
+LDN = "ldn"
+
+# takes a slot if there is one: KEYS = leases, limit.
+# ARGV = now, lease seconds, lease id, initial limit
+_ACQUIRE = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1] - ARGV[2])
+local limit = tonumber(redis.call('GET', KEYS[2]) or ARGV[4])
+if redis.call('ZCARD', KEYS[1]) < math.max(math.floor(limit), 1) then
+  redis.call('ZADD', KEYS[1], ARGV[1], ARGV[3])
+  return 1
+end
+return 0
+"""
+
+# releases a slot and adjusts the limit: KEYS = leases, limit, latency,
+# cut. ARGV = lease id, healthy (1/0), latency, initial, min, max,
+# increase, decrease, latency factor
+_RELEASE = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+local limit = tonumber(redis.call('GET', KEYS[2]) or ARGV[4])
+local latency = tonumber(ARGV[3])
+local average = tonumber(redis.call('GET', KEYS[3]) or latency)
+local healthy = ARGV[2] == '1' and latency <= average * tonumber(ARGV[9])
+redis.call('SET', KEYS[3], average * 0.9 + latency * 0.1)
+local cut = 0
+if healthy then
+  limit = math.min(tonumber(ARGV[6]), limit + tonumber(ARGV[7]) / limit)
+elseif redis.call('SET', KEYS[4], 1, 'NX', 'PX',
+                  math.max(math.floor(average * 1000), 100)) then
+  limit = math.max(tonumber(ARGV[5]), limit * tonumber(ARGV[8]))
+  cut = 1
+end
+redis.call('SET', KEYS[2], limit)
+return {tostring(limit), cut}
+"""
+
+_scripts = {}
+
+
+def config(target: str=None) -> dict:
+    """
+    :param target: (str) the portal, whose `concurrency_min` and
+    `concurrency_max` override the concurrency config.
+    :return: (dict) the concurrency config.
+    """
+    from artifact_tracker import tracker_app
+    settings = dict(tracker_app.app.config.get("CONCURRENCY") or {})
+    portal = tracker_app.app.config.get("PORTALS", {}).get(target, {})
+    for key in ("min", "max"):
+        if portal.get("concurrency_" + key) is not None:
+            settings[key] = portal.get("concurrency_" + key)
+    return settings
+
+
+def is_overload(status_code: int) -> bool:
+    """
+    :return: (bool) True if the status code asks the client to slow down.
+    """
+    return status_code in (429, 503)
+
+
+def _script(client, name: str, source: str):
+    script = _scripts.get((id(client), name))
+    if script is None:
+        script = client.register_script(source)
+        _scripts[(id(client), name)] = script
+    return script
+
+
+class Slot(object):
+    """
+    A slot of the concurrency limit of a target, held while a request is
+    in flight:
+
+        with Slot("github") as slot:
+            resp = requests.get(url)
+            slot.done(resp.status_code)
+
+    The slot is released as unhealthy if `done` was not called, e.g. when
+    the request raised.
+    """
+
+    def __init__(self, target: str):
+        self.target = target
+        self.settings = config(target)
+        self.lease = None
+        self.status_code = None
+        self._start = None
+
+    def _keys(self, *names) -> list:
+        return [KEY_PREFIX + self.target + ":" + n for n in names]
+
+    def __enter__(self):
+        from artifact_tracker.utils.redis_client import get_redis
+        if not self.settings.get("enabled"):
+            return self
+        max_wait = float(self.settings.get("max_wait") or 30)
+        start = time.perf_counter()
+        delay = 0.01
+        try:
+            client = get_redis()
+            acquire = _script(client, "acquire", _ACQUIRE)
+            lease = str(uuid.uuid4())
+            while True:
+                if acquire(keys=self._keys("leases", "limit"),
+                           args=[time.time(),
+                                 self.settings.get("lease_seconds") or 120,
+                                 lease,
+                                 self.settings.get("initial") or 4]):
+                    self.lease = lease
+                    break
+                if time.perf_counter() - start >= max_wait:
+                    # sent without a slot rather than waiting forever
+                    break
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        except Exception as e:
+            from artifact_tracker import tracker_app
+            tracker_app.log.error(
+                f"Error taking a {self.target} concurrency slot: {e}")
+        metrics.observe("tracker_concurrency_wait_seconds",
+                        time.perf_counter() - start, target=self.target)
+        self._start = time.perf_counter()
+        return self
+
+    def done(self, status_code: int):
+        """
+        Records the status code of the response of the request.
+        """
+        self.status_code = status_code
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.lease:
+            return False
+        from artifact_tracker.utils.redis_client import get_redis
+        latency = time.perf_counter() - self._start
+        healthy = exc_type is None and self.status_code is not None and \
+            not is_overload(self.status_code)
+        settings = self.settings
+        try:
+            client = get_redis()
+            release = _script(client, "release", _RELEASE)
+            limit, cut = release(
+                keys=self._keys("leases", "limit", "latency", "cut"),
+                args=[self.lease, 1 if healthy else 0, latency,
+                      settings.get("initial") or 4,
+                      settings.get("min") or 1,
+                      settings.get("max") or 32,
+                      settings.get("increase") or 1,
+                      settings.get("decrease") or 0.5,
+                      settings.get("latency_factor") or 2.0])
+            if int(cut):
+                metrics.inc("tracker_concurrency_decreases_total",
+                            target=self.target)
+                from artifact_tracker import tracker_app
+                tracker_app.log.debug(
+                    f"{self.target} concurrency limit cut to "
+                    f"{float(limit):.1f}")
+        except Exception as e:
+            from artifact_tracker import tracker_app
+            tracker_app.log.error(
+                f"Error releasing a {self.target} concurrency slot: {e}")
+        return False
@@ -0,0 +1,215 @@
+"""
+Pools of API credentials of the portals, shared by the workers in redis.
+
+When `credentials` are set in the config of a portal, its trackers send
+their requests with the credentials of the pool instead of the `apiKey`
+and `apiSecret` of the users, so that the users do not all exhaust the
+quota of a single application, and the throughput of the portal grows
+with the number of credentials.
+
+Every request takes the credential with the most remaining quota, the
+least used one among equals. The quota the portal reports in its
+responses, e.g. the `X-RateLimit-Remaining` and `X-RateLimit-Reset`
+headers of GitHub, is recorded per credential. A credential that is out
+of quota, or rejected with a `429`, is skipped until its quota resets,
+or for `credentials_reset_seconds` when the portal does not say when it
+resets. When all the credentials of the pool are exhausted, the users'
+own credentials are used, if they have any.
+
+Only a digest of the keys is stored in redis.
+"""
+from artifact_tracker.utils import metrics
+import hashlib
+import random
+import re
+import time
+
+KEY_PREFIX = "credentials:"
+RESET_SECONDS = 3600
+
+_QUOTA_ERROR = re.compile(r"rate ?limit|quota", re.IGNORECASE)
+
+
+def _id(credential: dict) -> str:
+    secret = credential.get("token") or credential.get("apiKey") or ""
+    return hashlib.sha1(secret.encode()).hexdigest()[:12]
+
+
+def pool(portal_name: str) -> list:
+    """
+    :param portal_name: (str) the portal.
+    :return: (list) the credentials of the pool of the portal, with their
+    `id` in redis.
+    """
+    from artifact_tracker import tracker_app
+    portal = tracker_app.app.config.get("PORTALS", {}).get(portal_name, {})
+    return [dict(c, id=_id(c)) for c in portal.get("credentials") or []]
+
+
+def _reset_seconds(portal_name: str) -> float:
+    from artifact_tracker import tracker_app
+    portal = tracker_app.app.config.get("PORTALS", {}).get(portal_name, {})
+    return float(portal.get("credentials_reset_seconds") or RESET_SECONDS)
+
+
+def _own(user: dict) -> dict:
+    if not user or not user.get("apiKey"):
+        return None
+    return {"apiKey": user.get("apiKey"), "apiSecret": user.get("apiSecret")}
+
+
+def _quotas(portal_name: str, credentials: list) -> (list, list):
+    # the available credentials by quota, and the exhausted ones by reset
+    from artifact_tracker.utils.redis_client import get_redis
+    fields = []
+    for credential in credentials:
+        fields += [credential["id"] + ":remaining",
+                   credential["id"] + ":reset",
+                   credential["id"] + ":used"]
+    values = get_redis().hmget(KEY_PREFIX + portal_name, fields)
+    now = time.time()
+    available = []
+    exhausted = []
+    for n, credential in enumerate(credentials):
+        remaining, reset, used = values[3 * n:3 * n + 3]
+        reset = float(reset or 0)
+        if reset <= now or remaining is None:
+            # a credential that was never used, or whose quota was reset
+            remaining = float("inf")
+        else:
+            remaining = float(remaining)
+        if remaining <= 0:
+            exhausted.append((reset, n))
+            continue
+        # the random tie-break spreads the workers that choose at once
+        available.append((remaining, -int(used or 0), random.random(), n))
+    return sorted(available, reverse=True), sorted(exhausted)
+
+
+def acquire(portal_name: str, user: dict=None) -> dict:
+    """
+    Chooses the credential of the next request to the portal.
+
+    :param portal_name: (str) the portal.
+    :param user: (dict) the user the request is sent for, whose `apiKey`
+    and `apiSecret` are used when the portal has no pool, or when all
+    the credentials of the pool are exhausted.
+    :return: (dict) the `apiKey` and `apiSecret`, or `token`, of the
+    credential, and its `id` if it belongs to the pool.
+    """
+    from artifact_tracker import tracker_app
+    credentials = pool(portal_name)
+    if not credentials:
+        return _own(user) or {}
+    try:
+        available, exhausted = _quotas(portal_name, credentials)
+    except Exception as e:
+        # without the quotas, the requests are spread at random
+        tracker_app.log.error(
+            f"Error reading the {portal_name} credentials: {e}")
+        return random.choice(credentials)
+    if available:
+        return credentials[available[0][-1]]
+
+    own = _own(user)
+    if own:
+        tracker_app.log.debug(
+            f"{portal_name} credentials exhausted, using the user's own.")
+        return own
+    tracker_app.log.warning(f"{portal_name} credentials exhausted.")
+    # the credential whose quota resets first
+    return credentials[exhausted[0][1]]
+
+
+def exhausted(portal_name: str) -> bool:
+    """
+    :param portal_name: (str) the portal.
+    :return: (bool) True if the portal has no pool, or if all the
+    credentials of its pool are out of quota.
+    """
+    credentials = pool(portal_name)
+    if not credentials:
+        return True
+    try:
+        available, _ = _quotas(portal_name, credentials)
+    except Exception:
+        return False
+    return not available
+
+
+def _header(resp, *names) -> float:
+    for name in names:
+        try:
+            return float(resp.headers[name])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def record(portal_name: str, credential: dict, resp=None,
+           remaining: int=None):
+    """
+    Records a request sent with a credential of the pool, and the quota
+    the portal reported for the credential.
+
+    :param portal_name: (str) the portal.
+    :param credential: (dict) the credential returned by `acquire`. The
+    credentials of the users are not recorded.
+    :param resp: the response, whose `X-RateLimit-Remaining`,
+    `X-RateLimit-Reset` and `Retry-After` headers are read. A `429`, or a
+    `403` about a rate limit or a quota, exhausts the credential.
+    :param remaining: (int) the remaining quota, when the portal reports
+    it in the body of its responses, e.g. stack exchange.
+    :return: None
+    """
+    from artifact_tracker import tracker_app
+    from artifact_tracker.utils.redis_client import get_redis
+    if not credential or not credential.get("id"):
+        return
+    key_id = credential["id"]
+    metrics.inc("tracker_credential_requests_total",
+                portal=portal_name, credential=key_id)
+
+    reset = None
+    if resp is not None:
+        if remaining is None:
+            remaining = _header(resp, "X-RateLimit-Remaining",
+                                "RateLimit-Remaining")
+        reset = _header(resp, "X-RateLimit-Reset")
+        retry_after = _header(resp, "Retry-After")
+        if retry_after is not None:
+            reset = time.time() + retry_after
+        if resp.status_code == 429 or (
+                resp.status_code == 403 and
+                _QUOTA_ERROR.search(resp.text or "")):
+            remaining = 0
+
+    key = KEY_PREFIX + portal_name
+    now = time.time()
+    try:
+        client = get_redis()
+        stored, stored_reset = client.hmget(
+            key, [key_id + ":remaining", key_id + ":reset"])
+        if stored_reset is not None and float(stored_reset) > now:
+            if remaining is None and stored is not None:
+                # counted down until the portal reports the quota again
+                remaining = float(stored) - 1
+            if reset is None:
+                reset = float(stored_reset)
+        if remaining is not None and reset is None:
+            reset = now + _reset_seconds(portal_name)
+        pipe = client.pipeline()
+        pipe.hincrby(key, key_id + ":used", 1)
+        if remaining is not None:
+            pipe.hset(key, key_id + ":remaining", remaining)
+            pipe.hset(key, key_id + ":reset", reset)
+        pipe.execute()
+    except Exception as e:
+        tracker_app.log.error(
+            f"Error recording the {portal_name} credentials: {e}")
+        return
+    if remaining is not None and remaining <= 0:
+        metrics.inc("tracker_credential_exhausted_total",
+                    portal=portal_name, credential=key_id)
+        tracker_app.log.info(
+            f"{portal_name} credential {key_id} exhausted.")
@@ -0,0 +1,283 @@
+"""
+Fair scheduling of the tracker tasks across the orchestrator messages.
+
+When enabled in the config, `queue_tasks` does not send the tasks of a
+message to the broker at once. They are appended to a sub-queue of the
+message in redis, or of the orchestrator's inbox when `group_by` is
+`inbox`, and a deficit round-robin over the active sub-queues sends them
+to the broker, keeping at most `max_in_flight` tasks queued or running.
+
+Every round, the deficit of a sub-queue grows by `quantum`, and the tasks
+at its head are sent while their cost, the number of their users, fits
+in the deficit. A message describing a whole department then gets the
+same share of the workers as a message describing a single scholar, and
+the tasks of small messages are run while a large one is in progress.
+
+The dispatcher is run when tasks are submitted and when a tracker task
+finishes. While tasks are waiting for slots, it is also run once the
+slot of the oldest task in flight expires, so that the slots of lost
+tasks are freed even if no task finishes.
+"""
+import json
+import time
+import uuid
+
+KEY_PREFIX = "fair:"
+ACTIVE = KEY_PREFIX + "active"
+DEFICITS = KEY_PREFIX + "deficits"
+INFLIGHT = KEY_PREFIX + "inflight"
+LOCK = KEY_PREFIX + "lock"
+PENDING = KEY_PREFIX + "pending"
+WAKEUP = KEY_PREFIX + "wakeup"
+LOCK_TIMEOUT = 30
+
+# deletes the lock if it is held by the token: KEYS = lock. ARGV = token
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# extends the lock if it is held by the token: KEYS = lock.
+# ARGV = token, seconds
+_EXTEND = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def config() -> dict:
+    from artifact_tracker import tracker_app
+    return tracker_app.app.config.get("FAIR") or {}
+
+
+def enabled() -> bool:
+    return bool(config().get("enabled"))
+
+
+def _queue_key(group: str) -> str:
+    return KEY_PREFIX + "queue:" + group
+
+
+def group_of(message: dict) -> str:
+    """
+    Returns the sub-queue of the tasks of an orchestrator message: the
+    message itself, or the inbox of the orchestrator that sent it when
+    `group_by` is `inbox`.
+
+    :param message: (dict) the AS2 message.
+    :return: (str) the id of the sub-queue.
+    """
+    event = message.get("event", {})
+    if config().get("group_by") == "inbox" and event.get("to"):
+        return event.get("to")
+    return event.get("id") or message.get("id") or str(uuid.uuid4())
+
+
+def submit(group: str, tasks: list):
+    """
+    Appends the tasks of a message to its sub-queue and dispatches the
+    tasks the fair share of the sub-queue allows.
+
+    :param group: (str) the id of the sub-queue.
+    :param tasks: (list) the keyword arguments of `registry.dispatch` for
+    every task.
+    :return: None
+    """
+    from artifact_tracker.utils.redis_client import get_redis
+    if not tasks:
+        return
+    queued_at = time.time()
+    client = get_redis()
+    pipe = client.pipeline()
+    pipe.rpush(_queue_key(group),
+               *[json.dumps(dict(task, queued_at=queued_at))
+                 for task in tasks])
+    # the sub-queue joins the end of the round if it was not active
+    pipe.lrem(ACTIVE, 0, group)
+    pipe.rpush(ACTIVE, group)
+    pipe.execute()
+    pump()
+
+
+def task_done(task_id: str):
+    """
+    Frees the slot of a finished task and dispatches the next tasks.
+
+    :param task_id: (str) the id of the finished task.
+    :return: None
+    """
+    from artifact_tracker.utils.redis_client import get_redis
+    if get_redis().zrem(INFLIGHT, task_id):
+        pump()
+
+
+def pump():
+    """
+    Runs the dispatcher, unless another process is running it, in which
+    case that process runs another round once it is done.
+
+    :return: None
+    """
+    from artifact_tracker import tracker_app
+    from artifact_tracker.utils.redis_client import get_redis
+    client = get_redis()
+    client.set(PENDING, 1)
+    token = str(uuid.uuid4())
+    while client.set(LOCK, token, nx=True, ex=LOCK_TIMEOUT):
+        try:
+            client.delete(PENDING)
+            dispatch(client, token)
+            _schedule_wakeup(client)
+        except Exception as e:
+            tracker_app.log.error(f"Error dispatching the fair queues: {e}")
+        finally:
+            # another dispatcher holds the lock if this one expired
+            client.register_script(_RELEASE)(keys=[LOCK], args=[token])
+        if not client.get(PENDING):
+            break
+
+
+def wakeup():
+    """
+    Runs the dispatcher once the slot of the oldest task in flight
+    expired. Run by the task scheduled by `pump`.
+
+    :return: None
+    """
+    from artifact_tracker.utils.redis_client import get_redis
+    get_redis().delete(WAKEUP)
+    pump()
+
+
+def _inflight_timeout() -> float:
+    return float(config().get("inflight_timeout") or 3600)
+
+
+def _in_flight(client) -> int:
+    # the tasks of lost workers free their slots after the timeout
+    client.zremrangebyscore(INFLIGHT, "-inf",
+                            time.time() - _inflight_timeout())
+    return client.zcard(INFLIGHT)
+
+
+def _schedule_wakeup(client):
+    # while tasks are waiting, the dispatcher is run again once the
+    # oldest slot expires, in case its task was lost. the wakeup is sent
+    # to the queue of a waiting task, which has workers
+    from artifact_tracker.tracker import registry
+    oldest = client.zrange(INFLIGHT, 0, 0, withscores=True)
+    if not oldest:
+        return
+    head = None
+    for group in client.lrange(ACTIVE, 0, -1):
+        head = client.lindex(_queue_key(group.decode()), 0)
+        if head is not None:
+            break
+    if head is None:
+        return
+    delay = max(oldest[0][1] + _inflight_timeout() - time.time(), 1)
+    if not client.set(WAKEUP, 1, nx=True, px=int(delay * 1000)):
+        # a wakeup is already scheduled
+        return
+    task = json.loads(head)
+    registry.pump_fair_queues.apply_async(
+        countdown=delay,
+        **registry.route(task.get("portal_name"),
+                         task.get("lane") or
+                         registry.lane_of(task.get("users"))))
+
+
+def _hold_lock(client, token: str) -> bool:
+    # extends the lock of the dispatcher, if it still holds it
+    if token is None:
+        return True
+    return bool(client.register_script(_EXTEND)(
+        keys=[LOCK], args=[token, LOCK_TIMEOUT]))
+
+
+def backlog(client) -> int:
+    """
+    :param client: the redis client.
+    :return: (int) the number of tasks waiting in the fair queues.
+    """
+    groups = [g.decode() for g in client.lrange(ACTIVE, 0, -1)]
+    pipe = client.pipeline(transaction=False)
+    for group in groups:
+        pipe.llen(_queue_key(group))
+    return sum(pipe.execute()) if groups else 0
+
+
+def dispatch(client, token: str=None) -> int:
+    """
+    Runs deficit round-robin rounds over the active sub-queues, sending
+    their tasks to the broker while there are free slots and tasks.
+
+    :param client: the redis client.
+    :param token: (str) the token of the dispatcher's lock, extended
+    after every sub-queue. The rounds stop if the lock was lost.
+    :return: (int) the number of tasks sent.
+    """
+    settings = config()
+    quantum = max(int(settings.get("quantum") or 1), 1)
+    max_in_flight = int(settings.get("max_in_flight") or 0)
+    free = max_in_flight - _in_flight(client) if max_in_flight else None
+
+    sent = 0
+    groups = [g.decode() for g in client.lrange(ACTIVE, 0, -1)]
+    while groups and (free is None or free > 0):
+        for group in groups:
+            if free is not None and free <= 0:
+                break
+            if not _hold_lock(client, token):
+                return sent
+            count = _visit(client, group, quantum, free)
+            sent += count
+            if free is not None:
+                free -= count
+        groups = [g.decode() for g in client.lrange(ACTIVE, 0, -1)]
+    return sent
+
+
+def _visit(client, group: str, quantum: int, free: int=None) -> int:
+    # sends the tasks of a sub-queue that fit in its deficit
+    from artifact_tracker.tracker import registry
+    from artifact_tracker.utils import metrics
+    key = _queue_key(group)
+    deficit = int(client.hget(DEFICITS, group) or 0) + quantum
+    sent = 0
+    while free is None or sent < free:
+        # popped at once, so that a task is never sent twice or lost,
+        # and pushed back if it does not fit in the deficit
+        head = client.lpop(key)
+        if head is None:
+            break
+        task = json.loads(head)
+        cost = max(len(task.get("users") or []), 1)
+        if cost > deficit:
+            client.lpush(key, head)
+            break
+        deficit -= cost
+        queued_at = task.pop("queued_at", None)
+        if queued_at:
+            metrics.observe("fair_queue_wait_seconds",
+                            time.time() - queued_at)
+        # the slot is taken before the task is sent, as an eager task
+        # finishes before `apply_async` returns
+        task_id = str(uuid.uuid4())
+        client.zadd(INFLIGHT, {task_id: time.time()})
+        registry.dispatch(task_id=task_id, **task)
+        sent += 1
+
+    client.lrem(ACTIVE, 0, group)
+    if client.llen(key):
+        # the sub-queue moves to the end of the round
+        client.rpush(ACTIVE, group)
+        client.hset(DEFICITS, group, deficit)
+    else:
+        # an empty sub-queue leaves the round and loses its deficit
+        client.hdel(DEFICITS, group)
+    return sent
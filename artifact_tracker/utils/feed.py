@@ -0,0 +1,83 @@
+from artifact_tracker.utils import tracing
+import feedparser
+import requests
+
+
+def group_by_feed(users, feed_url) -> list:
+    """
+    Orders the users so that the users of a feed are consecutive, in the
+    order of the first user of every feed, so that the feed can be
+    released from the cache once they are processed.
+
+    :param users: the users of the run.
+    :param feed_url: the function returning the feed URL of a user.
+    :return: (list) the users, grouped by feed.
+    """
+    groups = {}
+    for user in users:
+        groups.setdefault(feed_url(user), []).append(user)
+    return [user for group in groups.values() for user in group]
+
+
+class FeedCache(object):
+    """
+    Per run cache of RSS feeds, keyed by the feed URL.
+
+    Several users of a batch can share the same feed (e.g. authors of the
+    same wordpress blog), so every feed is fetched and parsed only once
+    per tracker run and its entries are grouped by author in one pass.
+    The trackers release a feed once all its users are processed, so
+    that a run holds a single feed at a time.
+    """
+
+    def __init__(self, fetch=requests.get):
+        """
+        :param fetch: the function used to GET the feeds, e.g. the
+        tracker's `get` method.
+        """
+        self._fetch = fetch
+        self._feeds = {}
+        self._authors = {}
+
+    def get(self, feed_url: str) -> (int, dict):
+        """
+        Fetches and parses the feed at `feed_url`, unless it is already
+        cached.
+
+        :param feed_url: (str) the URL of the feed.
+        :return: (tuple) the HTTP status code of the feed response and the
+        parsed feed, or None if the status code was not 200.
+        """
+        if feed_url not in self._feeds:
+            resp = self._fetch(feed_url)
+            feed = None
+            if resp.status_code == 200:
+                with tracing.span("parse", url=feed_url):
+                    feed = feedparser.parse(resp.content)
+            self._feeds[feed_url] = (resp.status_code, feed)
+        return self._feeds[feed_url]
+
+    def entries_by_author(self, feed_url: str) -> dict:
+        """
+        Groups the entries of a cached feed by their author.
+
+        :param feed_url: (str) the URL of the feed.
+        :return: (dict) the list of entries of the feed keyed by author.
+        """
+        if feed_url not in self._authors:
+            _, feed = self.get(feed_url)
+            authors = {}
+            for entry in (feed or {}).get("entries", []):
+                authors.setdefault(entry.get("author"), []).append(entry)
+            self._authors[feed_url] = authors
+        return self._authors[feed_url]
+
+    def release(self, feed_url: str):
+        """
+        Drops a feed and its entries from the cache.
+
+        :param feed_url: (str) the URL of the feed.
+        :return: None
+        """
+        self._feeds.pop(feed_url, None)
+        self._authors.pop(feed_url, None)
@@ -0,0 +1,122 @@
+"""
+High-water marks of the actors on every portal.
+
+The trackers depend on the orchestrator to send back the `lastTracked`
+and `lastToken` of every user. So that a run is not a full back-fill
+when the orchestrator lost them, the newest published time of the events
+delivered for an actor, and the token of the portal (the ETag of github,
+the since_id of twitter), are stored with the TrackerTask row of every
+completed run. `queue_tasks` sets them on the users the orchestrator
+sent without a `lastTracked` or a `lastToken`.
+
+The marks are collected while a tracker runs, in the thread of the run,
+as for the traces.
+"""
+from contextlib import contextmanager
+import threading
+
+_local = threading.local()
+
+
+@contextmanager
+def collect():
+    """
+    Collects the marks observed in the block.
+
+    :return: (dict) the marks observed, keyed by actor id, with their
+    `published` time and their `token`.
+    """
+    marks = {}
+    _local.marks = marks
+    try:
+        yield marks
+    finally:
+        _local.marks = None
+
+
+def observe(actor_id: str, published: str=None, token: str=None):
+    """
+    Records the published time of an event delivered for an actor, or
+    the portal's token of the actor's run.
+
+    :param actor_id: (str) the actor.
+    :param published: (str) the published time, as `%Y-%m-%dT%H:%M:%SZ`.
+    :param token: (str) the token of the portal.
+    :return: None
+    """
+    marks = getattr(_local, "marks", None)
+    if marks is None or not actor_id:
+        return
+    mark = marks.setdefault(actor_id, {})
+    # the timestamps of the events compare in the order of the times
+    if published and published > (mark.get("published") or ""):
+        mark["published"] = published
+    if token:
+        mark["token"] = str(token)
+
+
+def store(portal_name: str, marks: dict):
+    """
+    Stores the marks of the actors with their TrackerTask rows. The
+    published time of an actor only moves forward.
+
+    :param portal_name: (str) the portal.
+    :param marks: (dict) the marks, keyed by actor id.
+    :return: None
+    """
+    from artifact_tracker import tracker_app
+    from artifact_tracker.store.tracker_task import TrackerTask
+    if not marks:
+        return
+    with tracker_app.app.app_context():
+        tasks = TrackerTask.query.filter(
+            TrackerTask.portal_name == portal_name,
+            TrackerTask.actor_id.in_(list(marks))).all()
+        for task in tasks:
+            mark = marks[task.actor_id]
+            published = mark.get("published")
+            if published and published > (task.high_water_published or ""):
+                task.high_water_published = published
+            if mark.get("token"):
+                task.high_water_token = mark["token"]
+        tracker_app.db.session.commit()
+
+
+def apply(portal_users: list):
+    """
+    Sets the stored marks of the users the orchestrator sent without a
+    `lastTracked` or a `lastToken`.
+
+    :param portal_users: (list) the portal users, with the `name` of
+    their portal.
+    :return: None
+    """
+    from artifact_tracker import tracker_app
+    from artifact_tracker.store.tracker_task import TrackerTask
+    missing = {}
+    for user in portal_users:
+        if user.get("id") and not (user.get("lastTracked") and
+                                   user.get("lastToken")):
+            missing.setdefault(user.get("name"), []).append(user)
+    if not missing:
+        return
+    try:
+        with tracker_app.app.app_context():
+            for portal_name, users in missing.items():
+                tasks = TrackerTask.query.filter(
+                    TrackerTask.portal_name == portal_name,
+                    TrackerTask.actor_id.in_([u["id"] for u in users])
+                ).all()
+                marks = {t.actor_id: t for t in tasks}
+                for user in users:
+                    task = marks.get(user["id"])
+                    if not task:
+                        continue
+                    if not user.get("lastTracked") and \
+                            task.high_water_published:
+                        user["lastTracked"] = task.high_water_published
+                    if not user.get("lastToken") and task.high_water_token:
+                        user["lastToken"] = task.high_water_token
+    except Exception as e:
+        # the users are tracked with what the orchestrator sent
+        tracker_app.log.error(f"Error reading the high-water marks: {e}")
@@ -0,0 +1,122 @@
+"""
+Memory accounting of the tracker tasks.
+
+The growth of the RSS of the worker during every task is recorded per
+portal in the metrics and, when `tracemalloc` is set in the config, the
+peak of the python allocations of the task and its top allocation sites
+are recorded too.
+
+The growth of a task can be checked against a memory budget, either the
+`memory_budget_mb` of the portal or the `budget_mb` of the config, so
+that the batch trackers can split the rest of their users into a new
+task before the worker gets killed.
+"""
+from contextlib import contextmanager
+import os
+import resource
+import threading
+import tracemalloc
+
+MB = 1024 * 1024
+
+_local = threading.local()
+
+
+def config() -> dict:
+    from artifact_tracker import tracker_app
+    return tracker_app.app.config.get("MEMORY") or {}
+
+
+def rss_bytes() -> int:
+    """
+    :return: (int) the resident set size of the process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # not linux: the peak RSS, in kilobytes
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _usage() -> int:
+    # the python allocations are more precise than the RSS, which does
+    # not shrink when memory is freed
+    if getattr(_local, "traced", False) and tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return rss_bytes()
+
+
+def growth() -> int:
+    """
+    :return: (int) the memory the current task grew by, in bytes, or 0
+    outside of a task.
+    """
+    baseline = getattr(_local, "baseline", None)
+    if baseline is None:
+        return 0
+    return max(_usage() - baseline, 0)
+
+
+def over_budget(budget_mb: float=None) -> bool:
+    """
+    Checks if the current task grew over its memory budget.
+
+    :param budget_mb: (float) the budget in MB, defaults to the
+    `budget_mb` of the config.
+    :return: (bool) True if the task is over budget.
+    """
+    budget_mb = budget_mb or config().get("budget_mb")
+    if not budget_mb:
+        return False
+    return growth() > float(budget_mb) * MB
+
+
+@contextmanager
+def track_task(task_kwargs: dict):
+    """
+    Records the memory used by a task in the metrics, when memory
+    accounting is enabled in the config.
+
+    :param task_kwargs: (dict) the keyword arguments of the tracker task,
+    with the portal name.
+    :return: None
+    """
+    settings = config()
+    if not settings.get("enabled"):
+        yield
+        return
+
+    from artifact_tracker import tracker_app
+    from artifact_tracker.utils import metrics
+    portal_name = task_kwargs.get("portal_name") or "unknown"
+    traced = bool(settings.get("tracemalloc"))
+    started_tracing = traced and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _local.traced = traced
+    rss_start = rss_bytes()
+    _local.baseline = _usage()
+    try:
+        yield
+    finally:
+        rss_delta = rss_bytes() - rss_start
+        metrics.observe("tracker_task_rss_delta_bytes", max(rss_delta, 0),
+                        portal=portal_name)
+        message = "{} task memory: rss delta {:.1f} MB".format(
+            portal_name, rss_delta / MB)
+        if traced and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            metrics.observe("tracker_task_traced_peak_bytes", peak,
+                            portal=portal_name)
+            message += ", traced peak {:.1f} MB".format(peak / MB)
+            top = int(settings.get("snapshot_top") or 0)
+            if top:
+                stats = tracemalloc.take_snapshot().statistics("lineno")
+                for stat in stats[:top]:
+                    message += "\n  {}".format(stat)
+        tracker_app.log.debug(message)
+        _local.baseline = None
+        _local.traced = False
+        if started_tracing:
+            tracemalloc.stop()
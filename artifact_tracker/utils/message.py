@@ -1,6 +1,125 @@
 import uuid
 import requests
-from datetime import datetime
+import time
+from artifact_tracker.utils import concurrency, high_water, metrics, tracing
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import hashlib
+import json
+import threading
+
+# the status codes of an overloaded LDN inbox
+OVERLOADED_STATUS_CODES = (429, 503)
+
+# the keys of an event that are generated anew by every run
+_GENERATED_KEYS = ("@id", "prov:wasGeneratedBy", "prov:generatedAtTime")
+
+_local = threading.local()
+
+
+class InboxOverloadedError(Exception):
+    """
+    Raised when the LDN inbox is still overloaded after the retries of an
+    event, so that the tracker task is retried later instead of piling up
+    the events of the run.
+    """
+
+    def __init__(self, inbox_url: str, retry_after: float):
+        super(InboxOverloadedError, self).__init__(
+            f"LDN inbox overloaded: {inbox_url}, retry after "
+            f"{retry_after:.0f}s")
+        self.inbox_url = inbox_url
+        self.retry_after = retry_after
+
+
+def delivery_key(event: dict) -> str:
+    """
+    :param event: (dict) the AS2 message of an event.
+    :return: (str) a digest of the event, the same for the event in
+    every run of a tracker.
+    """
+    content = {k: v for k, v in event.get("event", {}).items()
+               if k not in _GENERATED_KEYS}
+    return hashlib.sha1(json.dumps(
+        content, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+@contextmanager
+def ledger(delivered: dict=None):
+    """
+    Keeps the ledger of the events delivered in the block, so that the
+    task that resumes the users of an interrupted task does not post
+    the events the inbox already accepted again.
+
+    :param delivered: (dict) the keys of the events delivered by the
+    previous tasks of the users, keyed by actor id. These events are not
+    posted again.
+    :return: (dict) the keys of the events delivered, keyed by actor id,
+    including the ones of `delivered`.
+    """
+    entries = {actor_id: set(keys)
+               for actor_id, keys in (delivered or {}).items()}
+    _local.ledger = entries
+    try:
+        yield entries
+    finally:
+        _local.ledger = None
+
+
+def _retry_after(resp: requests.Response, default: float) -> float:
+    """
+    Parses the Retry-After header of a response, in seconds or as a date.
+
+    :return: (float) the seconds to wait, or `default` if not set.
+    """
+    value = resp.headers.get("Retry-After", "").strip()
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(),
+                   0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def _post_event(event: dict, inbox_url: str) -> requests.Response:
+    """
+    POSTs an event to the LDN inbox, within the adaptive concurrency
+    limit of the deliveries. The event is retried while the inbox
+    answers 429 or 503, waiting as long as its Retry-After header asks,
+    up to the `retries` and `max_retry_after` of the delivery config.
+
+    :return: the response of the inbox.
+    """
+    from artifact_tracker import tracker_app
+    config = tracker_app.app.config.get("DELIVERY") or {}
+    retries = int(config.get("retries") or 0)
+    max_retry_after = float(config.get("max_retry_after") or 60)
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        with concurrency.Slot(concurrency.LDN) as slot:
+            resp = requests.post(
+                inbox_url,
+                json=event,
+                headers={"Content-Type": "application/ld+json"})
+            slot.done(resp.status_code)
+        metrics.observe("ldn_delivery_seconds", time.perf_counter() - start)
+        metrics.inc("ldn_delivery_responses_total", status=resp.status_code)
+        if resp.status_code not in OVERLOADED_STATUS_CODES:
+            return resp
+        attempt += 1
+        wait = _retry_after(resp, default=2.0 ** attempt)
+        if attempt > retries or wait > max_retry_after:
+            raise InboxOverloadedError(inbox_url, wait)
+        tracker_app.log.debug(f"LDN inbox overloaded, retrying in {wait}s")
+        time.sleep(wait)
 
 
 def make_context():
@@ -98,7 +217,9 @@ def template_as2(base_event_url: str,
 
 def post_to_ldn_inbox(events: iter=None,
                       from_datetime=None,
-                      inbox_url=None) -> bool:
+                      inbox_url=None,
+                      portal_name=None,
+                      stats: dict=None) -> bool:
     """
     Posts a list of activities to a ldn inbox.
 
@@ -106,8 +227,14 @@ def post_to_ldn_inbox(events: iter=None,
     to POST activities to an inbox.
 
     :param events: (List(dict)) The list of activities as a dict.
+    :param portal_name: (str) the portal of the events, used as the label
+    of the metrics.
+    :param stats: (dict) if set, the number of events accepted by the
+    inbox is added to its `delivered` key.
     :return: (bool) True if all the events were successfully accepted by
     the inbox. False otherwise.
+    :raises InboxOverloadedError: if the inbox stays overloaded, before
+    the remaining events are generated.
     """
     from artifact_tracker import tracker_app
 
@@ -119,52 +246,89 @@ def post_to_ldn_inbox(events: iter=None,
 
     success = True
     event_count = 0
-    for event in events:
-        if not isinstance(event, dict):
-            tracker_app.log.error("The ActivityStream " +
-                                  "payload is not of type dict.")
-            return False
-        # prevent events being posted to inbox if published is earlier than
-        # specified from datetime
-        start_datetime = tracker_app.app.config.get(
-            "DISALLOW_EVENTS_BEFORE") or from_datetime
-        if start_datetime:
-            start_datetime = datetime.strptime(
-                start_datetime, "%Y-%m-%dT%H:%M:%SZ")
-            published = event.get("event", {}).get("published")
-            published = datetime.strptime(
-                published, "%Y-%m-%dT%H:%M:%SZ")
-            if published < start_datetime:
+    # time spent generating, filtering and delivering the events,
+    # recorded as the spans of the tracker run
+    convert = tracing.Stopwatch()
+    date_filter = tracing.Stopwatch()
+    deliver = tracing.Stopwatch()
+    actor_id = None
+    try:
+        for event in convert.iterate(events):
+            if not isinstance(event, dict):
+                tracker_app.log.error("The ActivityStream " +
+                                      "payload is not of type dict.")
+                return False
+            metrics.inc("tracker_events_generated_total",
+                        portal=portal_name)
+            actor_id = actor_id or \
+                event.get("event", {}).get("actor", {}).get("id")
+            # prevent events being posted to inbox if published is earlier
+            # than specified from datetime
+            with date_filter:
+                start_datetime = tracker_app.app.config.get(
+                    "DISALLOW_EVENTS_BEFORE") or from_datetime
+                allowed = True
+                if start_datetime:
+                    start_datetime = datetime.strptime(
+                        start_datetime, "%Y-%m-%dT%H:%M:%SZ")
+                    published = event.get("event", {}).get("published")
+                    published = datetime.strptime(
+                        published, "%Y-%m-%dT%H:%M:%SZ")
+                    allowed = published >= start_datetime
+            if not allowed:
                 tracker_app.log.debug(
                     "event published datetime earlier allowed datetime.")
                 continue
 
-        tracker_app.log.debug("POSTing data to LDN Inbox at: %s"
-                              % inbox_url)
-
-        try:
-            resp = requests.post(inbox_url,
-                                 json=event,
-                                 headers={"Content-Type":
-                                          "application/ld+json"})
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.ConnectTimeout) as e:
-            success = False
-            tracker_app.log.error(f"Error connecting to LDN inbox: {inbox_url}"
-                                  f"\nError: {e}")
-            continue
-
-        tracker_app.log.debug(resp.status_code)
-        if not resp.status_code >= 200\
-                and resp.status_code < 300:
-            # TODO: handle error
-            tracker_app.log.error("OUTBOX returned non-200 status: %s"
-                                  % resp.status_code)
-            tracker_app.log.debug(resp.headers)
-            tracker_app.log.debug(resp.text)
-            success = False
-        else:
-            event_count += 1
+            entries = getattr(_local, "ledger", None)
+            key = None
+            if entries is not None:
+                key = delivery_key(event)
+                event_actor = \
+                    event.get("event", {}).get("actor", {}).get("id")
+                if key in entries.get(event_actor, ()):
+                    tracker_app.log.debug(
+                        "event already delivered by a previous task.")
+                    event_count += 1
+                    continue
+
+            tracker_app.log.debug("POSTing data to LDN Inbox at: %s"
+                                  % inbox_url)
+
+            try:
+                with deliver:
+                    resp = _post_event(event, inbox_url)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.ConnectTimeout) as e:
+                metrics.inc("ldn_delivery_responses_total", status="error")
+                success = False
+                tracker_app.log.error(f"Error connecting to LDN inbox: "
+                                      f"{inbox_url}\nError: {e}")
+                continue
+
+            tracker_app.log.debug(resp.status_code)
+            if not 200 <= resp.status_code < 300:
+                # TODO: handle error
+                tracker_app.log.error("OUTBOX returned non-200 status: %s"
+                                      % resp.status_code)
+                tracker_app.log.debug(resp.headers)
+                tracker_app.log.debug(resp.text)
+                success = False
+            else:
+                metrics.inc("tracker_events_delivered_total",
+                            portal=portal_name)
+                event_count += 1
+                if key:
+                    entries.setdefault(event_actor, set()).add(key)
+                high_water.observe(
+                    event.get("event", {}).get("actor", {}).get("id"),
+                    published=event.get("event", {}).get("published"))
+    finally:
+        convert.record("convert", actor=actor_id)
+        date_filter.record("filter", actor=actor_id)
+        deliver.record("deliver", actor=actor_id)
+        if stats is not None:
+            stats["delivered"] = stats.get("delivered", 0) + event_count
 
     if event_count > 0:
         return success
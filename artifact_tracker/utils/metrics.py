@@ -0,0 +1,236 @@
+"""
+Prometheus style metrics of the trackers, the LDN inbox and the delivery
+of the events.
+
+The metrics are accumulated in memory by every process (uwsgi and celery
+workers) and periodically flushed to redis in a single pipeline, where
+they are aggregated across processes and read by the `/metrics` endpoint.
+Incrementing a metric is a dict update, so that instrumenting the hot
+paths adds a negligible overhead.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in
+                       (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2000))
+
+# the name, type, description and histogram buckets of the metrics
+METRICS = {
+    "tracker_fetch_seconds": (
+        HISTOGRAM, "Latency of the portal API requests.", LATENCY_BUCKETS),
+    "tracker_http_responses_total": (
+        COUNTER, "Portal API responses by status code.", None),
+    "tracker_events_generated_total": (
+        COUNTER, "AS2 events generated by the trackers.", None),
+    "tracker_events_delivered_total": (
+        COUNTER, "AS2 events accepted by the LDN inbox.", None),
+    "tracker_status_update_seconds": (
+        HISTOGRAM, "Latency of the TrackerTask status updates.",
+        LATENCY_BUCKETS),
+    "ldn_delivery_seconds": (
+        HISTOGRAM, "Latency of the POSTs to the LDN inbox.", LATENCY_BUCKETS),
+    "ldn_delivery_responses_total": (
+        COUNTER, "LDN inbox responses to the POSTed events by status code.",
+        None),
+    "inbox_post_seconds": (
+        HISTOGRAM, "Latency of the POST requests to the tracker inbox.",
+        LATENCY_BUCKETS),
+    "queue_tasks_fanout": (
+        HISTOGRAM, "Tracker tasks queued per inbox message.", SIZE_BUCKETS),
+    "tracker_task_rss_delta_bytes": (
+        HISTOGRAM, "Growth of the worker RSS during the tracker tasks.",
+        MEMORY_BUCKETS),
+    "tracker_task_traced_peak_bytes": (
+        HISTOGRAM, "Peak of the python allocations of the tracker tasks.",
+        MEMORY_BUCKETS),
+    "tracker_memory_budget_exceeded_total": (
+        COUNTER, "Tracker tasks over their memory budget by action taken.",
+        None),
+    "tracker_backfill_continuations_total": (
+        COUNTER, "First-run back-fills continued in a chained task.", None),
+    "tracker_breaker_opened_total": (
+        COUNTER, "Circuit breakers of the portals opened.", None),
+    "tracker_concurrency_wait_seconds": (
+        HISTOGRAM, "Time the requests waited for a concurrency slot.",
+        LATENCY_BUCKETS),
+    "tracker_concurrency_decreases_total": (
+        COUNTER, "Concurrency limits cut on overload or rising latency.",
+        None),
+    "tracker_credential_requests_total": (
+        COUNTER, "Portal API requests per credential of the pools.", None),
+    "tracker_credential_exhausted_total": (
+        COUNTER, "Credentials of the pools found out of quota.", None),
+    "fair_queue_wait_seconds": (
+        HISTOGRAM, "Time the tracker tasks waited in the fair queues.",
+        LATENCY_BUCKETS + (60.0, 300.0, 900.0, 3600.0)),
+}
+
+KEY_PREFIX = "metrics:"
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_last_flush = time.monotonic()
+_settings = None
+
+
+def _config() -> dict:
+    global _settings
+    if _settings is None:
+        from artifact_tracker import tracker_app
+        _settings = tracker_app.app.config.get("METRICS") or {}
+    return _settings
+
+
+def enabled() -> bool:
+    return bool(_config().get("enabled"))
+
+
+def _labels(labels: dict) -> str:
+    return ",".join('{}="{}"'.format(k, labels[k]) for k in sorted(labels))
+
+
+def inc(name: str, value: float=1, **labels):
+    """
+    Increments a counter.
+
+    :param name: (str) the name of the counter in METRICS.
+    :param value: (float) the increment.
+    :param labels: the labels of the counter.
+    :return: None
+    """
+    if not enabled():
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels):
+    """
+    Records an observation of a histogram.
+
+    :param name: (str) the name of the histogram in METRICS.
+    :param value: (float) the observed value.
+    :param labels: the labels of the histogram.
+    :return: None
+    """
+    if not enabled():
+        return
+    buckets = METRICS[name][2]
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(buckets) + 1), 0, 0]
+        histogram[0][bisect_left(buckets, value)] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """
+    Observes the duration of the block in seconds in a histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(name: str, **labels):
+    """
+    Decorator observing the duration of the function in a histogram.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _join(labels: str, extra: str) -> str:
+    return ",".join(filter(None, (labels, extra)))
+
+
+def flush(force: bool=False):
+    """
+    Adds the metrics accumulated by the process to the metrics in redis
+    and resets them. Unless forced, only flushes every `flush_interval`
+    seconds.
+
+    :param force: (bool) flush regardless of the interval.
+    :return: None
+    """
+    global _counters, _histograms, _last_flush
+    if not enabled():
+        return
+    if not force and time.monotonic() - _last_flush < \
+            _config().get("flush_interval", 10):
+        return
+    with _lock:
+        counters, _counters = _counters, {}
+        histograms, _histograms = _histograms, {}
+        _last_flush = time.monotonic()
+    if not counters and not histograms:
+        return
+
+    from artifact_tracker import tracker_app
+    from artifact_tracker.utils.redis_client import get_redis
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for (name, labels), value in counters.items():
+            pipe.hincrbyfloat(KEY_PREFIX + name, labels, value)
+        for (name, labels), (counts, total, count) in histograms.items():
+            cumulative = 0
+            for le, bucket_count in zip(METRICS[name][2] + ("+Inf",),
+                                        counts):
+                cumulative += bucket_count
+                pipe.hincrbyfloat(KEY_PREFIX + name + "_bucket",
+                                  _join(labels, 'le="{}"'.format(le)),
+                                  cumulative)
+            pipe.hincrbyfloat(KEY_PREFIX + name + "_sum", labels, total)
+            pipe.hincrbyfloat(KEY_PREFIX + name + "_count", labels, count)
+        pipe.execute()
+    except Exception as e:
+        tracker_app.log.error(f"Error flushing metrics to redis: {e}")
+
+
+def render() -> str:
+    """
+    Renders the metrics aggregated in redis in the prometheus text
+    exposition format.
+
+    :return: (str) the metrics.
+    """
+    from artifact_tracker.utils.redis_client import get_redis
+    flush(force=True)
+    client = get_redis()
+    lines = []
+    for name, (metric_type, description, _) in sorted(METRICS.items()):
+        lines.append("# HELP {} {}".format(name, description))
+        lines.append("# TYPE {} {}".format(name, metric_type))
+        suffixes = ("",) if metric_type == COUNTER else \
+            ("_bucket", "_sum", "_count")
+        for suffix in suffixes:
+            values = client.hgetall(KEY_PREFIX + name + suffix)
+            for labels, value in sorted(values.items()):
+                labels = labels.decode("utf8")
+                lines.append("{}{}{} {}".format(
+                    name, suffix,
+                    "{%s}" % labels if labels else "",
+                    float(value)))
+    return "\n".join(lines) + "\n"
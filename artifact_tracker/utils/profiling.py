@@ -0,0 +1,146 @@
+"""
+Opt-in CPU profiling of the tracker tasks.
+
+When enabled in the config, the celery tasks of the portals listed in
+`portals`, and a `sample_rate` fraction of the other tasks, are run under
+cProfile. Every profile is written to `path`, in a file named after the
+portal, the actor and the duration of the task:
+
+    <portal>__<actor>__<duration>ms__<timestamp>.prof
+
+The profiles of many tasks can be aggregated into their top functions
+with `flask profile-report`.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import cProfile
+import glob
+import os
+import pstats
+import random
+import re
+import sys
+import time
+
+
+def _config() -> dict:
+    from artifact_tracker import tracker_app
+    return tracker_app.app.config.get("PROFILING") or {}
+
+
+def _path() -> str:
+    return _config().get("path") or "data/profiles"
+
+
+def should_profile(portal_name: str) -> bool:
+    """
+    :param portal_name: (str) the portal of the task.
+    :return: (bool) True if the task must be profiled.
+    """
+    config = _config()
+    if not config.get("enabled"):
+        return False
+    if portal_name in (config.get("portals") or []):
+        return True
+    return random.random() < float(config.get("sample_rate") or 0)
+
+
+def _actor_name(users: list) -> str:
+    users = users or []
+    if len(users) != 1:
+        return "batch-{}".format(len(users))
+    actor_id = str(users[0].get("id") or "unknown")
+    # the last segment of the actor's url, e.g. the orcid
+    actor_id = actor_id.rstrip("/").rsplit("/", 1)[-1]
+    return re.sub(r"[^A-Za-z0-9.-]+", "_", actor_id)[:64]
+
+
+@contextmanager
+def profile_task(task_kwargs: dict):
+    """
+    Profiles the block if the task must be profiled, and writes the
+    profile when the block exits.
+
+    :param task_kwargs: (dict) the keyword arguments of the tracker task,
+    with the portal name and the users.
+    :return: None
+    """
+    portal_name = task_kwargs.get("portal_name") or "unknown"
+    if not should_profile(portal_name):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - start
+        if task_kwargs.get("users_ref"):
+            # the users of a claim check are not in the task's arguments
+            actor = "claim-" + task_kwargs["users_ref"][:8]
+        else:
+            actor = _actor_name(task_kwargs.get("users"))
+        write_profile(profiler, portal_name, actor, duration)
+
+
+def write_profile(profiler: cProfile.Profile, portal_name: str,
+                  actor: str, duration: float) -> str:
+    """
+    Writes a profile to the profiles directory.
+
+    :return: (str) the path of the profile, or None if it could not be
+    written.
+    """
+    from artifact_tracker import tracker_app
+    filename = "{}__{}__{}ms__{}.prof".format(
+        portal_name, actor, int(duration * 1000),
+        datetime.utcnow().strftime("%Y%m%dT%H%M%S%f"))
+    path = os.path.join(_path(), filename)
+    try:
+        os.makedirs(_path(), exist_ok=True)
+        profiler.dump_stats(path)
+    except Exception as e:
+        tracker_app.log.error(f"Error writing profile {path}: {e}")
+        return None
+    return path
+
+
+def report(portal_name: str=None, sort: str="cumulative", limit: int=30,
+           path: str=None, stream=None) -> pstats.Stats:
+    """
+    Aggregates the profiles of many tasks and prints their top functions.
+
+    :param portal_name: (str) only aggregate the profiles of this portal.
+    :param sort: (str) the pstats sort key, e.g. cumulative or tottime.
+    :param limit: (int) the number of functions printed.
+    :param path: (str) the profiles directory, defaults to the config.
+    :param stream: the stream to print to, defaults to stdout.
+    :return: (pstats.Stats) the aggregated stats, or None if there are no
+    profiles.
+    """
+    stream = stream or sys.stdout
+    pattern = "{}__*.prof".format(portal_name) if portal_name else "*.prof"
+    files = sorted(glob.glob(os.path.join(path or _path(), pattern)))
+    if not files:
+        print("No profiles found.", file=stream)
+        return None
+
+    durations = []
+    for f in files:
+        match = re.search(r"__(\d+)ms__", os.path.basename(f))
+        if match:
+            durations.append(int(match.group(1)))
+    print("{} profiles, {:.1f}s total, {:.0f}ms max".format(
+        len(files), sum(durations) / 1000.0, max(durations or [0])),
+        file=stream)
+
+    stats = pstats.Stats(files[0], stream=stream)
+    for f in files[1:]:
+        stats.add(f)
+    # the profiles were summarized above, instead of listing every file
+    stats.files = []
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stats
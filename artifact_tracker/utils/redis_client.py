@@ -0,0 +1,22 @@
+import redis
+
+_clients = {}
+
+
+def get_redis(url: str=None) -> redis.StrictRedis:
+    """
+    Returns a redis client for the url, shared by the process. The url
+    defaults to the `redis_url` of the tracker's configuration, which
+    itself defaults to the celery broker url.
+
+    :param url: (str) the redis url.
+    :return: the redis client.
+    """
+    if not url:
+        from artifact_tracker import tracker_app
+        url = tracker_app.app.config.get("REDIS_URL")
+    client = _clients.get(url)
+    if client is None:
+        client = redis.StrictRedis.from_url(url)
+        _clients[url] = client
+    return client
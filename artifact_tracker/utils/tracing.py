@@ -0,0 +1,254 @@
+"""
+Lightweight tracing of the tracker runs.
+
+Every run of a tracker is a trace made of spans for its stages: fetch,
+parse, convert, filter, deliver and status-write. The spans carry the
+portal, the actor and the byte counts, and are exported as JSON lines or
+to a local OTLP/HTTP collector when the run ends. A summary of the
+stages of a run is stored with the TrackerTask rows of the run.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import threading
+import time
+import uuid
+
+STAGES = ("fetch", "parse", "convert", "filter", "deliver", "status-write")
+
+_local = threading.local()
+
+
+class Trace(object):
+    """
+    The spans recorded during one tracker run.
+    """
+
+    def __init__(self, portal_name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.portal_name = portal_name
+        self.start = time.time()
+        self.end = None
+        self.spans = []
+
+    def add(self, name: str, start: float, duration: float, **attrs):
+        attrs["portal"] = self.portal_name
+        self.spans.append({
+            "trace_id": self.trace_id,
+            "span_id": uuid.uuid4().hex[:16],
+            "name": name,
+            "start": start,
+            "duration": duration,
+            "attributes": {k: v for k, v in attrs.items() if v is not None}
+        })
+
+    def summary(self) -> dict:
+        """
+        Summarizes the spans of the run per stage.
+
+        :return: (dict) the run id, start, duration and the count, total
+        seconds and bytes of each stage.
+        """
+        stages = {}
+        for span in self.spans:
+            stage = stages.setdefault(span["name"], {"count": 0,
+                                                     "seconds": 0.0,
+                                                     "bytes": 0})
+            stage["count"] += span["attributes"].get("count", 1)
+            stage["seconds"] += span["duration"]
+            stage["bytes"] += span["attributes"].get("bytes", 0)
+        for stage in stages.values():
+            stage["seconds"] = round(stage["seconds"], 6)
+        return {
+            "run_id": self.trace_id,
+            "started": datetime.utcfromtimestamp(self.start).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"),
+            "duration": round((self.end or time.time()) - self.start, 6),
+            "stages": stages
+        }
+
+
+def _config() -> dict:
+    from artifact_tracker import tracker_app
+    return tracker_app.app.config.get("TRACING") or {}
+
+
+def current() -> Trace:
+    """
+    :return: (Trace) the trace of the run in progress in this thread,
+    or None.
+    """
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def trace(portal_name: str):
+    """
+    Traces a tracker run. The trace is exported when the block exits.
+    Does nothing when tracing is not enabled in the config.
+
+    :param portal_name: (str) the portal of the run.
+    :yield: (Trace) the trace, or None if tracing is disabled.
+    """
+    if not _config().get("enabled"):
+        yield None
+        return
+    run_trace = Trace(portal_name)
+    _local.trace = run_trace
+    try:
+        yield run_trace
+    finally:
+        _local.trace = None
+        run_trace.end = time.time()
+        export(run_trace)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Records a span for the block in the current trace, if any. The
+    attributes can be updated in the block through the yielded dict,
+    e.g. to add the byte count of a response.
+
+    :param name: (str) the stage of the span.
+    :yield: (dict) the attributes of the span.
+    """
+    run_trace = current()
+    if run_trace is None:
+        yield attrs
+        return
+    start = time.time()
+    begin = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        run_trace.add(name, start, time.perf_counter() - begin, **attrs)
+
+
+class Stopwatch(object):
+    """
+    Accumulates the time spent in a stage that is entered many times,
+    e.g. once per event, to record it as a single span.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.seconds = 0.0
+        self.count = 0
+        self._begin = None
+
+    def __enter__(self):
+        self._begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds += time.perf_counter() - self._begin
+        self.count += 1
+
+    def iterate(self, iterable):
+        """
+        Yields the items of `iterable`, accumulating the time spent
+        producing them, e.g. by a generator converting events.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self.count -= 1
+                    item = self
+            if item is self:
+                return
+            yield item
+
+    def record(self, name: str, **attrs):
+        """
+        Records the accumulated time as a span of the current trace.
+        """
+        if self.count:
+            record(name, self.start, self.seconds, count=self.count,
+                   **attrs)
+
+
+def record(name: str, start: float, duration: float, **attrs):
+    """
+    Records an already measured span in the current trace, if any. Used
+    for stages interleaved with others, like the conversion of lazily
+    generated events during their delivery.
+
+    :param name: (str) the stage of the span.
+    :param start: (float) the start of the span as a unix timestamp.
+    :param duration: (float) the total duration of the stage in seconds.
+    :return: None
+    """
+    run_trace = current()
+    if run_trace is not None:
+        run_trace.add(name, start, duration, **attrs)
+
+
+def export(run_trace: Trace):
+    """
+    Exports the spans of a trace with the exporter set in the config:
+    `jsonl` appends them to the `path` file and `otlp` POSTs them to the
+    OTLP/HTTP collector at `otlp_url`.
+
+    :param run_trace: (Trace) the trace to export.
+    :return: None
+    """
+    from artifact_tracker import tracker_app
+    config = _config()
+    exporter = config.get("exporter")
+    try:
+        if exporter == "jsonl":
+            path = config.get("path") or "data/traces.jsonl"
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf8") as f:
+                for s in run_trace.spans:
+                    f.write(json.dumps(s) + "\n")
+        elif exporter == "otlp":
+            import requests
+            requests.post(config.get("otlp_url") or
+                          "http://localhost:4318/v1/traces",
+                          json=to_otlp(run_trace),
+                          timeout=5)
+    except Exception as e:
+        tracker_app.log.error(f"Error exporting trace: {e}")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(run_trace: Trace) -> dict:
+    """
+    Converts a trace into an OTLP/HTTP JSON export request.
+
+    :param run_trace: (Trace) the trace.
+    :return: (dict) the export request.
+    """
+    spans = [{
+        "traceId": s["trace_id"],
+        "spanId": s["span_id"],
+        "name": s["name"],
+        "kind": 1,
+        "startTimeUnixNano": str(int(s["start"] * 1e9)),
+        "endTimeUnixNano": str(int((s["start"] + s["duration"]) * 1e9)),
+        "attributes": [{"key": k, "value": _otlp_value(v)}
+                       for k, v in s["attributes"].items()]
+    } for s in run_trace.spans]
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{
+            "key": "service.name",
+            "value": {"stringValue": "artifact_tracker"}}]},
+        "scopeSpans": [{
+            "scope": {"name": "artifact_tracker.tracker"},
+            "spans": spans}]
+    }]}
@@ -0,0 +1,233 @@
+"""
+Pluggable HTTP transport of the trackers.
+
+All the requests of the trackers go through `Tracker.get`, which sends
+them with the transport set in the config:
+
+- `live` sends the requests to the portals.
+- `record` sends the requests to the portals and appends every
+  interaction to the cassette of the portal, a JSON lines file in
+  `cassette_dir`.
+- `replay` answers the requests from the cassettes without any network
+  access. The responses recorded for a request are replayed in order,
+  which allows paginated runs (Link headers, page tokens, `max_id`,
+  resumption tokens) to be replayed deterministically. A delay can be
+  injected before every response with `replay_latency`: a number of
+  seconds, or `recorded` to wait as long as the recorded request took.
+
+The credentials in the query strings are redacted from the cassettes and
+from the urls the requests are matched on.
+"""
+from base64 import b64decode, b64encode
+from datetime import timedelta
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import io
+import json
+import os
+import requests
+import threading
+import time
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+# query parameters carrying credentials or changing on every request
+REDACTED_PARAMS = {"key", "api_key", "client_id", "client_secret", "hash",
+                   "ts", "access_token", "oauth_token"}
+# headers that no longer apply to the decoded body stored in a cassette
+DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+
+class CassetteError(requests.exceptions.ConnectionError):
+    """
+    Raised when a replayed request was not recorded.
+    """
+
+
+def _config() -> dict:
+    from artifact_tracker import tracker_app
+    return tracker_app.app.config.get("HTTP") or {}
+
+
+def request_key(method: str, url: str) -> str:
+    """
+    The key a request is recorded and matched on: the method and the url
+    with its credentials redacted and its query parameters sorted.
+
+    :param method: (str) the HTTP method.
+    :param url: (str) the full url, including the query string.
+    :return: (str) the key.
+    """
+    parts = urlsplit(url)
+    query = sorted(
+        (k, "REDACTED" if k in REDACTED_PARAMS else v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True))
+    return "{} {}".format(method.upper(), urlunsplit(
+        (parts.scheme, parts.netloc, parts.path, urlencode(query), "")))
+
+
+class Cassette(object):
+    """
+    The recorded interactions with a portal.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._interactions = None
+        self._played = {}
+
+    def _load(self) -> dict:
+        if self._interactions is None:
+            interactions = {}
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        interaction = json.loads(line)
+                        interactions.setdefault(
+                            interaction["request"]["key"], []
+                        ).append(interaction)
+            self._interactions = interactions
+        return self._interactions
+
+    def play(self, method: str, url: str) -> dict:
+        """
+        Returns the next recorded interaction for a request. Once all the
+        interactions of a request were played, they are played again from
+        the first one.
+
+        :param method: (str) the HTTP method.
+        :param url: (str) the full url of the request.
+        :return: (dict) the interaction.
+        """
+        key = request_key(method, url)
+        with self._lock:
+            interactions = self._load().get(key)
+            if not interactions:
+                raise CassetteError(
+                    "No recorded response for {} in {}".format(key,
+                                                               self.path))
+            played = self._played.get(key, 0)
+            self._played[key] = played + 1
+            return interactions[played % len(interactions)]
+
+    def record(self, method: str, url: str, resp: requests.Response,
+               elapsed: float) -> dict:
+        """
+        Appends an interaction to the cassette.
+
+        :param method: (str) the HTTP method.
+        :param url: (str) the full url of the request.
+        :param resp: (requests.Response) the response received.
+        :param elapsed: (float) the duration of the request in seconds.
+        :return: (dict) the interaction.
+        """
+        key = request_key(method, url)
+        interaction = {
+            "request": {"key": key, "method": method.upper(),
+                        "url": key.split(" ", 1)[1]},
+            "response": {
+                "status": resp.status_code,
+                "reason": resp.reason,
+                "headers": {k: v for k, v in resp.headers.items()
+                            if k.lower() not in DROPPED_HEADERS},
+                "body": b64encode(resp.content).decode("ascii"),
+                "elapsed": round(elapsed, 6)
+            }
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf8") as f:
+                f.write(json.dumps(interaction) + "\n")
+            if self._interactions is not None:
+                self._interactions.setdefault(key, []).append(interaction)
+        return interaction
+
+
+def to_response(interaction: dict, url: str) -> requests.Response:
+    """
+    Builds the response of a recorded interaction. The body is available
+    both as the content and as the raw stream of the response.
+
+    :param interaction: (dict) the interaction.
+    :param url: (str) the url of the request.
+    :return: (requests.Response) the response.
+    """
+    recorded = interaction["response"]
+    body = b64decode(recorded["body"])
+    resp = requests.Response()
+    resp.status_code = recorded["status"]
+    resp.reason = recorded.get("reason")
+    resp.headers = CaseInsensitiveDict(recorded["headers"])
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    resp.url = url
+    resp.raw = io.BytesIO(body)
+    resp._content = body
+    resp._content_consumed = True
+    resp.elapsed = timedelta(seconds=recorded.get("elapsed", 0))
+    resp.request = requests.Request(interaction["request"]["method"],
+                                    url).prepare()
+    return resp
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(portal_name: str) -> Cassette:
+    """
+    :param portal_name: (str) the portal.
+    :return: (Cassette) the cassette of the portal, shared by the process.
+    """
+    path = os.path.join(_config().get("cassette_dir") or "data/cassettes",
+                        "{}.jsonl".format(portal_name or "default"))
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = _cassettes[path] = Cassette(path)
+    return cassette
+
+
+def get(url: str, session=None, portal_name: str=None,
+        **kwargs) -> requests.Response:
+    """
+    Performs a GET request with the configured transport.
+
+    :param url: (str) the url to request.
+    :param session: an optional requests session used for the live
+    requests, e.g. an OAuth session.
+    :param portal_name: (str) the portal of the request, which selects the
+    cassette.
+    :param kwargs: the keyword arguments of `requests.get`.
+    :return: the response.
+    """
+    config = _config()
+    transport = config.get("transport") or LIVE
+    if transport == LIVE:
+        return (session or requests).get(url, **kwargs)
+
+    full_url = requests.Request("GET", url,
+                                params=kwargs.get("params")).prepare().url
+    cassette = get_cassette(portal_name)
+    if transport == REPLAY:
+        interaction = cassette.play("GET", full_url)
+        latency = config.get("replay_latency") or 0
+        if latency == "recorded":
+            latency = interaction["response"].get("elapsed", 0)
+        if float(latency) > 0:
+            time.sleep(float(latency))
+        return to_response(interaction, full_url)
+    if transport == RECORD:
+        # the body is read to be recorded, the response is then replayed
+        # from the recording, streamed or not
+        kwargs.pop("stream", None)
+        start = time.perf_counter()
+        resp = (session or requests).get(url, **kwargs)
+        interaction = cassette.record("GET", full_url, resp,
+                                      time.perf_counter() - start)
+        return to_response(interaction, full_url)
+    raise ValueError('Unknown HTTP transport "{}".'.format(transport))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmarks for the artifact trackers.
+
+Importing this package configures the artifact_tracker app the same way
+the unit tests do, but against a throw-away config and sqlite database,
+so that the benchmarks never touch the deployed database. Each benchmark
+is a module that can be run with `python -m benchmarks.<name>`.
+"""
+import base64
+import os
+import tempfile
+import yaml
+
+
+BENCH_DIR = tempfile.mkdtemp(prefix="artifact_tracker_bench_")
+config_filename = os.path.join(os.path.dirname(__file__), "../config.yaml")
+bench_config_filename = os.path.join(BENCH_DIR, "config.yaml")
+bench_secrets_filename = os.path.join(BENCH_DIR, "secrets")
+
+with open(config_filename, "rb") as f:
+    _config = yaml.safe_load(f)
+_config.setdefault("artifact_tracker", {})["log_level"] = "error"
+_config.setdefault("db", {})["sqlalchemy_database_uri"] = \
+    "sqlite+pysqlite:///{}".format(os.path.join(BENCH_DIR, "bench.db"))
+# the breakers would read redis on every request to the stub server
+_config.setdefault("tracker", {}).setdefault("breaker", {})["enabled"] = \
+    False
+with open(bench_config_filename, "w") as f:
+    yaml.safe_dump(_config, f)
+
+with open(bench_secrets_filename, "w", encoding="utf8") as sf:
+    sf.write("%s\n%s" % (
+        base64.urlsafe_b64encode(os.urandom(32)).decode("utf8"),
+        base64.urlsafe_b64encode(os.urandom(16)).decode("utf8")))
+
+os.environ.setdefault("ARTIFACT_TRACKER_CONFIG", bench_config_filename)
+os.environ.setdefault("ARTIFACT_TRACKER_SECRETS", bench_secrets_filename)
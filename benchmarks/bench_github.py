@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the per-event throughput of converting GitHub API events into
+AS2 messages for every event type supported by the github tracker.
+
+Usage: python -m benchmarks.bench_github [--events 20000]
+"""
+import benchmarks  # noqa: F401
+import argparse
+import time
+from artifact_tracker.tracker.github import GithubTracker, EVENT_MAP
+from benchmarks.fixtures import ACTOR, REPO, PAYLOADS
+
+
+def make_events(event_type: str, count: int) -> list:
+    return [{
+        "id": str(i),
+        "type": event_type,
+        "actor": ACTOR,
+        "repo": REPO,
+        "payload": PAYLOADS.get(event_type, {}),
+        "created_at": "2018-01-01T00:00:00Z"
+    } for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    tracker = GithubTracker(portal_name="github",
+                            users=[],
+                            ldn_inbox_url="http://localhost/inbox/",
+                            event_base_url="http://localhost/event/")
+    for event_type in EVENT_MAP:
+        events = make_events(event_type, args.events)
+        start = time.perf_counter()
+        count = sum(1 for _ in tracker.make_as2_payload(
+            events=events,
+            actor_id="https://orcid.org/alice",
+            portal_username="alice",
+            etag="etag"))
+        duration = time.perf_counter() - start
+        print("{:<20} events: {:>7}  events/s: {:>9.0f}  "
+              "us/event: {:>6.1f}".format(
+                  event_type, count, count / duration,
+                  duration / count * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the startup import cost of the app, the celery worker and the
+lazily loaded tracker modules with `python -X importtime`.
+
+Every measurement runs in a fresh interpreter. With `--max-ms` the
+benchmark exits with an error when the import of the worker (the app and
+the tracker registry) takes longer, so that it can be tracked by the
+benchmark suite.
+
+Usage: python -m benchmarks.bench_import_time [--top 10] [--max-ms 0]
+"""
+import benchmarks  # noqa: F401
+import argparse
+import subprocess
+import sys
+
+WORKER_IMPORT = "import artifact_tracker.tracker.registry"
+PORTAL_IMPORT = WORKER_IMPORT + \
+    "; artifact_tracker.tracker.registry.get_tracker_class('{}')"
+
+
+def import_times(code: str) -> list:
+    """
+    Runs `code` in a new interpreter with -X importtime.
+
+    :return: (list) tuples of the cumulative import time in microseconds
+    and the module name, in import order.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          stderr=subprocess.PIPE,
+                          stdout=subprocess.DEVNULL,
+                          universal_newlines=True,
+                          check=True)
+    times = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times.append((int(cumulative), name.rstrip()))
+    return times
+
+
+def total_ms(times: list) -> float:
+    # top level imports are not indented in the module name column
+    return sum(t for t, name in times
+               if not name.startswith("  ")) / 1000
+
+
+def main():
+    from artifact_tracker.tracker.registry import TRACKERS
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    worker_times = import_times(WORKER_IMPORT)
+    worker_ms = total_ms(worker_times)
+    print("worker startup: {:.1f} ms".format(worker_ms))
+    for cumulative, name in sorted(worker_times, reverse=True)[:args.top]:
+        print("  {:>8.1f} ms {}".format(cumulative / 1000, name.strip()))
+
+    for portal_name in sorted(TRACKERS):
+        portal_ms = total_ms(import_times(PORTAL_IMPORT.format(portal_name)))
+        print("{:<17} first use: +{:.1f} ms".format(
+            portal_name, portal_ms - worker_ms))
+
+    if args.max_ms and worker_ms > args.max_ms:
+        print("worker startup exceeds {} ms".format(args.max_ms))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
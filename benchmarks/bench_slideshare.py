@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the peak memory and run time of converting a large, synthetic
+Slideshare `get_slideshows_by_user` response (`detailed=1`) into AS2
+messages by building the full DOM and by streaming it with iterparse.
+
+Usage: python -m benchmarks.bench_slideshare [--slides 20000]
+"""
+import benchmarks  # noqa: F401
+import argparse
+import os
+import time
+import tracemalloc
+from lxml import etree
+from artifact_tracker.tracker.slideshare import SlideshareTracker
+
+SLIDESHOW_TMPL = """
+  <Slideshow>
+    <ID>{i}</ID>
+    <Title>Synthetic slideshow {i}</Title>
+    <Description>{description}</Description>
+    <Status>2</Status>
+    <Username>alice</Username>
+    <URL>https://www.slideshare.net/alice/synthetic-{i}</URL>
+    <ThumbnailURL>https://cdn.slidesharecdn.com/{i}-thumbnail.jpg</ThumbnailURL>
+    <ThumbnailSmallURL>https://cdn.slidesharecdn.com/{i}-small.jpg</ThumbnailSmallURL>
+    <Embed>{embed}</Embed>
+    <Created>2018-01-01 10:00:00 UTC</Created>
+    <Updated>2018-01-02 10:00:00 UTC</Updated>
+    <Language>en</Language>
+    <Format>pdf</Format>
+    <Download>1</Download>
+    <Tags>{tags}</Tags>
+  </Slideshow>"""
+
+
+def make_response_file(path: str, slides: int):
+    """
+    Writes a synthetic detailed response with `slides` slideshows.
+    """
+    description = "Lorem ipsum dolor sit amet. " * 40
+    embed = "&lt;iframe src=&quot;https://www.slideshare.net/slideshow/" \
+            "embed_code/key/abc&quot;&gt;&lt;/iframe&gt;" * 4
+    tags = "".join('<Tag Count="1" Owner="1">tag{}</Tag>'.format(t)
+                   for t in range(20))
+    with open(path, "w", encoding="utf8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write("<User><Name>alice</Name><Count>{}</Count>".format(slides))
+        for i in range(slides):
+            f.write(SLIDESHOW_TMPL.format(i=i,
+                                          description=description,
+                                          embed=embed,
+                                          tags=tags))
+        f.write("</User>")
+
+
+def convert(tracker: SlideshareTracker, events) -> int:
+    count = 0
+    for _ in tracker.make_as2_payload(events=events,
+                                      actor_id="https://orcid.org/alice",
+                                      portal_username="alice",
+                                      prov_api_url="http://localhost/",
+                                      last_token=None):
+        count += 1
+    return count
+
+
+def dom(tracker, path):
+    with open(path, "rb") as f:
+        xml_data = etree.parse(f)
+        return convert(tracker, [tracker.slideshow_fields(slide) for slide
+                                 in xml_data.xpath("//User/Slideshow")])
+
+
+def streaming(tracker, path):
+    with open(path, "rb") as f:
+        return convert(tracker, tracker.parse_slideshows(f))
+
+
+def measure(name, func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = func(*args)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{:<10} events: {:>7}  time: {:>7.2f}s  "
+          "events/s: {:>9.0f}  peak memory: {:>8.1f} MiB".format(
+              name, count, duration, count / duration, peak / 2 ** 20))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--slides", type=int, default=20000)
+    args = parser.parse_args()
+
+    path = os.path.join(benchmarks.BENCH_DIR, "slideshows.xml")
+    make_response_file(path, args.slides)
+    print("response size: {:.1f} MiB".format(
+        os.path.getsize(path) / 2 ** 20))
+
+    tracker = SlideshareTracker(portal_name="slideshare",
+                                users=[],
+                                ldn_inbox_url="http://localhost/inbox/",
+                                event_base_url="http://localhost/event/")
+    measure("dom", dom, tracker, path)
+    measure("iterparse", streaming, tracker, path)
+
+
+if __name__ == "__main__":
+    main()
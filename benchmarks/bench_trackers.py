@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Offline end-to-end benchmark of the trackers.
+
+Every tracker is run through its real `get_events` code path, including
+the status updates in the database and the delivery of the events,
+against a local stub server serving synthetic portal API responses
+(`benchmarks.fixtures`) and standing in for the LDN inbox. No request
+leaves the machine.
+
+The users are split into tasks the way `queue_tasks` does: a single task
+for the portals tracking users in batches, one task per user otherwise.
+For each portal and number of users, the events delivered per second,
+the p50 and p99 latency of the tasks and the peak RSS are reported. Each
+run is done in a fresh process, so that the peak RSS is the one of the
+run.
+
+The portal responses can also be recorded to cassettes and replayed by
+the record/replay HTTP transport, with an injected latency, e.g. to
+benchmark the trackers at the speed of the real APIs. The stub server
+has to listen on the same `--port` when recording and replaying.
+
+Usage: python -m benchmarks.bench_trackers [--portals github twitter]
+    [--users 1 100 10000] [--events 2] [--json results.json]
+    [--transport replay --cassette-dir DIR --latency recorded --port 8765]
+"""
+import benchmarks  # noqa: F401
+import argparse
+import json
+import requests
+import resource
+import subprocess
+import sys
+import time
+from benchmarks import fixtures
+from benchmarks.stub_server import StubServer
+
+
+def percentile(values: list, pct: float) -> float:
+    """
+    :return: (float) the nearest-rank percentile of the values.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def inbox_count(base_url: str) -> int:
+    return requests.get(base_url + "/stats").json()["inbox"]
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    if sys.platform == "darwin":
+        rss /= 1024
+    return rss / 1024
+
+
+def run_portal(portal_name: str, users: int, base_url: str,
+               http: dict=None) -> dict:
+    """
+    Runs the tracker of a portal for `users` users against the stub
+    server.
+
+    :param portal_name: (str) the portal.
+    :param users: (int) the number of users.
+    :param base_url: (str) the base url of the stub server.
+    :param http: (dict) the HTTP transport config of the trackers.
+    :return: (dict) the results of the run.
+    """
+    from artifact_tracker import tracker_app, create_db
+    from artifact_tracker.tracker import registry
+    from artifact_tracker.utils.as2_to_user import BATCH_PORTALS
+
+    with tracker_app.app.app_context():
+        create_db()
+    if http:
+        tracker_app.app.config["HTTP"] = http
+    portal = tracker_app.app.config["PORTALS"][portal_name]
+    portal.setdefault("event_urls", {}).update(
+        fixtures.event_urls(base_url, users)[portal_name])
+
+    tracker_class = registry.get_tracker_class(portal_name)
+    all_users = fixtures.make_users(portal_name, users, base_url)
+    if portal_name in BATCH_PORTALS:
+        tasks = [all_users]
+    else:
+        tasks = [[user] for user in all_users]
+
+    delivered = inbox_count(base_url)
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for task_users in tasks:
+        task_start = time.perf_counter()
+        try:
+            tracker_class(portal_name=portal_name,
+                          users=task_users,
+                          ldn_inbox_url=base_url + "/inbox/",
+                          event_base_url=base_url + "/event/").track()
+        except Exception as e:
+            errors += 1
+            print(f"{portal_name}: {e!r}", file=sys.stderr)
+        latencies.append(time.perf_counter() - task_start)
+    duration = time.perf_counter() - start
+    events = inbox_count(base_url) - delivered
+
+    return {
+        "portal": portal_name,
+        "users": users,
+        "tasks": len(tasks),
+        "errors": errors,
+        "events": events,
+        "seconds": round(duration, 4),
+        "events_per_second": round(events / duration, 1) if duration else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    from artifact_tracker.tracker.registry import TRACKERS
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--portals", nargs="+", default=sorted(TRACKERS),
+                        choices=sorted(TRACKERS))
+    parser.add_argument("--users", nargs="+", type=int,
+                        default=[1, 100, 10000])
+    parser.add_argument("--events", type=int, default=2,
+                        help="events per user and page of the responses")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--transport", default="live",
+                        choices=["live", "record", "replay"],
+                        help="the HTTP transport of the trackers")
+    parser.add_argument("--cassette-dir",
+                        help="the cassettes to record or replay")
+    parser.add_argument("--latency", default="0",
+                        help="seconds added to the replayed responses, "
+                        "or 'recorded'")
+    parser.add_argument("--port", type=int, default=0,
+                        help="the port of the stub server")
+    parser.add_argument("--child", nargs=3,
+                        metavar=("PORTAL", "USERS", "BASE_URL"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        portal_name, users, base_url = args.child
+        http = {"transport": args.transport,
+                "cassette_dir": args.cassette_dir,
+                "replay_latency": args.latency}
+        print(json.dumps(run_portal(portal_name, int(users), base_url,
+                                    http)))
+        return
+
+    server = StubServer(events=args.events, port=args.port).start()
+    results = []
+    print("{:<17} {:>6} {:>6} {:>8} {:>10} {:>10} {:>10} {:>8}".format(
+        "portal", "users", "errors", "events", "events/s", "p50 ms",
+        "p99 ms", "rss MB"))
+    try:
+        for portal_name in args.portals:
+            for users in args.users:
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_trackers",
+                     "--child", portal_name, str(users), server.base_url,
+                     "--transport", args.transport,
+                     "--cassette-dir", args.cassette_dir or "",
+                     "--latency", args.latency],
+                    stdout=subprocess.PIPE, check=True)
+                result = json.loads(out.stdout.decode("utf8").splitlines()[-1])
+                results.append(result)
+                print("{portal:<17} {users:>6} {errors:>6} {events:>8} "
+                      "{events_per_second:>10} {p50_ms:>10} {p99_ms:>10} "
+                      "{peak_rss_mb:>8}".format(**result), flush=True)
+    finally:
+        server.stop()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic API responses of the portals, served by the stub server of the
+end-to-end benchmarks.
+
+The responses follow the format, pagination and date formats of the real
+portal APIs closely enough to go through the same `get_events` code paths
+(Link headers, `has_more`, `continue`, page tokens, `max_id`, OAI-PMH
+resumption tokens, RSS feeds, ...). Every response is generated from the
+request alone: the users of the benchmarks are numbered, and their names
+and ids are derived from their number.
+"""
+from urllib.parse import parse_qs, unquote, urlsplit
+import json
+
+PUBLISHED = "2019-06-01T00:00:00Z"
+PUBLISHED_TS = 1559347200
+LAST_TRACKED = "2019-01-01T00:00:00Z"
+# number of pages served by the paginated apis
+PAGES = 2
+# users per wordpress and blogger blog
+AUTHORS_PER_BLOG = 10
+# records per page of the figshare OAI-PMH responses
+RECORDS_PER_PAGE = 100
+
+# the payloads of the github event types
+ACTOR = {
+    "login": "alice",
+    "url": "https://api.github.com/users/alice",
+    "avatar_url": "https://avatars.githubusercontent.com/u/1?"
+}
+REPO = {"name": "alice/repo", "url": "https://api.github.com/repos/alice/repo"}
+ISSUE = {
+    "repository_url": "https://api.github.com/repos/alice/repo",
+    "html_url": "https://github.com/alice/repo/issues/1"
+}
+COMMENT = {
+    "user": ACTOR,
+    "html_url": "https://github.com/alice/repo/issues/1#issuecomment-1"
+}
+PAYLOADS = {
+    "CreateEvent": {"ref_type": "tag", "ref": "v1.0"},
+    "ReleaseEvent": {"release": {
+        "html_url": "https://github.com/alice/repo/releases/tag/v1.0"}},
+    "ForkEvent": {"forkee": {"html_url": "https://github.com/alice/fork"}},
+    "DeleteEvent": {"ref": "feature", "ref_type": "branch"},
+    "WatchEvent": {"action": "started"},
+    "PushEvent": {"commits": [{
+        "url": "https://api.github.com/repos/alice/repo/commits/abc"}]},
+    "IssuesEvent": {"action": "opened", "issue": ISSUE},
+    "IssueCommentEvent": {"issue": ISSUE, "comment": COMMENT},
+    "PullRequestEvent": {"pull_request": {
+        "user": ACTOR,
+        "html_url": "https://github.com/bob/repo/pull/1",
+        "base": {"repo": {"html_url": "https://github.com/bob/repo"}}}},
+    "CommitCommentEvent": {"comment": COMMENT}
+}
+
+
+def username(i: int) -> str:
+    return "user{}".format(i)
+
+
+def user_id(i: int) -> str:
+    return str(1000 + i)
+
+
+def event_urls(base: str, users: int) -> dict:
+    """
+    The event urls of the portals, pointing to the stub server.
+
+    :param base: (str) the base url of the stub server.
+    :param users: (int) the number of users of the benchmark run.
+    :return: (dict) the `event_urls` of every portal.
+    """
+    return {
+        "github": {
+            "user_events_url": base + "/github/users/{}/events"},
+        "wikipedia": {
+            "contributions_url": base + "/wikipedia/api.php?action=query"
+            "&format=json&list=usercontribs&ucuser={}&ucdir=older"},
+        "twitter": {
+            "user_timeline_url": base + "/twitter/user_timeline.json"
+            "?screen_name={}&count=200"},
+        "slideshare": {
+            "user_slides_url": base + "/slideshare/get_slideshows_by_user"},
+        "stackoverflow": {
+            "user_posts_url": base + "/stackoverflow/users/{}/posts"
+            "?site=stackoverflow&pagesize=100"},
+        "figshare": {
+            "oai_pmh_url": base + "/figshare/{}/oai".format(users)},
+        "hypothesis": {
+            "user_search_url": base + "/hypothesis/search?user={}"},
+        "publons": {
+            "user_search_url": base + "/publons/review/?academic={}"},
+        "medium": {
+            "posts_feed_url": base + "/medium/feed/@{}"},
+        "wordpress": {},
+        "blogger": {
+            "blog_domain_url": base + "/blogger/blogs/byurl?url={}&key={}",
+            "blog_posts_url": base + "/blogger/blogs/{}/posts"
+            "?maxResults=20&key={}"},
+        "personal_website": {}
+    }
+
+
+def make_users(portal_name: str, count: int, base: str,
+               start: int=0) -> list:
+    """
+    The users of a benchmark run, as sent by the orchestrator.
+
+    :param portal_name: (str) the portal of the users.
+    :param count: (int) the number of users.
+    :param base: (str) the base url of the stub server.
+    :param start: (int) the number of the first user.
+    :return: (list) the users.
+    """
+    users = []
+    for i in range(start, start + count):
+        user = {
+            "id": "https://orcid.org/0000-0000-0000-{:04d}".format(i),
+            "username": username(i),
+            "userId": user_id(i),
+            "apiKey": "key",
+            "apiSecret": "secret",
+            "oauthToken": "token",
+            "oauthSecret": "secret",
+            "lastTracked": None,
+            "lastToken": None
+        }
+        if portal_name == "figshare":
+            # figshare searches the records since the last run
+            user["lastTracked"] = LAST_TRACKED
+        elif portal_name == "wordpress":
+            user["portalUrl"] = "{}/wordpress/blog{}/".format(
+                base, i // AUTHORS_PER_BLOG)
+        elif portal_name == "blogger":
+            user["portalUrl"] = "{}/blogger/blog{}/".format(
+                base, i // AUTHORS_PER_BLOG)
+        elif portal_name == "personal_website":
+            user["portalUrl"] = "{}/personal/{}/".format(base, username(i))
+        users.append(user)
+    return users
+
+
+def _json(data, headers: dict=None):
+    return 200, dict(headers or {}, **{
+        "Content-Type": "application/json"}), json.dumps(data)
+
+
+def _xml(data: str, content_type: str="application/xml"):
+    return 200, {"Content-Type": content_type}, data
+
+
+def github(base, parts, query, events):
+    name = parts[2]
+    page = int(query.get("page", ["1"])[0])
+    types = sorted(PAYLOADS)
+    data = [{
+        "id": str(page * events + n),
+        "type": types[n % len(types)],
+        "actor": dict(ACTOR, login=name),
+        "repo": REPO,
+        "payload": PAYLOADS[types[n % len(types)]],
+        "created_at": PUBLISHED
+    } for n in range(events)]
+    headers = {"ETag": 'W/"{}"'.format(name)}
+    if page < PAGES:
+        headers["Link"] = '<{}/github/users/{}/events?page={}>; ' \
+            'rel="next"'.format(base, name, page + 1)
+    return _json(data, headers)
+
+
+def wikipedia(base, parts, query, events):
+    names = query["ucuser"][0].split("|")
+    page = int(query.get("uccontinue", ["1"])[0])
+    contributions = []
+    for name in names:
+        name = name[:1].upper() + name[1:]
+        for n in range(events):
+            contributions.append({
+                "user": name,
+                "revid": page * 1000 + n,
+                "title": "{} page {}".format(name, n),
+                "timestamp": PUBLISHED,
+                "new": n % 2 == 0
+            })
+    data = {"query": {"usercontribs": contributions}}
+    if page < PAGES:
+        data["continue"] = {"uccontinue": str(page + 1), "continue": "-||"}
+    return _json(data)
+
+
+def twitter(base, parts, query, events):
+    name = query["screen_name"][0]
+    max_id = int(query.get("max_id", [str(2 * events)])[0])
+    data = [{
+        "id_str": str(tweet_id),
+        "created_at": "Sat Jun 01 00:00:00 +0000 2019",
+        "user": {
+            "screen_name": name,
+            "profile_image_url_https": "https://pbs.twimg.com/{}.png".format(
+                name)
+        }
+    } for tweet_id in range(max_id, max(max_id - events, 0), -1)]
+    return _json(data)
+
+
+def slideshare(base, parts, query, events):
+    name = query["username_for"][0]
+    slides = "".join(
+        "<Slideshow><ID>{n}</ID><Title>Slides {n}</Title>"
+        "<URL>https://www.slideshare.net/{name}/slides-{n}</URL>"
+        "<ThumbnailSmallURL>https://cdn.slidesharecdn.com/{name}-{n}.jpg"
+        "</ThumbnailSmallURL>"
+        "<Created>2019-06-01 00:00:00 UTC</Created>"
+        "<Tags><Tag>benchmark</Tag></Tags></Slideshow>".format(
+            n=n, name=name) for n in range(events))
+    return _xml('<?xml version="1.0" encoding="UTF-8"?>'
+                "<User><Name>{}</Name><Count>{}</Count>{}</User>".format(
+                    name, events, slides))
+
+
+def figshare(base, parts, query, events):
+    users = int(parts[1])
+    offset = int(query.get("resumptionToken", ["0"])[0])
+    total = users * events
+    records = []
+    for n in range(offset, min(offset + RECORDS_PER_PAGE, total)):
+        i = n // events
+        records.append(
+            "<record><header>"
+            "<identifier>oai:figshare.com:article/{n}</identifier>"
+            "<datestamp>{date}</datestamp></header><metadata>"
+            '<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/'
+            'oai_dc/" xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            "<dc:title>Dataset {n}</dc:title>"
+            "<dc:creator>User {i} ({user_id})</dc:creator>"
+            "<dc:date>{date}</dc:date>"
+            "<dc:relation>https://figshare.com/articles/{n}</dc:relation>"
+            "</oai_dc:dc></metadata></record>".format(
+                n=n, i=i, user_id=user_id(i), date=PUBLISHED))
+    token = ""
+    if offset + RECORDS_PER_PAGE < total:
+        token = "<resumptionToken>{}</resumptionToken>".format(
+            offset + RECORDS_PER_PAGE)
+    return _xml('<?xml version="1.0" encoding="UTF-8"?>'
+                '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">'
+                "<responseDate>{}</responseDate>"
+                '<request verb="ListRecords">{}/figshare/{}/oai</request>'
+                "<ListRecords>{}{}</ListRecords></OAI-PMH>".format(
+                    PUBLISHED, base, users, "".join(records), token),
+                "text/xml")
+
+
+def hypothesis(base, parts, query, events):
+    name = query["user"][0]
+    return _json({"total": events, "rows": [{
+        "id": "{}-{}".format(name, n),
+        "created": "2019-06-01T00:00:00.000000+00:00",
+        "links": {
+            "html": "https://hypothes.is/a/{}-{}".format(name, n),
+            "incontext": "https://hyp.is/{}-{}".format(name, n)
+        }
+    } for n in range(events)]})
+
+
+def publons(base, parts, query, events):
+    academic = query["academic"][0]
+    page = int(query.get("page", ["1"])[0])
+    next_url = None
+    if page < PAGES:
+        next_url = "{}/publons/review/?academic={}&page={}".format(
+            base, academic, page + 1)
+    return _json({"next": next_url, "results": [{
+        "date_reviewed": "2018",
+        "ids": {"academic": {
+            "url": "https://publons.com/review/{}-{}-{}/".format(
+                academic, page, n)}}
+    } for n in range(events)]})
+
+
+def _rss(title: str, build_date: str, items: list) -> str:
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<rss version="2.0" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+            "<title>{}</title><link>https://example.org/</link>"
+            "<image><url>https://example.org/logo.png</url>"
+            "<title>{}</title><link>https://example.org/</link></image>"
+            "<lastBuildDate>{}</lastBuildDate>{}</channel></rss>".format(
+                title, title, build_date, "".join(items)))
+
+
+def medium(base, parts, query, events):
+    name = parts[2].lstrip("@")
+    date = "Sat, 01 Jun 2019 00:00:00 GMT"
+    return _xml(_rss("Stories by {} on Medium".format(name), date, [
+        "<item><title>Story {n}</title>"
+        "<link>https://medium.com/@{name}/story-{n}</link>"
+        "<guid>https://medium.com/p/{name}-{n}</guid>"
+        "<dc:creator>{name}</dc:creator>"
+        "<pubDate>{date}</pubDate></item>".format(n=n, name=name, date=date)
+        for n in range(events)]), "application/rss+xml")
+
+
+def wordpress(base, parts, query, events):
+    blog = int(parts[1][4:])
+    date = "Sat, 01 Jun 2019 00:00:00 +0000"
+    items = []
+    for i in range(blog * AUTHORS_PER_BLOG, (blog + 1) * AUTHORS_PER_BLOG):
+        for n in range(events):
+            items.append(
+                "<item><title>Post {n}</title>"
+                "<link>{base}/wordpress/blog{blog}/{i}-{n}/</link>"
+                "<dc:creator>{name}</dc:creator>"
+                "<pubDate>{date}</pubDate></item>".format(
+                    n=n, i=i, base=base, blog=blog, name=username(i),
+                    date=date))
+    return _xml(_rss("Blog {}".format(blog), date, items),
+                "application/rss+xml")
+
+
+def blogger(base, parts, query, events):
+    if parts[2] == "byurl":
+        blog = urlsplit(query["url"][0]).path.strip("/").split("/")[-1]
+        return _json({"kind": "blogger#blog", "id": blog})
+    blog = int(parts[2][4:])
+    page = int(query.get("pageToken", ["1"])[0])
+    items = []
+    for i in range(blog * AUTHORS_PER_BLOG, (blog + 1) * AUTHORS_PER_BLOG):
+        for n in range(events):
+            items.append({
+                "kind": "blogger#post",
+                "published": "2019-06-01T00:00:00+00:00",
+                "url": "{}/blogger/blog{}/{}-{}-{}.html".format(
+                    base, blog, i, page, n),
+                "author": {
+                    "id": user_id(i),
+                    "displayName": username(i),
+                    "url": "https://www.blogger.com/profile/{}".format(
+                        user_id(i))
+                }
+            })
+    data = {"kind": "blogger#postList", "items": items}
+    if page < PAGES:
+        data["nextPageToken"] = str(page + 1)
+    return _json(data)
+
+
+def personal_website(base, parts, query, events):
+    return 200, {"Content-Type": "text/html"}, \
+        "<html><body><h1>{}</h1></body></html>".format(parts[1])
+
+
+def stackoverflow(base, parts, query, events):
+    ids = unquote(parts[2]).split(";")
+    page = int(query.get("page", ["1"])[0])
+    items = []
+    for portal_user_id in ids:
+        for n in range(events):
+            items.append({
+                "post_id": page * 1000 + n,
+                "post_type": "question" if n % 2 else "answer",
+                "creation_date": PUBLISHED_TS,
+                "link": "https://stackoverflow.com/q/{}{}{}".format(
+                    portal_user_id, page, n),
+                "owner": {
+                    "user_id": int(portal_user_id),
+                    "link": "https://stackoverflow.com/users/{}".format(
+                        portal_user_id),
+                    "profile_image": "https://example.org/{}.png".format(
+                        portal_user_id)
+                }
+            })
+    return _json({"items": items,
+                  "has_more": page < PAGES,
+                  "quota_max": 10000,
+                  "quota_remaining": 9999})
+
+
+HANDLERS = {
+    "github": github,
+    "wikipedia": wikipedia,
+    "twitter": twitter,
+    "slideshare": slideshare,
+    "stackoverflow": stackoverflow,
+    "figshare": figshare,
+    "hypothesis": hypothesis,
+    "publons": publons,
+    "medium": medium,
+    "wordpress": wordpress,
+    "blogger": blogger,
+    "personal": personal_website
+}
+
+
+def respond(base: str, url: str, events: int) -> tuple:
+    """
+    Generates the response of a portal API request.
+
+    :param base: (str) the base url of the stub server.
+    :param url: (str) the path and query of the request.
+    :param events: (int) the number of events per user and page.
+    :return: (tuple) the status code, headers and body of the response.
+    """
+    split = urlsplit(url)
+    parts = split.path.strip("/").split("/")
+    handler = HANDLERS.get(parts[0])
+    if handler is None:
+        return 404, {"Content-Type": "text/plain"}, "not found"
+    return handler(base, parts, parse_qs(split.query), events)
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic load generator for the LDN inbox and the tracker task fan-out.
+
+Builds orchestrator AS2 messages shaped like the ones `queue_tasks`
+consumes, every message describing `--scholars` new scholars with an
+account on each of the `--portals`, and POSTs them to the inbox at
+`--rate` messages per second. The portals and the LDN inbox the trackers
+deliver to are served by the local stub server of the benchmarks.
+
+Reported:
+
+- the latency (p50, p99, max) and status codes of the inbox POSTs,
+- the rate at which tracker tasks were published to the broker,
+- the end-to-end time from the first POST until the tracker tasks of all
+  the scholars have finished and the events were delivered.
+
+By default the messages are POSTed to the app in-process, the tasks are
+published to the configured broker (`--broker`) and `--workers` celery
+worker processes are started to run them. `--eager` runs the tasks
+inline instead, without a broker or workers, in which case the inbox
+latency includes the tracker runs. `--inbox-url` POSTs the messages to
+a deployed inbox instead; its workers must then be able to reach the
+stub server (`--host`, `--port`).
+
+Usage: python -m benchmarks.loadgen [--scholars 10] [--messages 20]
+    [--rate 5] [--portals github twitter] [--workers 2 | --eager]
+    [--broker redis://localhost:6379/0] [--inbox-url URL]
+"""
+import benchmarks
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from benchmarks import fixtures
+from benchmarks.bench_trackers import inbox_count, percentile
+from benchmarks.stub_server import StubServer
+
+
+def make_message(index: int, scholars: int, portals: list,
+                 base_url: str) -> dict:
+    """
+    Builds an orchestrator message for `scholars` scholars, each with an
+    account on every portal.
+
+    :param index: (int) the number of the message, used to number its
+    scholars after the ones of the previous messages.
+    :param scholars: (int) the number of scholars in the message.
+    :param portals: (list) the names of the portals.
+    :param base_url: (str) the base url of the stub server.
+    :return: (dict) the AS2 message.
+    """
+    start = index * scholars
+    describes = []
+    for i in range(scholars):
+        describes.append({"tracker:portals": {"items": []}})
+    for portal_name in portals:
+        users = fixtures.make_users(portal_name, scholars, base_url, start)
+        for scholar, user in zip(describes, users):
+            scholar["id"] = user.pop("id")
+            portal = {"tracker:name": portal_name}
+            for key, value in user.items():
+                if value is not None:
+                    portal["tracker:" + key] = value
+            scholar["tracker:portals"]["items"].append(
+                {"tracker:portal": portal})
+    return {
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "event": {
+            "type": "Offer",
+            "to": base_url + "/inbox/",
+            "tracker:eventBaseUrl": base_url + "/event/",
+            "object": {"type": "Collection", "describes": describes}
+        }
+    }
+
+
+def write_config(base_url: str, users: int, broker: str=None,
+                 database_uri: str=None):
+    """
+    Points the portals of the benchmark config to the stub server. The
+    config is written before the app is imported, and is read by the
+    workers started by the load generator.
+    """
+    config = benchmarks._config
+    for name, urls in fixtures.event_urls(base_url, users).items():
+        config["portals"].setdefault(name, {}).setdefault(
+            "event_urls", {}).update(urls)
+    if broker:
+        config["tracker"]["celery"]["broker_url"] = broker
+    if database_uri:
+        config["db"]["sqlalchemy_database_uri"] = database_uri
+    with open(benchmarks.bench_config_filename, "w") as f:
+        yaml.safe_dump(config, f)
+    os.environ["ARTIFACT_TRACKER_CONFIG"] = benchmarks.bench_config_filename
+
+
+class Publishes(object):
+    """
+    Counts the tasks published to the broker by this process.
+    """
+
+    def __init__(self):
+        self.times = []
+        self._lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        with self._lock:
+            self.times.append(time.perf_counter())
+
+    def rate(self) -> float:
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
+
+
+def main():
+    # the app is only imported once the config points to the stub server
+    portal_names = sorted(fixtures.event_urls("", 0))
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scholars", type=int, default=10,
+                        help="scholars per message")
+    parser.add_argument("--portals", nargs="+", default=portal_names,
+                        choices=portal_names)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=5.0,
+                        help="messages POSTed per second")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="maximum number of POSTs in flight")
+    parser.add_argument("--events", type=int, default=2,
+                        help="events per user and page of the responses")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="concurrency of the celery worker started")
+    parser.add_argument("--eager", action="store_true",
+                        help="run the tasks inline, without broker")
+    parser.add_argument("--broker", help="the celery broker url")
+    parser.add_argument("--database-uri",
+                        help="the database shared with the workers")
+    parser.add_argument("--inbox-url",
+                        help="POST to this inbox instead of in-process")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="the host of the stub server, as seen by "
+                        "the workers")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="seconds to wait for the tasks to finish")
+    args = parser.parse_args()
+
+    server = StubServer(events=args.events, port=args.port).start()
+    base_url = server.base_url.replace("127.0.0.1", args.host)
+    write_config(base_url, args.scholars * args.messages, args.broker,
+                 args.database_uri)
+
+    from artifact_tracker import celery, create_db, tracker_app
+    from artifact_tracker.ldn.inbox import INBOX_URL
+    from artifact_tracker.store.tracker_task import TrackerTask
+    from celery.signals import after_task_publish
+    import requests
+
+    app = tracker_app.app
+    with app.app_context():
+        create_db()
+    publishes = Publishes()
+    after_task_publish.connect(publishes, weak=False)
+
+    worker = None
+    if args.eager:
+        celery.conf.task_always_eager = True
+    elif args.workers and not args.inbox_url:
+        worker = subprocess.Popen(
+            [sys.executable, "-m", "celery", "-A", "artifact_tracker.celery",
+             "worker", "--concurrency", str(args.workers),
+             "--loglevel", "error"])
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def post(message: dict):
+        data = json.dumps(message)
+        start = time.perf_counter()
+        if args.inbox_url:
+            status = requests.post(
+                args.inbox_url, data=data,
+                headers={"Content-Type": "application/ld+json"}).status_code
+        else:
+            status = app.test_client().post(
+                INBOX_URL, data=data,
+                content_type="application/ld+json").status_code
+        latency = time.perf_counter() - start
+        with lock:
+            latencies.append(latency)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    messages = [make_message(i, args.scholars, args.portals, base_url)
+                for i in range(args.messages)]
+    expected = args.scholars * args.messages * len(args.portals)
+    started = datetime.now()
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for i, message in enumerate(messages):
+                delay = start + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(post, message)
+        posted = time.perf_counter() - start
+
+        # the tasks are done once the status of every scholar and portal
+        # was updated in this run, and the events stopped arriving
+        completed = delivered = 0
+        finished = time.perf_counter()
+        while time.perf_counter() - start < args.timeout:
+            with app.app_context():
+                completed = TrackerTask.query.filter(
+                    TrackerTask.completed.is_(True),
+                    TrackerTask.last_updated >= started).count()
+                tracker_app.db.session.remove()
+            count = inbox_count(server.base_url)
+            if count != delivered:
+                delivered = count
+                finished = time.perf_counter()
+            elif completed >= expected:
+                break
+            time.sleep(0.5)
+    finally:
+        if worker:
+            worker.terminate()
+            worker.wait()
+        server.stop()
+
+    print("messages:          {} ({} scholars x {} portals each)".format(
+        args.messages, args.scholars, len(args.portals)))
+    print("POST rate:         {:.1f}/s (target {:.1f}/s)".format(
+        len(latencies) / posted if posted else 0, args.rate))
+    print("inbox latency ms:  p50 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+        percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000,
+        max(latencies or [0]) * 1000))
+    print("inbox statuses:    {}".format(statuses))
+    print("tasks published:   {} ({:.1f}/s)".format(
+        len(publishes.times), publishes.rate()))
+    print("tracker tasks:     {}/{} completed".format(completed, expected))
+    print("events delivered:  {}".format(delivered))
+    print("end-to-end:        {:.2f}s".format(finished - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+A local HTTP server standing in for the portal APIs and the LDN inbox in
+the end-to-end benchmarks, so that they run without network access.
+
+GET requests are answered with the synthetic responses of
+`benchmarks.fixtures`, POSTs to `/inbox/` are accepted and counted, and
+`/stats` returns the number of events received by the inbox.
+"""
+from benchmarks import fixtures
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import json
+import threading
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def _send(self, status: int, headers: dict, body: str):
+        data = body.encode("utf8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.server.lock:
+                stats = {"inbox": self.server.inbox_count}
+            return self._send(200, {"Content-Type": "application/json"},
+                              json.dumps(stats))
+        self._send(*fixtures.respond(self.server.base_url,
+                                     self.path,
+                                     self.server.events))
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.startswith("/inbox/"):
+            return self._send(404, {"Content-Type": "text/plain"},
+                              "not found")
+        with self.server.lock:
+            self.server.inbox_count += 1
+        self._send(201, {"Content-Type": "text/plain"}, "")
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """
+    The stub server, running in a daemon thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, events: int=2, port: int=0):
+        """
+        :param events: (int) the number of events per user and page in
+        the portal responses.
+        :param port: (int) the port to listen on, any free port if 0.
+        """
+        HTTPServer.__init__(self, ("127.0.0.1", port), StubHandler)
+        self.events = events
+        self.inbox_count = 0
+        self.lock = threading.Lock()
+        self.base_url = "http://127.0.0.1:{}".format(self.server_address[1])
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -84,7 +84,7 @@ setup(
     url="https://github.com/oduwsdl/scholarly-orphans-trackers/",
     license=license,
     zip_safe=False,
-    packages=find_packages(exclude=("tests", "docs")),
+    packages=find_packages(exclude=("tests", "docs", "benchmarks")),
     include_package_data=True,
     install_requires=[
         "Flask",
@@ -102,6 +102,6 @@ setup(
         "feedparser",
         "sickle>=0.6.3"
     ],
-    tests_require=["sqlalchemy_utils"],
+    tests_require=["sqlalchemy_utils", "fakeredis[lua]"],
     test_suite="setup.test_suite"
 )
@@ -1,12 +1,32 @@
 # -*- coding: utf-8 -*-
+import base64
 import os
+import tempfile
 import unittest  # pytest in future
+import yaml
 
 
-config_filename = os.path.join(os.path.dirname(__file__),
-                               "../config.yaml")
-secrets_filename = os.path.join(os.path.dirname(__file__),
-                                "../secrets/secrets")
+# the tests run against a throw-away copy of the config, with its own
+# sqlite database and secrets, so that they never touch the deployed ones
+TESTS_DIR = tempfile.mkdtemp(prefix="artifact_tracker_tests_")
+config_filename = os.path.join(TESTS_DIR, "config.yaml")
+secrets_filename = os.path.join(TESTS_DIR, "secrets")
+
+with open(os.path.join(os.path.dirname(__file__), "../config.yaml"),
+          "rb") as f:
+    _config = yaml.safe_load(f)
+_config.setdefault("db", {})["sqlalchemy_database_uri"] = \
+    "sqlite+pysqlite:///{}".format(os.path.join(TESTS_DIR, "tests.db"))
+# only used as the key of the fake redis client of the tests
+_config.setdefault("tracker", {})["redis_url"] = "redis://localhost:6379/15"
+with open(config_filename, "w") as f:
+    yaml.safe_dump(_config, f)
+
+with open(secrets_filename, "w", encoding="utf8") as sf:
+    sf.write("%s\n%s" % (
+        base64.urlsafe_b64encode(os.urandom(32)).decode("utf8"),
+        base64.urlsafe_b64encode(os.urandom(16)).decode("utf8")))
+
 os.environ["ARTIFACT_TRACKER_TYPE"] = "test"
 os.environ["ARTIFACT_TRACKER_CONFIG"] = config_filename
 os.environ["ARTIFACT_TRACKER_SECRETS"] = secrets_filename
@@ -30,6 +50,13 @@ class ArtifactTrackerTests(unittest.TestCase):
         self.app.config = self.client.application.config
         self._ctx = self.app.test_request_context()
         self._ctx.push()
+
+        # the shared state of the trackers is kept in a fake redis
+        import fakeredis
+        from artifact_tracker.utils import redis_client
+        self.redis = fakeredis.FakeStrictRedis()
+        redis_client._clients[self.app.config["REDIS_URL"]] = self.redis
+
         from artifact_tracker import create_db
         from sqlalchemy_utils import database_exists, create_database
         with self.app_context():
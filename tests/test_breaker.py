@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from tests import ArtifactTrackerTests
+from unittest import mock
+
+
+class BreakerTests(ArtifactTrackerTests):
+
+    def setUp(self):
+        super(BreakerTests, self).setUp()
+        self.app.config["BREAKER"] = {"enabled": True,
+                                      "failure_threshold": 2,
+                                      "open_seconds": 60}
+
+    def fail(self, times: int):
+        from artifact_tracker.utils import breaker
+        for _ in range(times):
+            tracked = breaker.before_request("github")
+            breaker.record("github", False, tracked)
+
+    def test_closed_breaker_lets_requests_through(self):
+        from artifact_tracker.utils import breaker
+        self.assertFalse(breaker.before_request("github"))
+        self.fail(1)
+        # the breaker is tracked once it had a failure
+        self.assertTrue(breaker.before_request("github"))
+
+    def test_breaker_opens_after_the_threshold(self):
+        from artifact_tracker.utils import breaker
+        self.fail(2)
+        with self.assertRaises(breaker.CircuitOpenError) as e:
+            breaker.before_request("github")
+        self.assertGreater(e.exception.retry_after, 0)
+        # the other portals are not affected
+        self.assertFalse(breaker.before_request("twitter"))
+
+    def test_half_open_breaker_lets_a_single_probe_through(self):
+        from artifact_tracker.utils import breaker
+        self.fail(2)
+        opened_at = float(self.redis.hget("breaker:github", "opened_at"))
+        with mock.patch("time.time", return_value=opened_at + 61):
+            self.assertTrue(breaker.before_request("github"))
+            with self.assertRaises(breaker.CircuitOpenError):
+                breaker.before_request("github")
+
+    def test_successful_probe_closes_the_breaker(self):
+        from artifact_tracker.utils import breaker
+        self.fail(2)
+        opened_at = float(self.redis.hget("breaker:github", "opened_at"))
+        with mock.patch("time.time", return_value=opened_at + 61):
+            tracked = breaker.before_request("github")
+            breaker.record("github", True, tracked)
+        self.assertFalse(breaker.before_request("github"))
+
+    def test_failed_probe_opens_the_breaker_again(self):
+        from artifact_tracker.utils import breaker
+        self.fail(2)
+        opened_at = float(self.redis.hget("breaker:github", "opened_at"))
+        with mock.patch("time.time", return_value=opened_at + 61):
+            tracked = breaker.before_request("github")
+            breaker.record("github", False, tracked)
+            with self.assertRaises(breaker.CircuitOpenError):
+                breaker.before_request("github")
+
+    def test_disabled_breaker_is_never_open(self):
+        from artifact_tracker.utils import breaker
+        self.fail(2)
+        self.app.config["BREAKER"]["enabled"] = False
+        self.assertFalse(breaker.before_request("github"))
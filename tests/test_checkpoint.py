@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from tests import ArtifactTrackerTests
+from datetime import datetime, timedelta
+
+
+class CheckpointTests(ArtifactTrackerTests):
+
+    def setUp(self):
+        super(CheckpointTests, self).setUp()
+        from artifact_tracker.tracker.tracker import Tracker
+        self.tracker = Tracker(portal_name="github", users=[])
+
+    def test_no_checkpoint(self):
+        self.assertIsNone(self.tracker.load_checkpoint("actor"))
+
+    def test_save_and_load(self):
+        self.tracker.save_checkpoint("actor", "page-2", delivered=10,
+                                     state={"etag": "abc"})
+        self.tracker.save_checkpoint("actor", "page-3", delivered=20,
+                                     state={"etag": "abc"})
+        checkpoint = self.tracker.load_checkpoint("actor")
+        self.assertEqual(checkpoint, {"cursor": "page-3",
+                                      "state": {"etag": "abc"},
+                                      "delivered": 20,
+                                      "pages": 2})
+        # the checkpoints are kept per portal
+        from artifact_tracker.tracker.tracker import Tracker
+        other = Tracker(portal_name="twitter", users=[])
+        self.assertIsNone(other.load_checkpoint("actor"))
+
+    def test_clear(self):
+        self.tracker.save_checkpoint("actor", "page-2")
+        self.tracker.clear_checkpoint("actor")
+        self.assertIsNone(self.tracker.load_checkpoint("actor"))
+        self.assertNotIn("actor", self.tracker._checkpointed)
+
+    def test_stale_checkpoint_is_ignored(self):
+        from artifact_tracker.store.tracker_checkpoint import \
+            TrackerCheckpoint
+        self.tracker.save_checkpoint("actor", "page-2")
+        with self.app_context():
+            entry = TrackerCheckpoint.query.filter_by(
+                actor_id="actor", portal_name="github").first()
+            entry.updated_at = datetime.now() - timedelta(days=2)
+            self.tracker_app.db.session.commit()
+        self.assertIsNone(self.tracker.load_checkpoint("actor"))
+        self.tracker.portal["checkpoint_ttl"] = 3 * 86400
+        try:
+            self.assertEqual(
+                self.tracker.load_checkpoint("actor")["cursor"], "page-2")
+        finally:
+            del self.tracker.portal["checkpoint_ttl"]
+
+    def test_is_first_run(self):
+        user = {"id": "actor"}
+        self.assertTrue(self.tracker.is_first_run(user))
+        self.assertFalse(self.tracker.is_first_run(
+            dict(user, lastTracked="2019-01-01T00:00:00Z")))
+        self.assertFalse(self.tracker.is_first_run(
+            dict(user, lastToken="token")))
+        self.tracker.update_tracker_status(actor_id="actor",
+                                           status_code=200,
+                                           completed=True)
+        self.assertFalse(self.tracker.is_first_run(user))
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from tests import ArtifactTrackerTests
+
+
+class ClaimCheckTests(ArtifactTrackerTests):
+
+    def setUp(self):
+        super(ClaimCheckTests, self).setUp()
+        self.app.config["CLAIM_CHECK"] = {"enabled": True,
+                                          "min_users": 3,
+                                          "chunk_size": 2,
+                                          "ttl": 60}
+        self.users = [{"id": "actor{}".format(n),
+                       "username": "user{}".format(n)} for n in range(5)]
+
+    def test_applies_to_large_tasks(self):
+        from artifact_tracker.utils import claim_check
+        self.assertTrue(claim_check.applies(self.users))
+        self.assertFalse(claim_check.applies(self.users[:2]))
+        self.app.config["CLAIM_CHECK"]["enabled"] = False
+        self.assertFalse(claim_check.applies(self.users))
+
+    def test_round_trip(self):
+        from artifact_tracker.utils import claim_check
+        ref = claim_check.store(self.users)
+        claimed = claim_check.ClaimedUsers(ref)
+        self.assertEqual(len(claimed), 5)
+        self.assertEqual(list(claimed), self.users)
+        self.assertEqual(claimed[4], self.users[4])
+        self.assertEqual(claimed[-1], self.users[-1])
+        self.assertEqual(claimed[1:4], self.users[1:4])
+        with self.assertRaises(IndexError):
+            claimed[5]
+        self.assertGreater(self.redis.ttl(claim_check.KEY_PREFIX + ref), 0)
+
+    def test_deleted_claim_check_is_not_found(self):
+        from artifact_tracker.utils import claim_check
+        ref = claim_check.store(self.users)
+        claim_check.delete(ref)
+        with self.assertRaises(KeyError):
+            claim_check.ClaimedUsers(ref)
+
+    def test_tracker_reads_the_users_of_its_claim_check(self):
+        from artifact_tracker.tracker.tracker import Tracker
+        from artifact_tracker.utils import claim_check
+        ref = claim_check.store(self.users)
+        tracker = Tracker(portal_name="github", users_ref=ref)
+        self.assertEqual([u["id"] for u in tracker.users],
+                         [u["id"] for u in self.users])
+        self.assertEqual(
+            [len(batch) for batch in tracker.batched_users(2)], [2, 2, 1])
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from tests import ArtifactTrackerTests
+from unittest import mock
+
+
+def make_task(portal_name: str, users: int) -> dict:
+    return {"portal_name": portal_name,
+            "users": [{"id": "actor{}".format(n)} for n in range(users)],
+            "ldn_inbox_url": "http://localhost/inbox/",
+            "event_base_url": "http://localhost/event/"}
+
+
+class FairTests(ArtifactTrackerTests):
+
+    def setUp(self):
+        super(FairTests, self).setUp()
+        self.app.config["FAIR"] = {"enabled": True,
+                                   "quantum": 2,
+                                   "max_in_flight": 3,
+                                   "inflight_timeout": 3600}
+        self.dispatched = []
+        patcher = mock.patch(
+            "artifact_tracker.tracker.registry.dispatch",
+            side_effect=lambda **task: self.dispatched.append(task))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            "artifact_tracker.tracker.registry.pump_fair_queues")
+        self.pump_fair_queues = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pump_interleaves_the_messages(self):
+        from artifact_tracker.utils import fair
+        fair.submit("large", [make_task("github", 1) for _ in range(5)])
+        fair.submit("small", [make_task("twitter", 1)])
+        # the first message took all the slots before the second arrived
+        self.assertEqual(len(self.dispatched), 3)
+        self.assertEqual(self.redis.zcard(fair.INFLIGHT), 3)
+
+        # the freed slots go to both messages in turn, the small one is
+        # not held up by the two tasks left of the large one
+        fair.task_done(self.dispatched[0]["task_id"])
+        fair.task_done(self.dispatched[1]["task_id"])
+        self.assertEqual(
+            [t["portal_name"] for t in self.dispatched[3:]],
+            ["github", "twitter"])
+        self.assertEqual(self.redis.zcard(fair.INFLIGHT), 3)
+
+    def test_pump_respects_the_deficit(self):
+        from artifact_tracker.utils import fair
+        self.app.config["FAIR"]["max_in_flight"] = 0
+        fair.submit("message", [make_task("wikipedia", 3),
+                                make_task("wikipedia", 1)])
+        # the task of 3 users waits until the deficit covers its cost
+        self.assertEqual(
+            [len(t["users"]) for t in self.dispatched], [3, 1])
+        self.assertEqual(self.redis.llen(fair._queue_key("message")), 0)
+        self.assertFalse(self.redis.lrange(fair.ACTIVE, 0, -1))
+
+    def test_task_done_frees_the_slot_once(self):
+        from artifact_tracker.utils import fair
+        fair.submit("message", [make_task("github", 1) for _ in range(4)])
+        self.assertEqual(len(self.dispatched), 3)
+        task_id = self.dispatched[0]["task_id"]
+        fair.task_done(task_id)
+        fair.task_done(task_id)
+        self.assertEqual(len(self.dispatched), 4)
+        self.assertEqual(self.redis.zcard(fair.INFLIGHT), 3)
+
+    def test_pump_frees_the_slots_of_lost_tasks(self):
+        from artifact_tracker.utils import fair
+        fair.submit("message", [make_task("github", 1) for _ in range(4)])
+        self.assertEqual(len(self.dispatched), 3)
+        # a wakeup is scheduled for when the oldest slot expires
+        self.assertEqual(self.pump_fair_queues.apply_async.call_count, 1)
+        countdown = \
+            self.pump_fair_queues.apply_async.call_args[1]["countdown"]
+        self.assertAlmostEqual(countdown, 3600, delta=5)
+        # the slots of the tasks are older than the timeout
+        for task in self.dispatched:
+            self.redis.zadd(fair.INFLIGHT, {task["task_id"]: 0})
+        self.redis.delete(fair.WAKEUP)
+        fair.wakeup()
+        self.assertEqual(len(self.dispatched), 4)
+        self.assertEqual(self.redis.zcard(fair.INFLIGHT), 1)
+
+    def test_pump_releases_its_lock_only(self):
+        from artifact_tracker.utils import fair
+        self.redis.set(fair.LOCK, "other")
+        fair.submit("message", [make_task("github", 1)])
+        # another dispatcher holds the lock and runs the pending round
+        self.assertEqual(self.dispatched, [])
+        self.assertEqual(self.redis.get(fair.LOCK), b"other")
+        self.assertTrue(self.redis.get(fair.PENDING))
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from tests import ArtifactTrackerTests
+
+
+class HighWaterTests(ArtifactTrackerTests):
+
+    def setUp(self):
+        super(HighWaterTests, self).setUp()
+        from artifact_tracker.tracker.tracker import Tracker
+        from artifact_tracker.utils import high_water
+        tracker = Tracker(portal_name="github", users=[])
+        tracker.update_tracker_status(actor_id="actor", status_code=200,
+                                      completed=True)
+        high_water.store("github", {
+            "actor": {"published": "2019-05-01T00:00:00Z",
+                      "token": "etag"}})
+
+    def test_sets_the_missing_marks(self):
+        from artifact_tracker.utils import high_water
+        users = [{"id": "actor", "name": "github"}]
+        high_water.apply(users)
+        self.assertEqual(users[0]["lastTracked"], "2019-05-01T00:00:00Z")
+        self.assertEqual(users[0]["lastToken"], "etag")
+
+    def test_keeps_the_marks_sent_by_the_orchestrator(self):
+        from artifact_tracker.utils import high_water
+        users = [{"id": "actor", "name": "github",
+                  "lastTracked": "2019-06-01T00:00:00Z"}]
+        high_water.apply(users)
+        self.assertEqual(users[0]["lastTracked"], "2019-06-01T00:00:00Z")
+        self.assertEqual(users[0]["lastToken"], "etag")
+
+    def test_marks_are_kept_per_portal_and_actor(self):
+        from artifact_tracker.utils import high_water
+        users = [{"id": "actor", "name": "twitter"},
+                 {"id": "other", "name": "github"}]
+        high_water.apply(users)
+        self.assertNotIn("lastTracked", users[0])
+        self.assertNotIn("lastTracked", users[1])
+
+    def test_published_only_moves_forward(self):
+        from artifact_tracker.utils import high_water
+        high_water.store("github", {
+            "actor": {"published": "2019-01-01T00:00:00Z"}})
+        users = [{"id": "actor", "name": "github"}]
+        high_water.apply(users)
+        self.assertEqual(users[0]["lastTracked"], "2019-05-01T00:00:00Z")
+
+    def test_observed_marks(self):
+        from artifact_tracker.utils import high_water
+        with high_water.collect() as marks:
+            high_water.observe("actor", published="2019-02-01T00:00:00Z")
+            high_water.observe("actor", published="2019-01-01T00:00:00Z")
+            high_water.observe("actor", token=42)
+        self.assertEqual(marks, {"actor": {
+            "published": "2019-02-01T00:00:00Z", "token": "42"}})
+        # nothing is collected outside of a run
+        high_water.observe("actor", published="2019-03-01T00:00:00Z")
+        self.assertEqual(marks["actor"]["published"],
+                         "2019-02-01T00:00:00Z")
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from tests import ArtifactTrackerTests
+from unittest import mock
+
+
+def make_response(status_code: int=200, data: dict=None):
+    return mock.Mock(status_code=status_code, json=lambda: data or {},
+                     headers={}, text="")
+
+
+def make_post(user_id: int, post_id: int) -> dict:
+    return {"post_id": post_id,
+            "post_type": "answer",
+            "creation_date": 1546300800 + post_id,
+            "link": "https://stackoverflow.com/a/{}".format(post_id),
+            "owner": {"user_id": user_id,
+                      "link": "https://stackoverflow.com/users/{}"
+                              .format(user_id)}}
+
+
+class StackOverflowTests(ArtifactTrackerTests):
+
+    def setUp(self):
+        super(StackOverflowTests, self).setUp()
+        from artifact_tracker.tracker.stackoverflow import \
+            StackOverflowTracker
+        self.users = [{"id": "alice", "userId": 1},
+                      {"id": "bob", "userId": 2},
+                      {"id": "carol", "userId": 3}]
+        self.tracker = StackOverflowTracker(
+            portal_name="stackoverflow",
+            users=self.users,
+            ldn_inbox_url="http://localhost/inbox/",
+            event_base_url="http://localhost/event/")
+        self.posted = {}
+        patcher = mock.patch(
+            "artifact_tracker.tracker.stackoverflow.post_to_ldn_inbox",
+            side_effect=self.post_to_ldn_inbox)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_to_ldn_inbox(self, events=None, **kwargs):
+        for event in events:
+            actor_id = event["event"]["actor"]["id"]
+            self.posted.setdefault(actor_id, []).append(
+                event["event"]["object"]["items"][0]["href"])
+        return True
+
+    def completed(self, actor_id: str) -> bool:
+        from artifact_tracker.store.tracker_task import TrackerTask
+        with self.app_context():
+            task = TrackerTask.query.filter_by(
+                actor_id=actor_id, portal_name="stackoverflow").first()
+            return bool(task and task.completed)
+
+    def test_posts_are_split_per_user(self):
+        responses = [
+            make_response(data={"items": [make_post(1, 10), make_post(2, 20),
+                                          make_post(1, 11)],
+                                "has_more": True}),
+            make_response(data={"items": [make_post(2, 21)],
+                                "has_more": False})]
+        with mock.patch.object(self.tracker, "get",
+                               side_effect=responses) as get:
+            self.assertTrue(self.tracker.get_events())
+
+        # a single vectorized request per page for the whole batch
+        self.assertEqual(get.call_count, 2)
+        self.assertIn("/users/1;2;3/posts", get.call_args_list[0][0][0])
+        self.assertIn("&page=2", get.call_args_list[1][0][0])
+        self.assertEqual(self.posted, {
+            "alice": ["https://stackoverflow.com/a/10",
+                      "https://stackoverflow.com/a/11"],
+            "bob": ["https://stackoverflow.com/a/20",
+                    "https://stackoverflow.com/a/21"]})
+        # the users without posts are tracked too
+        for actor_id in ("alice", "bob", "carol"):
+            self.assertTrue(self.completed(actor_id))
+
+    def test_error_page_leaves_the_batch_pending(self):
+        responses = [
+            make_response(data={"items": [make_post(1, 10)],
+                                "has_more": True}),
+            make_response(status_code=500)]
+        with mock.patch.object(self.tracker, "get", side_effect=responses):
+            self.tracker.get_events()
+        self.assertEqual(self.posted, {})
+        for actor_id in ("alice", "bob", "carol"):
+            self.assertFalse(self.completed(actor_id))
+
+    def test_exhausted_quota_reschedules_the_batch(self):
+        responses = [
+            make_response(data={"items": [make_post(1, 10)],
+                                "has_more": True,
+                                "quota_remaining": 0})]
+        with mock.patch.object(self.tracker, "get", side_effect=responses), \
+                mock.patch.object(self.tracker, "reschedule") as reschedule:
+            self.assertFalse(self.tracker.get_events())
+        self.assertEqual(self.posted, {})
+        self.assertEqual([u["id"] for u in reschedule.call_args[0][0]],
+                         ["alice", "bob", "carol"])
+        self.assertGreater(reschedule.call_args[1]["countdown"], 0)
+
+    def test_backoff_is_shared(self):
+        from artifact_tracker.tracker import stackoverflow
+        responses = [
+            make_response(data={"items": [], "has_more": False,
+                                "backoff": 10})]
+        with mock.patch.object(self.tracker, "get", side_effect=responses):
+            self.tracker.get_events()
+        self.assertGreater(self.redis.pttl(stackoverflow.BACKOFF_KEY), 0)
+        with mock.patch("time.sleep") as sleep:
+            stackoverflow._wait_for_backoff()
+        self.assertGreater(sleep.call_args[0][0], 0)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+from tests import ArtifactTrackerTests
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+
+def make_response(status_code: int=200, data: dict=None):
+    return mock.Mock(status_code=status_code, json=lambda: data or {})
+
+
+def make_contribution(user: str, revid: int) -> dict:
+    return {"user": user,
+            "revid": revid,
+            "title": "Page {}".format(revid),
+            "timestamp": "2019-01-01T00:00:00Z",
+            "new": True}
+
+
+class WikipediaTests(ArtifactTrackerTests):
+
+    def setUp(self):
+        super(WikipediaTests, self).setUp()
+        self.posted = {}
+        patcher = mock.patch(
+            "artifact_tracker.tracker.wikipedia.post_to_ldn_inbox",
+            side_effect=self.post_to_ldn_inbox)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_tracker(self, users: list):
+        from artifact_tracker.tracker.wikipedia import WikipediaTracker
+        return WikipediaTracker(portal_name="wikipedia",
+                                users=users,
+                                ldn_inbox_url="http://localhost/inbox/",
+                                event_base_url="http://localhost/event/")
+
+    def post_to_ldn_inbox(self, events=None, **kwargs):
+        for event in events:
+            actor_id = event["event"]["actor"]["id"]
+            self.posted.setdefault(actor_id, []).append(
+                event["event"]["object"]["items"][0]["href"])
+        return True
+
+    def completed(self, actor_id: str) -> bool:
+        from artifact_tracker.store.tracker_task import TrackerTask
+        with self.app_context():
+            task = TrackerTask.query.filter_by(
+                actor_id=actor_id, portal_name="wikipedia").first()
+            return bool(task and task.completed)
+
+    def test_contributions_are_split_per_user(self):
+        tracker = self.make_tracker([{"id": "alice", "username": "Alice"},
+                                     {"id": "bob", "username": "bob_smith"}])
+        responses = [
+            make_response(data={
+                "query": {"usercontribs": [make_contribution("Alice", 1),
+                                           make_contribution("Bob smith", 2)]},
+                "continue": {"uccontinue": "next", "continue": "-||"}}),
+            make_response(data={
+                "query": {"usercontribs": [make_contribution("Alice", 3)]}})]
+        with mock.patch.object(tracker, "get", side_effect=responses) as get:
+            self.assertTrue(tracker.get_events())
+
+        # a single multi-user request, and its continuation
+        self.assertEqual(get.call_count, 2)
+        query = parse_qs(urlparse(get.call_args_list[0][0][0]).query)
+        self.assertEqual(query["ucuser"], ["Alice|Bob smith"])
+        query = parse_qs(urlparse(get.call_args_list[1][0][0]).query)
+        self.assertEqual(query["uccontinue"], ["next"])
+        self.assertEqual(self.posted, {
+            "alice": ["https://en.wikipedia.org/wiki/Page_1?oldid=1",
+                      "https://en.wikipedia.org/wiki/Page_3?oldid=3"],
+            "bob": ["https://en.wikipedia.org/wiki/Page_2?oldid=2"]})
+        self.assertTrue(self.completed("alice"))
+        self.assertTrue(self.completed("bob"))
+
+    def test_error_on_a_continuation_leaves_the_batch_pending(self):
+        tracker = self.make_tracker([{"id": "alice", "username": "Alice"}])
+        responses = [
+            make_response(data={
+                "query": {"usercontribs": [make_contribution("Alice", 1)]},
+                "continue": {"uccontinue": "next"}}),
+            make_response(status_code=503)]
+        with mock.patch.object(tracker, "get", side_effect=responses):
+            self.assertFalse(tracker.get_events())
+        self.assertEqual(self.posted, {})
+        self.assertFalse(self.completed("alice"))
+
+    def test_invalid_user_name_only_fails_its_user(self):
+        tracker = self.make_tracker([{"id": "alice", "username": "Alice"},
+                                     {"id": "bad", "username": "Bad<>"}])
+        error = {"error": {"code": "baduser_ucuser",
+                           "info": "Invalid value \"Bad<>\"."}}
+
+        def get(url, **kwargs):
+            users = parse_qs(urlparse(url).query)["ucuser"][0]
+            if "Bad" in users:
+                return make_response(data=error)
+            return make_response(data={"query": {"usercontribs": [
+                make_contribution("Alice", 1)]}})
+
+        with mock.patch.object(tracker, "get", side_effect=get) as mocked:
+            tracker.get_events()
+        # the batch, then every user on its own
+        self.assertEqual(mocked.call_count, 3)
+        self.assertEqual(self.posted, {
+            "alice": ["https://en.wikipedia.org/wiki/Page_1?oldid=1"]})
+        self.assertTrue(self.completed("alice"))
+        self.assertTrue(self.completed("bad"))
+
+    def test_users_are_requested_from_their_wiki(self):
+        tracker = self.make_tracker([
+            {"id": "alice", "username": "Alice"},
+            {"id": "bob", "username": "Bob",
+             "portalUrl": "https://de.wikipedia.org/wiki/Benutzer:Bob"},
+            {"id": "carol", "username": "Carol",
+             "portalUrl": "https://xx.example.org/wiki/User:Carol"}])
+        tracker.portal["wikis"] = ["en.wikipedia.org", "de.wikipedia.org"]
+        try:
+            with mock.patch.object(
+                    tracker, "get",
+                    return_value=make_response(data={})) as get:
+                tracker.get_events()
+        finally:
+            del tracker.portal["wikis"]
+        hosts = {urlparse(c[0][0]).netloc: parse_qs(
+            urlparse(c[0][0]).query)["ucuser"] for c in get.call_args_list}
+        # the wikis that are not configured are not requested
+        self.assertEqual(hosts, {"en.wikipedia.org": ["Alice"],
+                                 "de.wikipedia.org": ["Bob"]})